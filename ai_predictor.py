@@ -8,8 +8,23 @@ import time
 import datetime
 import logging
 import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from models.lstm_model import LSTMModel
+from models.model_registry import get_model_registry
+from models.multi_horizon_model import MultiHorizonModel, MULTI_HORIZON_KEY
+from models.streaming_lstm import StreamingSession
+from models.model_bundle import ModelBundle
+from models.timeframes import TIMEFRAMES
+from prediction_cache import get_prediction_cache
 from data_fetcher import DataFetcher
+from parallel_training import ParallelTrainer
+from hyperparameter_search import load_best_hyperparams
+from walk_forward import WalkForwardEvaluator
+from utils.validation_utils import validate_data
+from utils.dataset_utils import make_streaming_dataset, make_cached_windows_dataset
+from utils.window_cache import WindowCache
+from utils.metrics import timed
 from utils.logging_utils import (
     log_ai_training_start,
     log_ai_training_complete,
@@ -20,40 +35,74 @@ from utils.logging_utils import (
     log_event
 )
 
+OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+
+class TrainingStopped(Exception):
+    """Обучение остановлено по запросу; готовые модели сохранены в контрольной точке."""
+
+
 class AIPredictor:
-    def __init__(self):
+    def __init__(self, backend="keras", model_type="per_timeframe", fetcher=None):
         """
         Инициализация AIPredictor.
+        :param backend: Бэкенд инференса: "keras" (models/*.keras) или "tflite" (models/*.tflite,
+                        см. models/lite_export.py).
+        :param model_type: "per_timeframe" — отдельная LSTM на каждый таймфрейм,
+                           "multi_horizon" — одна общая сеть с эмбеддингом таймфрейма (models/multi_horizon.keras).
+        :param fetcher: Готовый DataFetcher (например, общий с AnalysisPipeline); по умолчанию создается новый.
         """
-        self.models = {}  # Словарь для хранения моделей, обученных на разных таймфреймах
-        self.timeframes = {
-            "short_term": ["1", "3", "5", "15", "30", "60"],  # 1мин, 3мин, 5мин, 15мин, 30мин, 1час
-            "medium_term": ["60", "240", "D"]  # 1час, 4часа, 1день
-        }
+        self.models = {}  # Модели, обученные в этом экземпляре (загруженные с диска хранятся в реестре)
+        self.timeframes = {timeframe_type: list(timeframes) for timeframe_type, timeframes in TIMEFRAMES.items()}
         self.state_file = "ai_state.json"
+        self.last_training_report = None  # Отчет о последнем параллельном обучении или дообучении
+        self.last_evaluation_report = None  # Отчет о последней walk-forward оценке
+        self.model_state = {}  # Метаданные обучения по моделям (сохраняются в ai_state.json)
+        self._data_ranges = {}  # timeframe -> (первая, последняя свеча) последнего загруженного набора
+        self._val_losses = {}  # model_key -> лучшая val_loss последнего обучения
+        # Управление текущим запуском обучения (см. train_ai_on_all_timeframes и training_jobs.py)
+        self._progress = None
+        self._checkpoint = None
+        self._should_stop = None
         self.last_trained = self._load_state()
-        self.fetcher = DataFetcher()
+        self.fetcher = fetcher if fetcher is not None else DataFetcher()
+        # Подготовленные ряды для обучения (memmap .npy), дописываются по мере появления новых свечей
+        self.window_cache = WindowCache(os.path.join(self.fetcher.cache_dir, "windows"))
 
-        # Загрузка существующих моделей с диска
-        self._attempt_load_models()
+        # Модели с диска загружаются лениво и разделяются всеми экземплярами AIPredictor
+        self.backend = backend
+        self.model_type = model_type
+        self.registry = get_model_registry(backend)
+
+        # Общий кэш прогнозов; записи модели сбрасываются при её переобучении или перезагрузке
+        self.prediction_cache = get_prediction_cache()
+        self.registry.add_listener(self.prediction_cache.invalidate_model)
+        get_model_registry("keras").add_listener(self.prediction_cache.invalidate_model)
 
     def _load_state(self):
         """
-        Загружает состояние модели из файла (время последнего обучения).
+        Загружает состояние модели из файла (время последнего обучения и метаданные моделей).
         :return: Время последнего обучения или None, если файл не существует.
         """
         if os.path.exists(self.state_file):
             with open(self.state_file, "r") as f:
                 state = json.load(f)
-                return datetime.datetime.fromisoformat(state["last_trained"])
+                self.model_state = state.get("models", {})
+                if state.get("last_trained"):
+                    return datetime.datetime.fromisoformat(state["last_trained"])
         return None
 
+    def reload_state(self):
+        """Перечитывает состояние из файла (например, после обучения в дочернем процессе)."""
+        self.last_trained = self._load_state()
+
     def _save_state(self):
         """
-        Сохраняет состояние модели (время последнего обучения) в файл.
+        Сохраняет состояние модели (время последнего обучения и метаданные моделей) в файл.
         """
         state = {
-            "last_trained": self.last_trained.isoformat() if self.last_trained else None
+            "last_trained": self.last_trained.isoformat() if self.last_trained else None,
+            "models": self.model_state
         }
         try:
             with open(self.state_file, "w") as f:
@@ -84,105 +133,770 @@ class AIPredictor:
         formatted_date = next_training_date.strftime("%d-%m-%Y %H:%M:%S")
         return f"Обучить ИИ снова после {formatted_date}"
 
-    def _attempt_load_models(self):
+    def _get_model(self, model_key):
         """
-        Пытается загрузить модели с диска для каждого возможного таймфрейма.
+        Возвращает модель для ключа: из общего реестра (с ленивой загрузкой с диска)
+        или обученную в этом экземпляре, если на диске её еще нет.
         """
-        for tf_type, tfs in self.timeframes.items():
-            for tf in tfs:
-                model_key = f"{tf_type}_{tf}"
-                model_filename = f"models/{model_key}.keras"
-                if os.path.exists(model_filename):
-                    lstm = LSTMModel(input_shape=(60, 1), model_path=model_filename)
-                    try:
-                        lstm.load_model()
-                        self.models[model_key] = lstm
-                        logging.info(f"Загружена модель {model_key} из {model_filename}")
-                    except Exception as e:
-                        logging.error(f"Ошибка при загрузке модели {model_key} из {model_filename}: {e}")
+        model = self.registry.get(model_key)
+        if model is None:
+            model = self.models.get(model_key)
+        return model
+
+    def _get_multi_horizon_model(self):
+        """Возвращает общую multi-horizon модель (из реестра или обученную в этом экземпляре)."""
+        model = get_model_registry("keras").get(
+            MULTI_HORIZON_KEY,
+            factory=lambda path: MultiHorizonModel(self.get_model_keys(), model_path=path, build=False)
+        )
+        if model is None:
+            model = self.models.get(MULTI_HORIZON_KEY)
+        return model
+
+    def get_model_keys(self):
+        """Возвращает ключи моделей всех таймфреймов в фиксированном порядке."""
+        return [model_key for timeframe_type, timeframe, model_key in self._iter_model_keys()]
+
+    def create_streaming_session(self, timeframe_type="short_term", resync_interval=60, scale_window=200):
+        """
+        Создает сессию потокового инференса для всех моделей типа таймфрейма.
+        Сессия хранит рекуррентное состояние по каждой паре (symbol, модель) и на каждую новую свечу
+        выдает ожидаемое изменение цены, как predict_price_movement (с нормализацией из бандла модели).
+        :param timeframe_type: "short_term" или "medium_term".
+        :param resync_interval: Через сколько свечей пересчитывать состояние по полному окну.
+        :param scale_window: Сколько последних свечей хранится для пересинхронизации
+                             (и нормализации моделей без бандла).
+        :return: StreamingSession (методы sync, update, update_many).
+        """
+        if self.model_type != "per_timeframe":
+            raise ValueError("Streaming inference is supported only for per-timeframe models.")
+        models = {}
+        for timeframe in self.timeframes[timeframe_type]:
+            model_key = f"{timeframe_type}_{timeframe}"
+            # Потоковый режим работает с весами Keras-модели независимо от бэкенда прогноза
+            model = get_model_registry("keras").get(model_key) or self.models.get(model_key)
+            if model is not None:
+                models[timeframe] = model
+        if not models:
+            raise ValueError(f"No trained models for {timeframe_type}.")
+        return StreamingSession(models, resync_interval=resync_interval, scale_window=scale_window)
 
-    async def train_ai_on_all_timeframes(self, symbols):
+    def get_prediction_cache_stats(self):
+        """Возвращает метрики общего кэша прогнозов (в том числе долю попаданий)."""
+        return self.prediction_cache.get_stats()
+
+    def _prediction_cache_key(self, registry, model_key, data, symbol, data_timeframe, variant=None, look_back=60):
+        """
+        Ключ кэша прогноза: модель и её версия, пара, таймфрейм данных и последняя свеча окна.
+        Цена закрытия последней свечи входит в ключ, т.к. незакрытая свеча меняется при той же метке времени.
+        :return: Кортеж или None, если прогноз кэшировать нельзя (не указана пара или модель вне реестра).
+        """
+        if symbol is None:
+            return None
+        version = registry.get_version(model_key)
+        if version is None:
+            return None
+        return (model_key, version, self.backend, variant, symbol, data_timeframe,
+                data.index[-1], float(data['close'].iloc[-1]), len(data), look_back)
+
+    def get_model_load_stats(self):
+        """Возвращает статистику времени загрузки моделей из общего реестра."""
+        return self.registry.get_load_stats()
+
+    def _iter_model_keys(self):
+        """Перебирает (timeframe_type, timeframe, model_key) для всех моделей."""
+        for timeframe_type, timeframes in self.timeframes.items():
+            for timeframe in timeframes:
+                yield timeframe_type, timeframe, f"{timeframe_type}_{timeframe}"
+
+    @timed("predictor.train_all")
+    async def train_ai_on_all_timeframes(self, symbols, workers=None, tf_threads_per_worker=None, prefetch=1,
+                                         streaming=False, window_cache=False, progress=None, checkpoint=None,
+                                         should_stop=None):
         """
         Обучает ИИ на всех таймфреймах для всех пар.
+        Гиперпараметры моделей берутся из models/hyperparams.json, если он экспортирован hyperparameter_search.py.
+        :param symbols: Список торговых пар.
+        :param workers: Если задан, модели таймфреймов обучаются параллельно в указанном количестве процессов.
+        :param tf_threads_per_worker: Количество потоков TensorFlow на рабочий процесс (только вместе с workers).
+        :param prefetch: Сколько подготовленных наборов данных может ждать обучения (ограничивает память).
+        :param streaming: Обучать на потоковом tf.data-наборе из дискового кэша свечей (нормализация по каждой паре).
+        :param window_cache: Обучать на memmap-кэше подготовленных рядов (см. utils/window_cache.py):
+                             повторно обрабатываются только новые свечи.
+        :param progress: Функция progress(event) для событий прогресса (словари с ключом "type":
+                         started, model_start, epoch, model_saved).
+        :param checkpoint: Контрольная точка (training_jobs.TrainingCheckpoint): каждая обученная модель
+                           сразу сохраняется на диск и отмечается в ней, модели, готовые в прерванном
+                           запуске, пропускаются. После успешного завершения контрольная точка удаляется.
+        :param should_stop: Функция без аргументов; True — остановить обучение перед следующим таймфреймом
+                            (TrainingStopped).
         """
         log_ai_training_start()
+        self._progress, self._checkpoint, self._should_stop = progress, checkpoint, should_stop
         try:
-            for timeframe_type, timeframes in self.timeframes.items():
-                for timeframe in timeframes:
-                    model_key = f"{timeframe_type}_{timeframe}"
-                    self.models[model_key] = LSTMModel(input_shape=(60, 1))
-                    await self._train_ai_on_timeframe(symbols, timeframe, model_key)
+            if checkpoint is not None:
+                self._report_progress("started", completed=sorted(checkpoint.completed),
+                                      pending=[key for _, _, key in self._pending_model_keys()])
+            if self.model_type == "multi_horizon":
+                await self._train_multi_horizon(symbols)
+            elif workers:
+                self.last_training_report = await self._train_parallel(symbols, workers, tf_threads_per_worker)
+            elif streaming:
+                await self._train_streaming(symbols)
+            elif window_cache:
+                await self._train_cached(symbols)
+            else:
+                await self._train_pipelined(symbols, prefetch=prefetch)
 
             self.last_trained = datetime.datetime.now()
+            self._record_full_training()
             self._save_state()
             log_ai_training_complete()
 
             # Сохранение всех моделей на диск
             self._save_all_models()
+            if checkpoint is not None:
+                checkpoint.clear()
 
+        except TrainingStopped:
+            log_event("AI Training", "Training stopped, completed models are saved in the checkpoint.")
+            raise
         except Exception as e:
             log_ai_training_error(f"Error during training: {e}")
             raise
+        finally:
+            self._progress, self._checkpoint, self._should_stop = None, None, None
+
+    def _pending_model_keys(self):
+        """Как _iter_model_keys, но без моделей, уже обученных в прерванном запуске (по контрольной точке)."""
+        for timeframe_type, timeframe, model_key in self._iter_model_keys():
+            if self._checkpoint is not None and self._checkpoint.is_done(model_key):
+                continue
+            yield timeframe_type, timeframe, model_key
+
+    def _report_progress(self, event_type, **fields):
+        if self._progress is not None:
+            self._progress({"type": event_type, **fields})
+
+    def _check_stop(self):
+        if self._should_stop is not None and self._should_stop():
+            raise TrainingStopped("Training stopped on request.")
 
-    async def _train_ai_on_timeframe(self, symbols, timeframe, model_key):
+    def _start_model(self, model_key, timeframe):
+        """Проверяет запрос остановки и сообщает о начале обучения модели."""
+        self._check_stop()
+        self._report_progress("model_start", model_key=model_key, timeframe=timeframe)
+
+    def _epoch_callback(self, model_key):
+        """Callback эпохи для LSTMModel.train (None, если прогресс не нужен)."""
+        if self._progress is None:
+            return None
+
+        def on_epoch_end(epoch, logs):
+            logs = logs or {}
+            self._report_progress("epoch", model_key=model_key, epoch=epoch + 1,
+                                  loss=float(logs.get("loss", float("nan"))),
+                                  val_loss=float(logs.get("val_loss", float("nan"))))
+        return on_epoch_end
+
+    @staticmethod
+    def _best_val_loss(history):
+        """Лучшие потери на валидации из keras History (NaN, если валидации не было)."""
+        return min(history.history.get('val_loss', [float('nan')]))
+
+    def _complete_model(self, model_key, lstm):
         """
-        Обучает ИИ на данных для конкретного таймфрейма.
+        Регистрирует обученную модель таймфрейма. С контрольной точкой модель сразу сохраняется на диск,
+        публикуется в реестре и отмечается готовой, чтобы прерванный запуск продолжился со следующей.
         """
-        log_event("AI Training", f"Starting training for timeframe: {timeframe}")
+        self.models[model_key] = lstm
+        if self._checkpoint is None:
+            return
+        self._save_model(model_key, lstm)
+        self._record_full_training()
+        self._save_state()
+        self._checkpoint.mark_done(model_key)
+        self._report_progress("model_saved", model_key=model_key, model_path=f"models/{model_key}.keras")
+
+    async def _train_pipelined(self, symbols, prefetch=1):
+        """
+        Обучение по схеме производитель/потребитель: пока текущая модель обучается в отдельном потоке,
+        данные следующих таймфреймов загружаются, валидируются и нарезаются на окна в event loop.
+        Очередь ограничена prefetch наборами данных.
+        """
+        queue = asyncio.Queue(maxsize=max(1, prefetch))
+        loop = asyncio.get_running_loop()
+
+        async def produce():
+            try:
+                for timeframe_type, timeframe, model_key in self._pending_model_keys():
+                    X, y, scaler = await self._prepare_timeframe_dataset(symbols, timeframe)
+                    await queue.put((model_key, timeframe, X, y, scaler))
+            except Exception as e:
+                await queue.put(e)
+                return
+            await queue.put(None)
+
+        producer = asyncio.create_task(produce())
         try:
-            all_data = []
-            tasks = [self.fetcher.fetch_historical_data_async(symbol, timeframe) for symbol in symbols]
-            results = await asyncio.gather(*tasks)
-            for data in results:
-                if not data.empty:
-                    all_data.append(data)
-
-            if not all_data:
-                raise ValueError("No data fetched for any symbol.")
-            combined_data = pd.concat(all_data)
-            X, y, scaler = LSTMModel.prepare_data(combined_data)
-            self.models[model_key].train(X, y)
-            log_event("AI Training", f"Training completed for timeframe: {timeframe}")
+            with ThreadPoolExecutor(max_workers=1, thread_name_prefix="ai-train") as executor:
+                while True:
+                    item = await queue.get()
+                    if item is None:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    model_key, timeframe, X, y, scaler = item
+                    self._start_model(model_key, timeframe)
+                    log_event("AI Training", "Starting training for timeframe: %s", timeframe)
+                    try:
+                        lstm = LSTMModel(input_shape=(60, 1), hyperparams=load_best_hyperparams(model_key))
+                        lstm.bundle = ModelBundle.from_scaler(scaler, 60, self._data_ranges.get(timeframe))
+                        # fit выполняется вне event loop, чтобы загрузка следующих данных не простаивала
+                        history = await loop.run_in_executor(executor, functools.partial(
+                            lstm.train, X, y, on_epoch_end=self._epoch_callback(model_key)
+                        ))
+                        # До _complete_model: с контрольной точкой он сразу сохраняет состояние с val_loss
+                        self._val_losses[model_key] = self._best_val_loss(history)
+                        self._complete_model(model_key, lstm)
+                    except Exception as e:
+                        log_event("AI Training", "Error during training for timeframe %s: %s", timeframe, e, level="error")
+                        raise
+                    log_event("AI Training", "Training completed for timeframe: %s", timeframe)
+        finally:
+            if not producer.done():
+                producer.cancel()
+
+    async def _train_multi_horizon(self, symbols):
+        """
+        Обучает одну общую сеть на окнах всех таймфреймов (индекс таймфрейма подается вторым входом).
+        """
+        datasets = {}
+        for timeframe_type, timeframe, model_key in self._iter_model_keys():
+            X, y, scaler = await self._prepare_timeframe_dataset(symbols, timeframe)
+            datasets[model_key] = (X, y)
+
+        log_event("AI Training", "Starting multi-horizon training for %s timeframes", len(datasets))
+        model = MultiHorizonModel(self.get_model_keys(), model_path=f"models/{MULTI_HORIZON_KEY}.keras")
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, model.train, datasets)
+        self.models = {MULTI_HORIZON_KEY: model}
+        log_event("AI Training", "Multi-horizon training completed")
+
+    async def _train_streaming(self, symbols):
+        """
+        Обучает модели на потоковых наборах данных: свечи каждой пары читаются из дискового кэша,
+        окна не пересекают границы пар, в памяти одновременно находится лишь несколько рядов.
+        """
+        loop = asyncio.get_running_loop()
+        for timeframe_type, timeframe, model_key in self._pending_model_keys():
+            self._start_model(model_key, timeframe)
+            log_event("AI Training", "Starting streaming training for timeframe: %s", timeframe)
+            try:
+                # Загрузка только обновляет дисковый кэш; сами фреймы не удерживаются
+                frames = await asyncio.gather(*[self.fetcher.fetch_historical_data_async(symbol, timeframe) for symbol in symbols])
+                frames = [frame for frame in frames if not frame.empty]
+                if frames:
+                    self._data_ranges[timeframe] = (min(frame.index.min() for frame in frames),
+                                                    max(frame.index.max() for frame in frames))
+                del frames
+                train_dataset, validation_dataset = make_streaming_dataset(
+                    symbols, timeframe, cache_dir=self.fetcher.cache_dir
+                )
+                lstm = LSTMModel(input_shape=(60, 1), hyperparams=load_best_hyperparams(model_key))
+                lstm.bundle = ModelBundle.per_series(60, self._data_ranges.get(timeframe))
+                history = await loop.run_in_executor(None, functools.partial(
+                    lstm.train_on_dataset, train_dataset, validation_dataset,
+                    on_epoch_end=self._epoch_callback(model_key)
+                ))
+                self._val_losses[model_key] = self._best_val_loss(history)
+                self._complete_model(model_key, lstm)
+            except Exception as e:
+                log_event("AI Training", "Error during training for timeframe %s: %s", timeframe, e, level="error")
+                raise
+            log_event("AI Training", "Training completed for timeframe: %s", timeframe)
+
+    async def _fetch_symbol_frames(self, symbols, timeframe, use_cache=True):
+        """
+        Загружает данные каждой пары по отдельности, приводит их к числовому виду,
+        сортирует по времени и отбрасывает пары, не прошедшие валидацию.
+        :param use_cache: Использовать дисковый кэш свечей (False — запросить свежие данные с биржи).
+        :return: Список DataFrame, по одному на каждую прошедшую валидацию пару.
+        """
+        all_data = []
+        tasks = [self.fetcher.fetch_historical_data_async(symbol, timeframe, use_cache=use_cache) for symbol in symbols]
+        results = await asyncio.gather(*tasks)
+        for symbol, data in zip(symbols, results):
+            data = self._clean_symbol_data(symbol, timeframe, data)
+            if data is not None:
+                all_data.append(data)
+
+        if not all_data:
+            raise ValueError("No data fetched for any symbol.")
+        return all_data
+
+    @staticmethod
+    def _clean_symbol_data(symbol, timeframe, data):
+        """
+        Приводит свечи пары к числовому виду, сортирует по времени и валидирует.
+        :return: DataFrame или None, если данных нет или они не прошли валидацию.
+        """
+        if data.empty:
+            return None
+        # Bybit отдает свечи строками и от новых к старым
+        data = data.astype({column: float for column in OHLCV_COLUMNS if column in data.columns}).sort_index()
+        if not validate_data(data, check_outliers=False):
+            log_event("AI Training", "Skipping %s (%s): data failed validation", symbol, timeframe, level="warning")
+            return None
+        return data
+
+    async def _refresh_window_cache(self, symbols, timeframe):
+        """
+        Дозагружает новые свечи каждой пары в хранилище свечей DataFetcher (fetch_incremental_async)
+        и дописывает в кэш подготовленных рядов только свечи, которых в нем еще нет.
+        Валидируются только новые свечи: сохраненная история уже проверена.
+        :return: Количество добавленных свечей.
+        """
+        results = await asyncio.gather(*[self.fetcher.fetch_incremental_async(symbol, timeframe, limit=None)
+                                         for symbol in symbols])
+        added = 0
+        for symbol, data in zip(symbols, results):
+            if data.empty:
+                continue
+            data = data.astype({column: float for column in OHLCV_COLUMNS if column in data.columns})
+            new_rows, append = self.window_cache.get_new_rows(timeframe, symbol, data)
+            new_rows = self._clean_symbol_data(symbol, timeframe, new_rows)
+            if new_rows is None:
+                continue
+            added += self.window_cache.update(timeframe, symbol, new_rows, append=append)
+        return added
+
+    async def _train_cached(self, symbols):
+        """
+        Обучает модели на memmap-кэше подготовленных рядов: загрузка, валидация и нормализация
+        выполняются только для новых свечей, окна читаются с диска батчами во время обучения.
+        Нормализация — MinMax по всем парам таймфрейма (сохраняется в бандле модели).
+        """
+        loop = asyncio.get_running_loop()
+        for timeframe_type, timeframe, model_key in self._pending_model_keys():
+            self._start_model(model_key, timeframe)
+            log_event("AI Training", "Starting cached training for timeframe: %s", timeframe)
+            try:
+                added = await self._refresh_window_cache(symbols, timeframe)
+                windows = self.window_cache.get_windows(timeframe, symbols, look_back=60)
+                if windows is None:
+                    raise ValueError(f"No cached data for timeframe {timeframe}.")
+                log_event("AI Training", "Window cache %s: %s new candles, %s windows", timeframe, added, len(windows))
+                self._data_ranges[timeframe] = (windows.first_candle, windows.last_candle)
+                train_dataset, validation_dataset = make_cached_windows_dataset(windows)
+
+                lstm = LSTMModel(input_shape=(60, 1), hyperparams=load_best_hyperparams(model_key))
+                lstm.bundle = ModelBundle(look_back=60, data_min=windows.scale[0], data_max=windows.scale[1],
+                                          first_candle=windows.first_candle.isoformat(),
+                                          last_candle=windows.last_candle.isoformat())
+                history = await loop.run_in_executor(None, functools.partial(
+                    lstm.train_on_dataset, train_dataset, validation_dataset,
+                    on_epoch_end=self._epoch_callback(model_key)
+                ))
+                self._val_losses[model_key] = self._best_val_loss(history)
+                self._complete_model(model_key, lstm)
+            except Exception as e:
+                log_event("AI Training", "Error during training for timeframe %s: %s", timeframe, e, level="error")
+                raise
+            log_event("AI Training", "Training completed for timeframe: %s", timeframe)
+
+    async def evaluate_walk_forward(self, symbols, n_folds=5, workers=None, tf_threads_per_worker=None,
+                                    min_train_fraction=0.5, expanding=False, epochs=None):
+        """
+        Walk-forward оценка моделей всех таймфреймов вне выборки (см. walk_forward.py).
+        Кэш подготовленных рядов сначала дополняется новыми свечами, фолды всех моделей выполняются
+        в одном пуле процессов.
+        :return: Отчет с направленной точностью и ошибкой по фолдам и разбивкой времени.
+        """
+        for timeframe in dict.fromkeys(timeframe for timeframe_type, timeframe, model_key in self._iter_model_keys()):
+            await self._refresh_window_cache(symbols, timeframe)
+
+        evaluator = WalkForwardEvaluator(self.window_cache.cache_dir, workers=workers,
+                                         tf_threads_per_worker=tf_threads_per_worker, n_folds=n_folds,
+                                         min_train_fraction=min_train_fraction, expanding=expanding, epochs=epochs)
+        tasks = []
+        for timeframe_type, timeframe, model_key in self._iter_model_keys():
+            tasks += evaluator.make_tasks(model_key, timeframe, symbols, load_best_hyperparams(model_key))
+        # Пул процессов блокирует поток, поэтому ждем его вне event loop
+        loop = asyncio.get_running_loop()
+        report = await loop.run_in_executor(None, evaluator.run, tasks)
+        self.last_evaluation_report = report
+        return report
+
+    async def _prepare_timeframe_dataset(self, symbols, timeframe):
+        """
+        Загружает данные таймфрейма и нарезает их на окна для обучения: окна строятся по каждой паре
+        отдельно, нормализация — общая для всех пар.
+        :return: X, y, scaler (нормализация сохраняется в бандле модели).
+        """
+        frames = await self._fetch_symbol_frames(symbols, timeframe)
+        self._data_ranges[timeframe] = (min(frame.index.min() for frame in frames),
+                                        max(frame.index.max() for frame in frames))
+        return LSTMModel.prepare_series_data(frames)
+
+    async def _train_parallel(self, symbols, workers, tf_threads_per_worker=None):
+        """
+        Обучает модели всех таймфреймов параллельно в отдельных процессах.
+        Данные загружаются в текущем процессе, обученные модели собираются в self.models.
+        :return: Отчет с длительностью каждой задачи и общим ускорением.
+        """
+        trainer = ParallelTrainer(workers=workers, tf_threads_per_worker=tf_threads_per_worker)
+        jobs, bundles = [], {}
+        for timeframe_type, timeframe, model_key in self._pending_model_keys():
+            X, y, scaler = await self._prepare_timeframe_dataset(symbols, timeframe)
+            bundles[model_key] = ModelBundle.from_scaler(scaler, 60, self._data_ranges.get(timeframe))
+            jobs.append(trainer.make_job(model_key, X, y, hyperparams=load_best_hyperparams(model_key)))
+
+        # Пул процессов блокирует поток, поэтому ждем его вне event loop
+        loop = asyncio.get_running_loop()
+        results, report = await loop.run_in_executor(None, trainer.run, jobs)
+
+        for model_key, result in results.items():
+            lstm = LSTMModel(input_shape=(60, 1), model_path=f"models/{model_key}.keras", build=False)
+            lstm.load_model(result["model_path"])
+            lstm.bundle = bundles[model_key]
+            lstm.last_trained = datetime.datetime.now()
+            self._val_losses[model_key] = result.get("val_loss")
+            self._complete_model(model_key, lstm)
+            try:
+                os.remove(result["model_path"])
+            except OSError as e:
+                logging.warning(f"Не удалось удалить временный файл {result['model_path']}: {e}")
+
+        if report["errors"]:
+            raise RuntimeError(f"Training failed for: {', '.join(sorted(report['errors']))}")
+        return report
+
+    def _record_full_training(self):
+        """Записывает метаданные полного обучения для каждой обученной модели таймфрейма."""
+        for timeframe_type, timeframe, model_key in self._iter_model_keys():
+            if model_key not in self.models or timeframe not in self._data_ranges:
+                continue
+            first_candle, last_candle = self._data_ranges[timeframe]
+            val_loss = self._val_losses.get(model_key)
+            self.model_state[model_key] = {
+                "mode": "full",
+                "trained_at": datetime.datetime.now().isoformat(),
+                "first_candle": first_candle.isoformat(),
+                "last_candle": last_candle.isoformat(),
+                "val_loss": None if val_loss is None or np.isnan(val_loss) else float(val_loss),
+            }
+
+    async def fine_tune_ai_on_all_timeframes(self, symbols, epochs=3, learning_rate=1e-4, tolerance=0.05,
+                                             validation_fraction=0.2, min_new_windows=20):
+        """
+        Инкрементальное дообучение: существующие модели дообучаются (warm start) только на свечах,
+        появившихся после их последнего обучения. Обновление принимается, только если потери
+        на отложенной части новых данных не выросли больше чем на tolerance.
+        :param symbols: Список торговых пар.
+        :param epochs: Количество эпох дообучения.
+        :param learning_rate: Скорость обучения при дообучении.
+        :param tolerance: Допустимый относительный рост потерь на валидации.
+        :param validation_fraction: Доля новых окон (самых свежих) для проверки.
+        :param min_new_windows: Минимум новых окон, при котором имеет смысл дообучать модель.
+        :return: Отчет по моделям: статус (accepted/rejected/skipped) и потери до/после.
+        """
+        if self.model_type != "per_timeframe":
+            raise ValueError("Incremental fine-tuning is supported only for per-timeframe models.")
+
+        log_event("AI Training", "Incremental fine-tuning started.")
+        report = {}
+        try:
+            for timeframe_type, timeframe, model_key in self._iter_model_keys():
+                report[model_key] = await self._fine_tune_model(
+                    symbols, timeframe, model_key, epochs, learning_rate, tolerance, validation_fraction, min_new_windows
+                )
+
+            if any(result["status"] == "accepted" for result in report.values()):
+                self.last_trained = datetime.datetime.now()
+            self._save_state()
+            self.last_training_report = report
+            accepted = sum(result["status"] == "accepted" for result in report.values())
+            log_event("AI Training", "Incremental fine-tuning completed: %s/%s models updated.", accepted, len(report))
+            return report
         except Exception as e:
-            log_event("AI Training", f"Error during training for timeframe {timeframe}: {e}", level="error")
+            log_ai_training_error(f"Error during fine-tuning: {e}")
             raise
 
+    async def _fine_tune_model(self, symbols, timeframe, model_key, epochs, learning_rate, tolerance,
+                               validation_fraction, min_new_windows):
+        """
+        Дообучает одну модель на новых свечах и решает, принять ли обновление.
+        """
+        meta = self.model_state.get(model_key, {})
+        # Дообучение всегда идет на Keras-модели, даже если прогноз обслуживает TFLite
+        base_model = get_model_registry("keras").get(model_key)
+        if base_model is None or not meta.get("last_candle"):
+            log_event("AI Training", "%s: no trained model or training metadata, full training required", model_key,
+                      level="warning")
+            return {"status": "skipped", "reason": "no trained model or metadata"}
+
+        # Весь сохраненный пропуск с последнего обучения, а не только последние свечи каждой пары
+        results = await asyncio.gather(*[self.fetcher.fetch_incremental_async(symbol, timeframe, limit=None)
+                                         for symbol in symbols])
+        last_candle = pd.Timestamp(meta["last_candle"])
+        # Окна строятся по каждой паре отдельно, чтобы ни одно не захватывало свечи двух пар
+        X_parts, y_parts, time_parts = [], [], []
+        for symbol, data in zip(symbols, results):
+            data = self._clean_symbol_data(symbol, timeframe, data)
+            if data is None:
+                continue
+            try:
+                X, y = base_model.prepare_training_data(data)
+            except ValueError:
+                continue  # Слишком короткая история пары
+            # Целевая свеча окна i — data.index[i + look_back]; берем только окна с новыми целями
+            target_times = data.index[len(data) - len(y):]
+            new_mask = np.asarray(target_times > last_candle)
+            X_parts.append(X[new_mask])
+            y_parts.append(y[new_mask])
+            time_parts.append(np.asarray(target_times[new_mask], dtype="datetime64[ns]"))
+        if not X_parts:
+            raise ValueError("No data fetched for any symbol.")
+
+        # Окна всех пар упорядочиваются по целевой свече: на проверку уходят самые свежие
+        target_times = np.concatenate(time_parts)
+        order = np.argsort(target_times, kind="stable")
+        X_new, y_new, target_times = np.concatenate(X_parts)[order], np.concatenate(y_parts)[order], target_times[order]
+        split = int(len(y_new) * (1 - validation_fraction))
+        if split < len(y_new):
+            # Окна с одной целевой свечей (разные пары) не делятся между обучением и проверкой
+            split = int(np.searchsorted(target_times, target_times[split], side="left"))
+        if len(y_new) < min_new_windows or split == 0:
+            log_event("AI Training", "%s: only %s new windows, skipping", model_key, len(y_new))
+            return {"status": "skipped", "reason": "not enough new candles", "new_windows": int(len(y_new))}
+
+        X_fit, y_fit, X_val, y_val = X_new[:split], y_new[:split], X_new[split:], y_new[split:]
+        # Метка last_candle сдвигается только до последней свечи, на которой модель реально дообучалась:
+        # окна проверки попадут в обучение при следующем запуске
+        trained_candle = pd.Timestamp(target_times[split - 1])
+
+        loop = asyncio.get_running_loop()
+        loss_before = await loop.run_in_executor(None, base_model.evaluate, X_val, y_val)
+        candidate = await loop.run_in_executor(None, functools.partial(
+            base_model.fine_tuned_copy, X_fit, y_fit, epochs=epochs, learning_rate=learning_rate
+        ))
+        loss_after = await loop.run_in_executor(None, candidate.evaluate, X_val, y_val)
+
+        result = {
+            "new_windows": int(len(y_new)),
+            "loss_before": loss_before,
+            "loss_after": loss_after,
+        }
+        if loss_after > loss_before * (1 + tolerance):
+            log_event("AI Training", "%s: update rejected (val loss %.6f -> %.6f)", model_key, loss_before, loss_after,
+                      level="warning")
+            result["status"] = "rejected"
+            return result
+
+        if candidate.bundle is not None:
+            candidate.bundle.last_candle = trained_candle.isoformat()
+        candidate.save_model(f"models/{model_key}.keras")
+        get_model_registry("keras").publish(model_key, candidate)
+        meta.update({
+            "mode": "incremental",
+            "trained_at": datetime.datetime.now().isoformat(),
+            "last_candle": trained_candle.isoformat(),
+            "val_loss": loss_after,
+        })
+        self.model_state[model_key] = meta
+        log_event("AI Training", "%s: update accepted (val loss %.6f -> %.6f)", model_key, loss_before, loss_after)
+        result["status"] = "accepted"
+        return result
+
     def _save_all_models(self):
         """
         Сохраняет все обученные модели в файлы.
         """
-        if not os.path.exists("models"):
-            os.makedirs("models")
-
         for model_key, lstm_model_obj in self.models.items():
+            # С контрольной точкой модель уже сохранена сразу после обучения
+            if self._checkpoint is not None and self._checkpoint.is_done(model_key):
+                continue
             try:
-                model_filename = f"models/{model_key}.keras"
-                lstm_model_obj.save_model(model_filename)
-                logging.info(f"Модель {model_key} сохранена в {model_filename}")
+                self._save_model(model_key, lstm_model_obj)
             except Exception as e:
                 logging.error(f"Ошибка сохранения модели {model_key}: {e}")
 
-    def predict_price_movement(self, data, timeframe_type="short_term"):
+    def _save_model(self, model_key, lstm_model_obj):
+        """Сохраняет модель в models/<model_key>.keras и публикует её в реестре."""
+        os.makedirs("models", exist_ok=True)
+        model_filename = f"models/{model_key}.keras"
+        lstm_model_obj.save_model(model_filename)
+        get_model_registry("keras").publish(model_key, lstm_model_obj)
+        logging.info(f"Модель {model_key} сохранена в {model_filename}")
+
+    @timed("predictor.predict")
+    def predict_price_movement(self, data, timeframe_type="short_term", symbol=None, data_timeframe=None):
         """
         Прогнозирует движение цены для всех таймфреймов, входящих в заданный тип.
-        Возвращает словарь вида { "1": число, "3": число, ... } – последняя точка прогноза.
+        Возвращает словарь вида { "1": число, "3": число, ... } – ожидаемое относительное изменение
+        цены следующей свечи к последнему закрытию (0.01 — рост на 1%, < 0 — падение).
+        :param symbol: Торговая пара данных; если указана, прогнозы кэшируются.
+        :param data_timeframe: Таймфрейм данных (например, '1h'), часть ключа кэша.
         """
         log_prediction_start()
         try:
             if data is None or data.empty:
                 raise ValueError("No data provided for prediction.")
 
+            if self.model_type == "multi_horizon":
+                predictions = self._predict_multi_horizon(data, timeframe_type, symbol, data_timeframe)
+                log_prediction_result(predictions)
+                return predictions
+
             predictions = {}
+            windows = {}  # Окна по параметрам нормализации: модели с одинаковым бандлом делят одно окно
             for timeframe in self.timeframes[timeframe_type]:
                 model_key = f"{timeframe_type}_{timeframe}"
-                if model_key in self.models:
-                    X, y, scaler = LSTMModel.prepare_data(data)
-                    prediction = self.models[model_key].predict(X)
-                    predictions[timeframe] = prediction[-1]
+                model = self._get_model(model_key)
+                if model is not None:
+                    cache_key = self._prediction_cache_key(self.registry, model_key, data, symbol, data_timeframe)
+                    cached = self.prediction_cache.get(cache_key) if cache_key is not None else None
+                    if cached is not None:
+                        predictions[timeframe] = cached
+                        continue
+                    X_last, scale = self._get_prediction_window(model, data, windows)
+                    prediction = model.predict_last(X_last)
+                    predictions[timeframe] = self._to_expected_change(prediction[-1], scale, data)
+                    if cache_key is not None:
+                        self.prediction_cache.put(cache_key, predictions[timeframe])
 
             log_prediction_result(predictions)
             return predictions
 
         except Exception as e:
             log_prediction_error(f"Error during prediction: {e}")
-            raise
\ No newline at end of file
+            raise
+
+    @timed("predictor.predict_batch")
+    def predict_price_movement_batch(self, data_by_symbol, timeframe_type="short_term", data_timeframe=None,
+                                     errors=None):
+        """
+        Прогноз для нескольких пар: окна всех пар объединяются в один батч, и каждая модель
+        вызывается один раз на таймфрейм (вместо одного вызова на пару).
+        Пара, для которой не удалось построить окно (например, мало свечей), исключается из батча
+        и не мешает прогнозу остальных пар.
+        :param data_by_symbol: Словарь {symbol: DataFrame}.
+        :param data_timeframe: Таймфрейм данных (например, '60'), часть ключа кэша.
+        :param errors: Словарь, в который записываются ошибки исключенных пар {symbol: сообщение}.
+        :return: Словарь {symbol: {таймфрейм: ожидаемое изменение}} (как predict_price_movement для каждой пары);
+                 для исключенных пар — пустой словарь.
+        """
+        failed = {}
+        if self.model_type == "multi_horizon":
+            predictions = {}
+            for symbol, data in data_by_symbol.items():
+                try:
+                    predictions[symbol] = self.predict_price_movement(data, timeframe_type, symbol, data_timeframe)
+                except Exception as e:
+                    failed[symbol] = str(e)
+                    predictions[symbol] = {}
+            if errors is not None:
+                errors.update(failed)
+            return predictions
+
+        log_prediction_start()
+        try:
+            predictions = {symbol: {} for symbol in data_by_symbol}
+            windows = {symbol: {} for symbol in data_by_symbol}
+            for timeframe in self.timeframes[timeframe_type]:
+                model_key = f"{timeframe_type}_{timeframe}"
+                model = self._get_model(model_key)
+                if model is None:
+                    continue
+                batch = []  # (symbol, cache_key, X_last, scale)
+                for symbol, data in data_by_symbol.items():
+                    if symbol in failed:
+                        continue
+                    cache_key = self._prediction_cache_key(self.registry, model_key, data, symbol, data_timeframe)
+                    cached = self.prediction_cache.get(cache_key) if cache_key is not None else None
+                    if cached is not None:
+                        predictions[symbol][timeframe] = cached
+                        continue
+                    try:
+                        X_last, scale = self._get_prediction_window(model, data, windows[symbol])
+                    except Exception as e:
+                        log_event("Prediction", "%s excluded from the batch: %s", symbol, e, level="warning")
+                        failed[symbol] = str(e)
+                        continue
+                    batch.append((symbol, cache_key, X_last, scale))
+                if not batch:
+                    continue
+
+                outputs = model.predict_last(np.concatenate([item[2] for item in batch], axis=0))
+                for (symbol, cache_key, X_last, scale), output in zip(batch, outputs):
+                    output = self._to_expected_change(output, scale, data_by_symbol[symbol])
+                    predictions[symbol][timeframe] = output
+                    if cache_key is not None:
+                        self.prediction_cache.put(cache_key, output)
+
+            for symbol in failed:
+                predictions[symbol] = {}
+            if errors is not None:
+                errors.update(failed)
+            log_prediction_result(predictions)
+            return predictions
+
+        except Exception as e:
+            log_prediction_error(f"Error during batch prediction: {e}")
+            raise
+
+    @staticmethod
+    def _get_prediction_window(model, data, windows):
+        """
+        Возвращает окно для прогноза модели, переиспользуя уже построенные окна.
+        Для моделей с бандлом применяется сохраненная нормализация (без fit), иначе — нормализация
+        по всему фрейму, как в prepare_data. В обоих случаях окно — look_back последних свечей.
+        :return: (X_last, scale): scale = (min, max) для обратного преобразования выхода модели в цену.
+        """
+        bundle = getattr(model, "bundle", None)
+        if bundle is None:
+            if None not in windows:
+                X_last, scaler = LSTMModel.prepare_last_window(data)
+                windows[None] = (X_last, (float(scaler.data_min_[0]), float(scaler.data_max_[0])))
+            return windows[None]
+        closes = data['close'].to_numpy(dtype=np.float32)
+        window_key = (bundle.get_scale(closes), bundle.look_back)
+        if window_key not in windows:
+            windows[window_key] = bundle.make_window(data)
+        return windows[window_key]
+
+    @staticmethod
+    def _to_expected_change(output, scale, data):
+        """
+        Переводит выход модели (нормализованная цена следующей свечи) в ожидаемое относительное
+        изменение цены к последнему закрытию — одинаково для моделей с бандлом и без него.
+        """
+        price = float(np.asarray(ModelBundle.inverse_transform(output, scale)).reshape(-1)[-1])
+        last_close = float(data['close'].iloc[-1])
+        return price / last_close - 1.0 if last_close else 0.0
+
+    def _predict_multi_horizon(self, data, timeframe_type, symbol=None, data_timeframe=None):
+        """
+        Прогноз всех таймфреймов типа одним батчевым проходом общей сети.
+        :return: Словарь {таймфрейм: ожидаемое изменение}, как у отдельных моделей.
+        """
+        model = self._get_multi_horizon_model()
+        if model is None:
+            return {}
+        cache_key = self._prediction_cache_key(
+            get_model_registry("keras"), MULTI_HORIZON_KEY, data, symbol, data_timeframe, variant=timeframe_type
+        )
+        cached = self.prediction_cache.get(cache_key) if cache_key is not None else None
+        if cached is not None:
+            return dict(cached)
+
+        X_last, scaler = LSTMModel.prepare_last_window(data)
+        scale = (float(scaler.data_min_[0]), float(scaler.data_max_[0]))
+        keys = {f"{timeframe_type}_{timeframe}": timeframe for timeframe in self.timeframes[timeframe_type]}
+        outputs = model.predict_keys(X_last, list(keys))
+        predictions = {keys[model_key]: self._to_expected_change(value, scale, data)
+                       for model_key, value in outputs.items()}
+        if cache_key is not None:
+            self.prediction_cache.put(cache_key, dict(predictions))
+        return predictions
@@ -0,0 +1,371 @@
+# ========== analysis_pipeline.py ==========
+
+import math
+import asyncio
+import logging
+import threading
+from utils.metrics import span, timed
+
+# Тяжелые зависимости (TensorFlow через ai_predictor, ccxt/aiohttp через data_fetcher, pandas через
+# индикаторы) импортируются при первом использовании: GUI импортирует этот модуль до показа окна.
+
+# Таймфрейм свечей сканера (интервал Bybit v5: "60" — 1 час, как '1h' в одиночном анализе)
+SCAN_TIMEFRAME = "60"
+
+TIMEFRAME_TYPES = {
+    "Краткосрочная торговля": "short_term",
+    "Среднесрочная торговля": "medium_term",
+}
+
+
+class AnalysisError(Exception):
+    """Ошибка анализа с сообщением для пользователя."""
+
+
+class AnalysisCancelled(Exception):
+    """Анализ отменен пользователем."""
+
+
+def to_json_compatible(value):
+    """
+    Приводит результат анализа (numpy-скаляры в прогнозах и т.п.) к типам JSON.
+    NaN и бесконечности (RSI плоского окна, индикатор на слишком короткой истории) заменяются на None:
+    литерал NaN — невалидный JSON.
+    """
+    if isinstance(value, dict):
+        return {str(key): to_json_compatible(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json_compatible(item) for item in value]
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def to_numeric_candles(data):
+    """
+    Приводит свечи к числовому виду и сортирует по времени (Bybit отдает их строками и от новых к старым).
+    Общий шаг одиночного анализа, сканера и HTTP-сервиса, чтобы индикаторы считались по одинаковым данным.
+    """
+    from ai_predictor import OHLCV_COLUMNS
+    return data.astype({column: float for column in OHLCV_COLUMNS if column in data.columns}).sort_index()
+
+
+def generate_recommendation(trend_signal, ema_signal, rsi_signal, macd_signal, predictions):
+    """
+    Генерирует общую рекомендацию.
+    Здесь пример логики подсчёта buy_signals / sell_signals + итоговая рекомендация.
+    """
+    buy_signals = 0
+    sell_signals = 0
+
+    if trend_signal == "Покупать":
+        buy_signals += 1
+    elif trend_signal == "Продавать":
+        sell_signals += 1
+
+    if ema_signal == "Покупать":
+        buy_signals += 1
+    elif ema_signal == "Продавать":
+        sell_signals += 1
+
+    if rsi_signal == "Перепроданность":
+        buy_signals += 1
+    elif rsi_signal == "Перекупленность":
+        sell_signals += 1
+
+    if macd_signal == "Покупать":
+        buy_signals += 1
+    elif macd_signal == "Продавать":
+        sell_signals += 1
+
+    # Прогнозы — ожидаемое изменение цены к последнему закрытию: голос ИИ — знак среднего изменения
+    if predictions and len(predictions) > 0:
+        avg_pred = sum(predictions.values()) / len(predictions)
+        if avg_pred > 0:
+            buy_signals += 1
+        else:
+            sell_signals += 1
+
+    if buy_signals > sell_signals:
+        return "Покупать"
+    elif sell_signals > buy_signals:
+        return "Продавать"
+    return "Держать"
+
+
+def calculate_trade_parameters(data, trend_signal, ema_signal, rsi_signal, macd_signal, predictions):
+    """
+    Рассчитывает параметры сделки: цену входа, тейк-профит, стоп-лосс и вероятность успеха.
+    :param data: Исторические данные.
+    :param trend_signal: Сигнал Supertrend.
+    :param ema_signal: Сигнал EMA.
+    :param rsi_signal: Сигнал RSI.
+    :param macd_signal: Сигнал MACD.
+    :param predictions: Словарь {таймфрейм: float}, прогнозы ИИ (ожидаемое изменение цены к последнему закрытию).
+    :return: Словарь с параметрами сделки.
+    """
+    try:
+        current_price = data['close'].iloc[-1]
+        entry_price = current_price
+
+        # Простой ATR (как пример)
+        atr = data['high'].iloc[-1] - data['low'].iloc[-1]
+        take_profit = entry_price + atr * 1.5
+        stop_loss = entry_price - atr * 1.0
+        success_probability = 0.7
+
+        if trend_signal == "Покупать":
+            take_profit = entry_price + atr * 2.0
+            stop_loss = entry_price - atr * 0.8
+            success_probability += 0.1
+        elif trend_signal == "Продавать":
+            take_profit = entry_price - atr * 2.0
+            stop_loss = entry_price + atr * 0.8
+            success_probability += 0.1
+
+        if rsi_signal == "Перепроданность":
+            success_probability += 0.05
+        elif rsi_signal == "Перекупленность":
+            success_probability -= 0.05
+
+        if macd_signal == "Покупать":
+            success_probability += 0.05
+        elif macd_signal == "Продавать":
+            success_probability -= 0.05
+
+        # Пример учёта среднего прогноза по всем таймфреймам
+        if predictions:
+            avg_prediction = sum(predictions.values()) / len(predictions)
+            if avg_prediction > 0:
+                success_probability += 0.03
+            else:
+                success_probability -= 0.03
+
+        success_probability = max(0.5, min(0.95, success_probability))
+
+        return {
+            "entry_price": round(entry_price, 2),
+            "take_profit": round(take_profit, 2),
+            "stop_loss": round(stop_loss, 2),
+            "success_probability": round(success_probability * 100, 2)
+        }
+    except Exception as e:
+        logging.error(f"Ошибка при расчете параметров сделки: {e}")
+        return {
+            "entry_price": None,
+            "take_profit": None,
+            "stop_loss": None,
+            "success_probability": None
+        }
+
+
+class AnalysisPipeline:
+    """
+    Анализ пары по шагам: загрузка данных, валидация, индикаторы, прогноз ИИ, рекомендация.
+    Не зависит от Tk: выполняется в рабочем потоке, прогресс сообщается через callback,
+    между шагами проверяется отмена. DataFetcher и AIPredictor создаются один раз и переиспользуются.
+    """
+    def __init__(self, headless=False, backend="keras", on_time_warning=None):
+        """
+        :param headless: Работа без GUI (cli.py): DataFetcher не открывает окна Tk.
+        :param backend: Бэкенд инференса AIPredictor ("keras" или "tflite").
+        :param on_time_warning: Показ предупреждения о рассинхронизации времени (см. DataFetcher).
+        """
+        self.headless = headless
+        self.backend = backend
+        self.on_time_warning = on_time_warning
+        self._fetcher = None
+        self._predictor = None
+        self._lock = threading.Lock()
+
+    def get_fetcher(self):
+        with self._lock:
+            if self._fetcher is None:
+                from data_fetcher import DataFetcher
+                self._fetcher = DataFetcher(headless=self.headless, on_time_warning=self.on_time_warning)
+            return self._fetcher
+
+    def get_predictor(self):
+        fetcher = self.get_fetcher()
+        with self._lock:
+            if self._predictor is None:
+                from ai_predictor import AIPredictor
+                self._predictor = AIPredictor(backend=self.backend, fetcher=fetcher)
+            return self._predictor
+
+    @timed("pipeline.run")
+    def run(self, symbol, timeframe_type="short_term", progress=None, is_cancelled=None):
+        """
+        Выполняет анализ пары.
+        :param symbol: Торговая пара.
+        :param timeframe_type: "short_term" или "medium_term".
+        :param progress: Функция progress(message), вызывается перед каждым шагом.
+        :param is_cancelled: Функция без аргументов; True — прервать анализ (AnalysisCancelled).
+        :return: Словарь с сигналами индикаторов, прогнозами, рекомендацией и параметрами сделки.
+        """
+        def step(message):
+            if is_cancelled is not None and is_cancelled():
+                raise AnalysisCancelled(symbol)
+            logging.info(message)
+            if progress is not None:
+                progress(message)
+
+        # Шаг 1: Загрузка данных
+        step("Шаг 1: Загрузка исторических данных...")
+        with span("pipeline.step", step="fetch"):
+            data = self.get_fetcher().fetch_historical_data(symbol, timeframe='1h', limit=200)
+        if data.empty:
+            raise AnalysisError("Не удалось загрузить данные. Проверьте интернет-соединение.")
+        data = to_numeric_candles(data)
+        logging.info("Данные успешно загружены.")
+
+        # Шаг 2: Валидация данных
+        step("Шаг 2: Валидация данных...")
+        from utils.validation_utils import validate_data
+        with span("pipeline.step", step="validate"):
+            valid = validate_data(data)
+        if not valid:
+            raise AnalysisError("Данные не прошли валидацию.")
+        logging.info("Данные прошли валидацию.")
+
+        # Шаг 3: Расчет индикаторов
+        step("Шаг 3: Расчет индикаторов...")
+        with span("pipeline.step", step="indicators"):
+            signals = self.compute_signals(data)
+        logging.info(f"Supertrend: {signals['trend_signal']}")
+        logging.info(f"EMA: {signals['ema_signal']}")
+        logging.info(f"RSI: {signals['rsi_signal']}")
+        logging.info(f"MACD: {signals['macd_signal']}")
+
+        # Шаг 4: Прогнозирование с помощью ИИ
+        step("Шаг 4: Прогнозирование с помощью ИИ...")
+        with span("pipeline.step", step="predict"):
+            predictions = self.get_predictor().predict_price_movement(
+                data, timeframe_type=timeframe_type, symbol=symbol, data_timeframe='1h'
+            )
+        if predictions is None or len(predictions) == 0:
+            raise AnalysisError("Не удалось выполнить прогноз.")
+        logging.info(f"Полученные прогнозы: {predictions}")
+
+        # Шаг 5: Формирование рекомендации
+        step("Шаг 5: Формирование рекомендации...")
+        with span("pipeline.step", step="recommend"):
+            return self.build_result(symbol, timeframe_type, data, signals, predictions)
+
+    @staticmethod
+    def compute_signals(data):
+        """Сигналы индикаторов Supertrend, EMA, RSI и MACD."""
+        from utils.indicators import Supertrend, EMA, RSI, MACD
+        return {
+            "trend_signal": Supertrend.get_signal(data),
+            "ema_signal": EMA.get_signal(data),
+            "rsi_signal": RSI.get_signal(data),
+            "macd_signal": MACD.get_signal(data),
+        }
+
+    @staticmethod
+    def build_result(symbol, timeframe_type, data, signals, predictions):
+        """Итог анализа пары: сигналы, прогнозы, рекомендация и параметры сделки."""
+        trade_params = calculate_trade_parameters(data, predictions=predictions, **signals)
+        return {
+            "symbol": symbol,
+            "timeframe_type": timeframe_type,
+            **signals,
+            "predictions": predictions,
+            "recommendation": generate_recommendation(predictions=predictions, **signals),
+            "trade_params": trade_params,
+            "confidence": trade_params["success_probability"],
+        }
+
+    def scan(self, symbols, timeframe_type="short_term", on_symbol=None, is_cancelled=None):
+        """
+        Анализирует все пары одновременно: данные загружаются асинхронно и параллельно,
+        а пары, загрузившиеся к моменту готовности, обрабатываются одной волной
+        (индикаторы и один батчевый прогноз на модель для всей волны).
+        :param symbols: Список торговых пар.
+        :param timeframe_type: "short_term" или "medium_term".
+        :param on_symbol: Функция on_symbol(result), вызывается по мере готовности каждой пары;
+                          для пар с ошибкой result содержит ключ "error".
+        :param is_cancelled: Функция без аргументов; True — прервать сканирование (AnalysisCancelled).
+        :return: Словарь {symbol: result}.
+        """
+        return asyncio.run(self._scan(symbols, timeframe_type, on_symbol, is_cancelled))
+
+    @timed("pipeline.scan")
+    async def _scan(self, symbols, timeframe_type, on_symbol, is_cancelled):
+        fetcher = self.get_fetcher()
+        self.get_predictor()
+        loop = asyncio.get_running_loop()
+        logging.info(f"Сканирование {len(symbols)} пар...")
+
+        # Сканеру нужны свежие свечи, поэтому дисковый кэш не используется (но обновляется)
+        fetches = {
+            asyncio.ensure_future(fetcher.fetch_historical_data_async(symbol, SCAN_TIMEFRAME, limit=200,
+                                                                      use_cache=False)): symbol
+            for symbol in symbols
+        }
+        pending = set(fetches)
+        results = {}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                if is_cancelled is not None and is_cancelled():
+                    raise AnalysisCancelled("scan")
+                ready = {fetches[future]: future.result() for future in done}
+                # Пока волна обрабатывается, остальные загрузки продолжаются и попадут в следующую волну
+                wave = await loop.run_in_executor(None, self.analyze_batch, ready, timeframe_type)
+                for symbol, result in wave.items():
+                    results[symbol] = result
+                    if on_symbol is not None:
+                        on_symbol(result)
+        finally:
+            for future in pending:
+                future.cancel()
+        logging.info(f"Сканирование завершено: {sum('error' not in result for result in results.values())} "
+                     f"из {len(symbols)} пар.")
+        return results
+
+    @timed("pipeline.analyze_batch")
+    def analyze_batch(self, data_by_symbol, timeframe_type="short_term", data_timeframe=SCAN_TIMEFRAME):
+        """
+        Валидация, индикаторы и один батчевый прогноз для уже загруженных свечей нескольких пар
+        (волна сканера или тик планировщика).
+        :param data_by_symbol: Словарь {symbol: DataFrame} (пустой DataFrame — загрузка не удалась).
+        :param data_timeframe: Таймфрейм свечей (часть ключа кэша прогнозов).
+        :return: Словарь {symbol: result}; для пар с ошибкой result содержит ключ "error".
+        """
+        from utils.validation_utils import validate_data
+
+        results, ready = {}, {}
+        for symbol, data in data_by_symbol.items():
+            if data.empty:
+                results[symbol] = {"symbol": symbol, "error": "Не удалось загрузить данные."}
+                continue
+            data = to_numeric_candles(data)
+            if not validate_data(data):
+                results[symbol] = {"symbol": symbol, "error": "Данные не прошли валидацию."}
+                continue
+            ready[symbol] = data
+        if not ready:
+            return results
+
+        signals = {symbol: self.compute_signals(data) for symbol, data in ready.items()}
+        errors = {}  # Пары, исключенные из батча прогноза (например, мало свечей)
+        try:
+            predictions = self.get_predictor().predict_price_movement_batch(
+                ready, timeframe_type=timeframe_type, data_timeframe=data_timeframe, errors=errors
+            )
+        except Exception as e:
+            logging.error(f"Ошибка прогноза при сканировании: {e}")
+            predictions = {}
+        for symbol, data in ready.items():
+            if not predictions.get(symbol):
+                error = "Не удалось выполнить прогноз."
+                if symbol in errors:
+                    error = f"Не удалось выполнить прогноз: {errors[symbol]}"
+                results[symbol] = {"symbol": symbol, "error": error}
+                continue
+            results[symbol] = self.build_result(symbol, timeframe_type, data, signals[symbol], predictions[symbol])
+        return results
@@ -0,0 +1,117 @@
+# ========== benchmarks/bench_logging.py ==========
+"""
+Накладные расходы одного вызова log_event в вызывающем потоке: прежняя схема (RotatingFileHandler
+и консоль прямо на корневом логгере, сообщение собирается f-строкой) против очереди
+(QueueHandler -> фоновый QueueListener, ленивое форматирование %). Измеряются записи включенного
+уровня (info), подавленного уровня (debug) и структурированный формат JSON.
+
+Консольный вывод направляется в os.devnull, файл лога пишется во временный каталог.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_logging --calls 20000
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from logging.handlers import RotatingFileHandler
+
+from utils.logging_utils import log_event, setup_logging, stop_logging
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+
+def legacy_log_event(event_type, message, level="info"):
+    """log_event до перехода на очередь: f-строка и синхронная запись во все обработчики."""
+    log_message = f"[{event_type}] {message}"
+    if level == "info":
+        logging.info(log_message)
+    else:
+        logging.debug(log_message)
+
+
+def reset_root():
+    stop_logging()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+
+
+def setup_legacy(log_file):
+    """Прежняя setup_logging: обработчики файла и консоли прямо на корневом логгере."""
+    file_handler = RotatingFileHandler(log_file, maxBytes=10 * 1024 * 1024, backupCount=5, encoding="utf-8")
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    logging.basicConfig(level=logging.INFO, handlers=[file_handler, console_handler])
+
+
+def measure(call, calls):
+    """:return: Среднее время одного вызова (мкс)."""
+    start = time.perf_counter()
+    for i in range(calls):
+        call(i)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def run_case(name, setup, call, calls, log_file):
+    reset_root()
+    setup(log_file)
+    per_call = measure(call, calls)
+    start = time.perf_counter()
+    reset_root()  # Для очереди — ожидание, пока фоновый поток допишет все записи
+    drain_ms = (time.perf_counter() - start) * 1000
+    print(f"  {name:<34}{per_call:>9.2f} us/call   (shutdown/drain {drain_ms:.0f} ms)")
+    return per_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-call overhead of log_event: direct handlers vs queued logging.")
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args()
+
+    payload = {"BTCUSDT": 0.0123, "ETHUSDT": -0.0042}
+    devnull = open(os.devnull, "w")
+    stderr, sys.stderr = sys.stderr, devnull  # StreamHandler() пишет в sys.stderr, взятый при создании
+    try:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            log_file = os.path.join(temp_dir, "bench.log")
+            queued = lambda path: setup_logging(log_file=path)
+            queued_json = lambda path: setup_logging(log_file=path, json_format=True)
+
+            results = {
+                "legacy info": run_case(
+                    "legacy, info", setup_legacy,
+                    lambda i: legacy_log_event("Prediction", f"Prediction {i} result: {payload}"),
+                    args.calls, log_file),
+                "queued info": run_case(
+                    "queued, info", queued,
+                    lambda i: log_event("Prediction", "Prediction %d result: %s", i, payload),
+                    args.calls, log_file),
+                "queued json": run_case(
+                    "queued, info, JSON", queued_json,
+                    lambda i: log_event("Prediction", "Prediction %d result: %s", i, payload),
+                    args.calls, log_file),
+                "legacy debug": run_case(
+                    "legacy, debug (suppressed)", setup_legacy,
+                    lambda i: legacy_log_event("Prediction", f"Prediction {i} result: {payload}", level="debug"),
+                    args.calls, log_file),
+                "queued debug": run_case(
+                    "queued, debug (suppressed)", queued,
+                    lambda i: log_event("Prediction", "Prediction %d result: %s", i, payload, level="debug"),
+                    args.calls, log_file),
+            }
+    finally:
+        sys.stderr = stderr
+        devnull.close()
+
+    print(f"Caller-side speedup, info: x{results['legacy info'] / results['queued info']:.1f}; "
+          f"suppressed debug: x{results['legacy debug'] / results['queued debug']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
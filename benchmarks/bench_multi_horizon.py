@@ -0,0 +1,103 @@
+# ========== benchmarks/bench_multi_horizon.py ==========
+"""
+Сравнение девяти отдельных LSTM по таймфреймам с одной multi-horizon сетью:
+время загрузки, память (параметры и прирост RSS) и задержка прогноза по всем таймфреймам.
+Если models/multi_horizon.keras еще не обучена, используется необученная сеть той же архитектуры
+(на время и память обучение не влияет).
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_multi_horizon --repeats 50
+"""
+
+import argparse
+import os
+import time
+import numpy as np
+from models.lstm_model import LSTMModel
+from models.multi_horizon_model import MultiHorizonModel, MULTI_HORIZON_KEY
+from benchmarks.bench_prediction import MODEL_KEYS, make_synthetic_data, time_call
+
+
+def get_rss_mb():
+    """Текущий RSS процесса в МБ (Linux, /proc); None, если недоступно."""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return None
+
+
+def load_per_timeframe():
+    models = {}
+    for key in MODEL_KEYS:
+        path = f"models/{key}.keras"
+        if os.path.exists(path):
+            lstm = LSTMModel(input_shape=(60, 1), model_path=path, build=False)
+            lstm.load_model()
+            models[key] = lstm
+    return models
+
+
+def load_multi_horizon():
+    path = f"models/{MULTI_HORIZON_KEY}.keras"
+    if os.path.exists(path):
+        model = MultiHorizonModel(MODEL_KEYS, model_path=path, build=False)
+        model.load_model()
+    else:
+        model = MultiHorizonModel(MODEL_KEYS, model_path=path)
+    return model
+
+
+def measure_load(loader):
+    rss_before = get_rss_mb()
+    start = time.perf_counter()
+    result = loader()
+    load_ms = (time.perf_counter() - start) * 1000
+    rss_after = get_rss_mb()
+    rss_delta = rss_after - rss_before if rss_before is not None and rss_after is not None else float("nan")
+    return result, load_ms, rss_delta
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-timeframe LSTMs against one multi-horizon model.")
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    data = make_synthetic_data()
+    X_last, scaler = LSTMModel.prepare_last_window(data)
+
+    # Multi-horizon загружается первой: инициализация рантайма TF попадает в её прирост RSS,
+    # поэтому оценка памяти для неё консервативная (завышенная)
+    multi, multi_load_ms, multi_rss = measure_load(load_multi_horizon)
+    separate, separate_load_ms, separate_rss = measure_load(load_per_timeframe)
+    if not separate:
+        raise SystemExit("No per-timeframe models found in models/.")
+    keys = list(separate)
+
+    def predict_separate():
+        return {key: model.predict_last(X_last)[-1] for key, model in separate.items()}
+
+    def predict_multi():
+        return multi.predict_keys(X_last, keys)
+
+    predict_separate()
+    predict_multi()
+    separate_ms = time_call(predict_separate, args.repeats)
+    multi_ms = time_call(predict_multi, args.repeats)
+
+    separate_params = sum(model.model.count_params() for model in separate.values())
+    multi_params = multi.model.count_params()
+
+    print(f"{'':<22}{'models':>8}{'load ms':>10}{'params':>10}{'RSS +MB':>10}{'predict ms':>12}")
+    print(f"{'per-timeframe LSTMs':<22}{len(separate):>8}{separate_load_ms:>10.0f}{separate_params:>10}"
+          f"{separate_rss:>10.1f}{separate_ms:>12.2f}")
+    print(f"{'multi-horizon':<22}{1:>8}{multi_load_ms:>10.0f}{multi_params:>10}"
+          f"{multi_rss:>10.1f}{multi_ms:>12.2f}")
+    print(f"Inference speedup: x{separate_ms / multi_ms:.1f}, parameters: x{separate_params / multi_params:.1f} fewer")
+    if not multi.is_trained:
+        print("Note: models/multi_horizon.keras not found, an untrained network was used.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# ========== benchmarks/bench_prediction.py ==========
+"""
+Сравнение задержки прогнозирования: старый путь (prepare_data + model.predict по всем окнам)
+и новый (одно последнее окно + прямой вызов скомпилированной модели).
+Окно нового пути сдвинуто на одну свечу (включает последнюю свечу — прогноз следующей),
+поэтому точность прямого вызова сверяется с model.predict на том же окне.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_prediction --repeats 20
+"""
+
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+from models.lstm_model import LSTMModel
+
+MODEL_KEYS = [
+    "short_term_1", "short_term_3", "short_term_5", "short_term_15", "short_term_30", "short_term_60",
+    "medium_term_60", "medium_term_240", "medium_term_D",
+]
+
+
+def make_synthetic_data(rows=200, seed=42):
+    """Создает синтетический фрейм свечей (как fetch_historical_data с limit=200)."""
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, rows))
+    index = pd.date_range("2024-01-01", periods=rows, freq="h")
+    return pd.DataFrame({"open": close, "high": close + 1, "low": close - 1, "close": close, "volume": 1.0}, index=index)
+
+
+def legacy_predict(models, data):
+    """Старый путь: prepare_data для каждой модели и predict по всем окнам."""
+    predictions = {}
+    for key, model in models.items():
+        X, y, scaler = LSTMModel.prepare_data(data)
+        predictions[key] = model.model.predict(X, verbose=0)[-1]
+    return predictions
+
+
+def fast_predict(models, data):
+    """Новый путь: одно последнее окно и прямой вызов модели."""
+    predictions = {}
+    X_last, scaler = LSTMModel.prepare_last_window(data)
+    for key, model in models.items():
+        predictions[key] = model.predict_last(X_last)[-1]
+    return predictions
+
+
+def time_call(func, repeats):
+    """Возвращает медианное время вызова в миллисекундах."""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark AIPredictor inference paths.")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--rows", type=int, default=200)
+    args = parser.parse_args()
+
+    models = {}
+    for key in MODEL_KEYS:
+        path = f"models/{key}.keras"
+        if os.path.exists(path):
+            lstm = LSTMModel(input_shape=(60, 1), model_path=path)
+            lstm.load_model()
+            models[key] = lstm
+    if not models:
+        raise SystemExit("No models found in models/.")
+
+    data = make_synthetic_data(args.rows)
+
+    # Прогрев: трассировка tf.function и инициализация predict
+    legacy_predict(models, data)
+    fast = fast_predict(models, data)
+    X_last, scaler = LSTMModel.prepare_last_window(data)
+    max_diff = max(float(np.abs(models[k].model.predict(X_last, verbose=0)[-1] - fast[k]).max()) for k in models)
+
+    legacy_ms = time_call(lambda: legacy_predict(models, data), args.repeats)
+    fast_ms = time_call(lambda: fast_predict(models, data), args.repeats)
+
+    print(f"Models: {len(models)}, rows: {args.rows}, repeats: {args.repeats}")
+    print(f"Legacy (prepare_data + predict): {legacy_ms:.1f} ms")
+    print(f"Last window + direct call:       {fast_ms:.1f} ms")
+    print(f"Speedup: x{legacy_ms / fast_ms:.1f}, max abs difference: {max_diff:.2e}")
+
+
+if __name__ == "__main__":
+    main()
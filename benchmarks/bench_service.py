@@ -0,0 +1,107 @@
+# ========== benchmarks/bench_service.py ==========
+"""
+Нагрузочный тест HTTP-сервиса (server.py): N одновременных клиентов отправляют запросы
+к /predict, /indicators или /analysis; выводятся пропускная способность, перцентили задержки
+и статистика сервиса (средний размер батча инференса, попадания в кэш свечей).
+
+По умолчанию сервис запускается в этом же процессе на синтетических свечах (биржа запрашивается
+только для проверки времени при создании DataFetcher); с --url тестируется уже запущенный сервис.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_service --clients 32 --requests 20 --endpoint predict
+    python -m benchmarks.bench_service --url http://127.0.0.1:8080 --symbols BTCUSDT ETHUSDT
+"""
+
+import argparse
+import asyncio
+import time
+import zlib
+import numpy as np
+import aiohttp
+from aiohttp import web
+from benchmarks.bench_prediction import make_synthetic_data
+
+DEFAULT_SYMBOLS = ["BTCUSDT", "ETHUSDT", "SOLUSDT", "XRPUSDT", "ADAUSDT", "DOGEUSDT", "BNBUSDT", "LTCUSDT"]
+
+
+async def synthetic_fetch(symbol, timeframe):
+    """Синтетические свечи вместо Bybit: свой ряд для каждой пары."""
+    return make_synthetic_data(seed=zlib.crc32(f"{symbol}_{timeframe}".encode()))
+
+
+async def start_local_service(args):
+    from server import AnalysisService, CandleCache
+
+    service = AnalysisService(candles=CandleCache(synthetic_fetch, ttl=args.candle_ttl), workers=args.workers,
+                              batch_window=args.batch_window_ms / 1000, max_batch=args.max_batch,
+                              model_concurrency=args.model_concurrency)
+    runner = web.AppRunner(service.make_app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+async def run_client(session, url, symbols, requests_count, offset, latencies, statuses):
+    for i in range(requests_count):
+        symbol = symbols[(offset + i) % len(symbols)]
+        start = time.perf_counter()
+        async with session.get(url.format(symbol=symbol)) as response:
+            await response.read()
+            statuses[response.status] = statuses.get(response.status, 0) + 1
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def run_load(args):
+    runner = None
+    base_url = args.url
+    if base_url is None:
+        runner, base_url = await start_local_service(args)
+    query = "" if args.endpoint == "indicators" else f"?strategy={args.strategy}"
+    url = f"{base_url.rstrip('/')}/{args.endpoint}/{{symbol}}{query}"
+
+    try:
+        async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=args.clients)) as session:
+            # Прогрев: загрузка свечей и моделей, трассировка инференса
+            await asyncio.gather(*(run_client(session, url, args.symbols, 1, i, [], {})
+                                   for i in range(len(args.symbols))))
+            latencies, statuses = [], {}
+            start = time.perf_counter()
+            await asyncio.gather(*(run_client(session, url, args.symbols, args.requests, i, latencies, statuses)
+                                   for i in range(args.clients)))
+            elapsed = time.perf_counter() - start
+            async with session.get(f"{base_url.rstrip('/')}/stats") as response:
+                stats = await response.json()
+    finally:
+        if runner is not None:
+            await runner.cleanup()
+
+    total = len(latencies)
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    print(f"Endpoint: /{args.endpoint}, clients: {args.clients}, requests: {total}, symbols: {len(args.symbols)}")
+    print(f"Throughput: {total / elapsed:.1f} req/s, latency p50 {p50:.1f} ms, p95 {p95:.1f} ms, p99 {p99:.1f} ms")
+    print(f"Status codes: {dict(sorted(statuses.items()))}")
+    print(f"Batching: {stats['batching']}")
+    print(f"Candle cache: {stats['candles']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for the analysis HTTP service.")
+    parser.add_argument("--url", default=None, help="Base URL of a running service (default: start one in-process).")
+    parser.add_argument("--endpoint", choices=("predict", "indicators", "analysis"), default="predict")
+    parser.add_argument("--strategy", choices=("short_term", "medium_term"), default="short_term")
+    parser.add_argument("--symbols", nargs="+", default=DEFAULT_SYMBOLS)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=20, help="Requests per client.")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-window-ms", type=float, default=10.0)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--model-concurrency", type=int, default=1)
+    parser.add_argument("--candle-ttl", type=float, default=30.0)
+    args = parser.parse_args()
+    asyncio.run(run_load(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# ========== benchmarks/bench_startup.py ==========
+"""
+Профиль холодного старта GUI: время импорта gui.trading_app в новом процессе (python -X importtime),
+самые дорогие модули и проверка, что тяжелые зависимости (TensorFlow, sklearn, ccxt, aiohttp, pandas,
+backtrader) не импортируются до показа окна. С --window дополнительно измеряется время до первой
+отрисовки окна (нужен дисплей).
+
+Скрипт служит проверкой бюджета старта: код возврата 1, если импорт (или первая отрисовка)
+медленнее бюджета или до показа окна импортирована тяжелая зависимость.
+
+Запуск из корня репозитория:
+    python -m benchmarks.bench_startup --budget-ms 1000
+    python -m benchmarks.bench_startup --window --window-budget-ms 2000
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ["tensorflow", "keras", "sklearn", "ccxt", "aiohttp", "pandas", "backtrader"]
+TARGET_MODULE = "gui.trading_app"
+
+WINDOW_SCRIPT = """
+import os, time
+start = time.perf_counter()
+from gui.trading_app import TradingApp
+app = TradingApp()
+app.update()
+print(int((time.perf_counter() - start) * 1000))
+# Фоновый прогрев моделей не дожидаемся: важно только время до первой отрисовки
+os._exit(0)
+"""
+
+
+def run_python(args):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return subprocess.run([sys.executable, *args], cwd=root, capture_output=True, text=True, check=True)
+
+
+def parse_importtime(stderr):
+    """
+    Разбирает вывод -X importtime.
+    :return: Список (module, self_us, cumulative_us).
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        entries.append((name.strip(), int(self_us), int(cumulative_us)))
+    return entries
+
+
+def profile_import():
+    """:return: (время импорта целевого модуля в мс, записи importtime)."""
+    entries = parse_importtime(run_python(["-X", "importtime", "-c", f"import {TARGET_MODULE}"]).stderr)
+    total_us = next(cumulative for name, _, cumulative in entries if name == TARGET_MODULE)
+    return total_us / 1000, entries
+
+
+def find_heavy_imports():
+    code = (f"import sys, json, {TARGET_MODULE}; "
+            f"print(json.dumps(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules)))")
+    return json.loads(run_python(["-c", code]).stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start import profile and startup budget check for the GUI.")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, default=1000.0, help="Budget for importing gui.trading_app.")
+    parser.add_argument("--window", action="store_true", help="Also measure time to the first painted window.")
+    parser.add_argument("--window-budget-ms", type=float, default=2000.0)
+    args = parser.parse_args()
+
+    timings, entries = [], []
+    for _ in range(args.repeats):
+        import_ms, entries = profile_import()
+        timings.append(import_ms)
+    import_ms = statistics.median(timings)
+
+    print(f"Import of {TARGET_MODULE}: median {import_ms:.0f} ms, min {min(timings):.0f} ms ({args.repeats} runs)")
+    print(f"Top {args.top} modules by self time:")
+    for name, self_us, cumulative_us in sorted(entries, key=lambda entry: entry[1], reverse=True)[:args.top]:
+        print(f"  {name:<50}{self_us / 1000:>8.1f} ms self{cumulative_us / 1000:>10.1f} ms cumulative")
+
+    failures = []
+    heavy = find_heavy_imports()
+    if heavy:
+        failures.append(f"heavy modules imported before the window is shown: {', '.join(heavy)}")
+    if import_ms > args.budget_ms:
+        failures.append(f"import took {import_ms:.0f} ms, budget {args.budget_ms:.0f} ms")
+
+    if args.window:
+        window_ms = statistics.median(int(run_python(["-c", WINDOW_SCRIPT]).stdout.split()[-1])
+                                      for _ in range(args.repeats))
+        print(f"Time to first painted window: median {window_ms:.0f} ms")
+        if window_ms > args.window_budget_ms:
+            failures.append(f"first paint took {window_ms:.0f} ms, budget {args.window_budget_ms:.0f} ms")
+
+    if failures:
+        for failure in failures:
+            print(f"FAIL: {failure}")
+        sys.exit(1)
+    print("Startup budget OK")
+
+
+if __name__ == "__main__":
+    main()
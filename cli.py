@@ -0,0 +1,147 @@
+# ========== cli.py ==========
+
+import sys
+import json
+import time
+import signal
+import asyncio
+import logging
+import argparse
+import threading
+from datetime import datetime, timezone
+from analysis_pipeline import AnalysisPipeline, AnalysisError, AnalysisCancelled, to_json_compatible
+from utils.logging_utils import setup_logging
+from utils import metrics
+
+# Модуль не импортирует GUI (gui/, tkinter): работает на серверах и в контейнерах без дисплея.
+# TensorFlow загружается только при первом прогнозе (analysis_pipeline импортирует его лениво).
+
+if sys.platform == 'win32':
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+STRATEGIES = ("short_term", "medium_term")
+
+
+def make_record(result, strategy):
+    """
+    Запись JSON Lines по результату анализа пары.
+    :param result: Результат AnalysisPipeline.run/scan (или {"symbol", "error"}).
+    :param strategy: "short_term" или "medium_term".
+    :return: Словарь, сериализуемый в JSON.
+    """
+    record = {"timestamp": datetime.now(timezone.utc).isoformat(), "strategy": strategy}
+    record.update(to_json_compatible({key: value for key, value in result.items() if key != "timeframe_type"}))
+    return record
+
+
+class JsonLinesWriter:
+    """Пишет записи по одной строке JSON в stdout или файл (дописывая) со сбросом буфера после каждой."""
+    def __init__(self, path=None):
+        self._file = open(path, "a", encoding="utf-8") if path else sys.stdout
+        self._owned = bool(path)
+        self._lock = threading.Lock()
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        if self._owned:
+            self._file.close()
+
+
+def run_once(pipeline, symbols, strategies, writer, concurrent=True, is_cancelled=None):
+    """
+    Один проход анализа: все пары по всем стратегиям.
+    :param concurrent: True — AnalysisPipeline.scan (параллельная загрузка и батчевый прогноз),
+                       False — AnalysisPipeline.run по каждой паре последовательно.
+    :return: Количество пар с ошибкой.
+    """
+    errors = 0
+    for strategy in strategies:
+        if concurrent:
+            def on_symbol(result, strategy=strategy):
+                writer.write(make_record(result, strategy))
+
+            try:
+                results = pipeline.scan(symbols, strategy, on_symbol=on_symbol, is_cancelled=is_cancelled)
+            except AnalysisCancelled:
+                return errors
+            except Exception as e:
+                logging.error(f"Ошибка сканирования: {e}")
+                for symbol in symbols:
+                    writer.write(make_record({"symbol": symbol, "error": f"Ошибка анализа: {e}"}, strategy))
+                errors += len(symbols)
+                continue
+            errors += sum("error" in result for result in results.values())
+            continue
+
+        for symbol in symbols:
+            try:
+                result = pipeline.run(symbol, strategy, is_cancelled=is_cancelled)
+            except AnalysisCancelled:
+                return errors
+            except AnalysisError as e:
+                result = {"symbol": symbol, "error": str(e)}
+            except Exception as e:
+                logging.error(f"Ошибка анализа {symbol}: {e}")
+                result = {"symbol": symbol, "error": f"Ошибка анализа: {e}"}
+            if "error" in result:
+                errors += 1
+            writer.write(make_record(result, strategy))
+    return errors
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Headless analysis: fetch, validate, indicators, AI prediction and recommendation "
+                    "for each symbol, written as JSON Lines.")
+    parser.add_argument("--symbols", nargs="+", required=True, help="Trading pairs, e.g. BTCUSDT ETHUSDT.")
+    parser.add_argument("--strategies", nargs="+", choices=STRATEGIES, default=["short_term"])
+    parser.add_argument("--output", default=None, help="Append records to this file instead of stdout.")
+    parser.add_argument("--sequential", action="store_true",
+                        help="Analyze symbols one by one instead of a concurrent scan.")
+    parser.add_argument("--backend", choices=("keras", "tflite"), default="keras")
+    parser.add_argument("--daemon", action="store_true", help="Repeat the analysis every --interval seconds.")
+    parser.add_argument("--interval", type=float, default=3600.0)
+    parser.add_argument("--log-file", default="logs/cli.log")
+    parser.add_argument("--log-json", action="store_true", help="Write log records as JSON lines.")
+    metrics.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    # Логи идут в файл и stderr: stdout остается чистым потоком JSON Lines
+    setup_logging(log_file=args.log_file, json_format=args.log_json)
+    metrics.configure(args.metrics_port, args.metrics_file)
+
+    stop_event = threading.Event()
+
+    def request_stop(signum, frame):
+        logging.info(f"Получен сигнал {signum}, остановка после текущего шага.")
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, request_stop)
+
+    pipeline = AnalysisPipeline(headless=True, backend=args.backend)
+    writer = JsonLinesWriter(args.output)
+    errors = 0
+    try:
+        while not stop_event.is_set():
+            started = time.monotonic()
+            errors = run_once(pipeline, args.symbols, args.strategies, writer,
+                              concurrent=not args.sequential, is_cancelled=stop_event.is_set)
+            if not args.daemon:
+                break
+            elapsed = time.monotonic() - started
+            logging.info(f"Проход завершен за {elapsed:.1f} с, ошибок: {errors}.")
+            stop_event.wait(max(0.0, args.interval - elapsed))
+    finally:
+        writer.close()
+    return 1 if errors and not args.daemon else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,21 +5,51 @@ import pandas as pd
 import ccxt
 import logging
 from datetime import datetime, timezone
-import tkinter as tk
-from tkinter import messagebox
 import aiohttp
 import asyncio
 import json
 from typing import Optional, Dict, List
 from utils.logging_utils import log_data_fetching, log_data_fetching_error
+from utils.metrics import timed, inc
+
+# Длительность свечи для интервалов Bybit v5 (секунды)
+TIMEFRAME_SECONDS = {
+    "1": 60, "3": 180, "5": 300, "15": 900, "30": 1800,
+    "60": 3600, "120": 7200, "240": 14400, "360": 21600, "720": 43200,
+    "D": 86400, "W": 604800,
+}
+# Bybit v5 отдает не больше 1000 свечей за запрос
+MAX_KLINES_PER_REQUEST = 1000
+# Сколько последних свечей пары хранится в кэше (DataFetcher._update_candle_store)
+CANDLE_STORE_MAX_ROWS = 5000
+
+
+def timeframe_to_seconds(timeframe: str) -> int:
+    """
+    Возвращает длительность свечи в секундах: таймфрейм Bybit v5 ('60', 'D') или ccxt ('1h', '4h').
+    :raises ValueError: Неизвестный таймфрейм.
+    """
+    seconds = TIMEFRAME_SECONDS.get(str(timeframe))
+    if seconds is not None:
+        return seconds
+    try:
+        return ccxt.Exchange.parse_timeframe(str(timeframe))
+    except Exception:
+        raise ValueError(f"Unknown timeframe: {timeframe}")
+
 
 class DataFetcher:
-    def __init__(self, cache_dir: str = "data_cache"):
+    def __init__(self, cache_dir: str = "data_cache", headless: bool = False, on_time_warning=None):
         """
         Инициализация DataFetcher с подключением к Bybit.
         :param cache_dir: Директория для кэширования данных.
+        :param headless: Работа без GUI: предупреждения пишутся только в лог, Tk не используется.
+        :param on_time_warning: Функция on_time_warning(time_difference), показывающая предупреждение
+                                о рассинхронизации времени вместо окна Tk (GUI передает ее в главный поток Tk).
         """
         self.cache_dir = cache_dir
+        self.headless = headless
+        self.on_time_warning = on_time_warning
         self._ensure_cache_dir_exists()
 
         try:
@@ -60,6 +90,7 @@ class DataFetcher:
         """
         return os.path.join(self.cache_dir, f"{symbol}_{timeframe}.json")
 
+    @timed("fetcher.cache_load")
     def _load_from_cache(self, symbol: str, timeframe: str) -> Optional[pd.DataFrame]:
         """
         Загружает данные из кэша, если они есть.
@@ -88,6 +119,21 @@ class DataFetcher:
                 logging.error(f"Error loading cache for {symbol} ({timeframe}): {e}")
         return None
 
+    @staticmethod
+    def _is_cache_fresh(data: pd.DataFrame, timeframe: str, limit: int) -> bool:
+        """
+        Проверяет, можно ли отдать данные кэша без запроса к бирже: в кэше не меньше limit свечей,
+        и последняя из них не старше одного периода таймфрейма (т.е. после нее не закрылась ни одна свеча).
+        :param data: Данные кэша.
+        :param timeframe: Таймфрейм (Bybit v5 или ccxt).
+        :param limit: Требуемое количество свечей.
+        """
+        if data.empty or len(data) < limit:
+            return False
+        now = pd.Timestamp.now(tz="UTC").tz_localize(None)
+        return (now - data.index.max()).total_seconds() < timeframe_to_seconds(timeframe)
+
+    @timed("fetcher.cache_save")
     def _save_to_cache(self, symbol: str, timeframe: str, data: pd.DataFrame):
         """
         Сохраняет данные в кэш.
@@ -97,7 +143,8 @@ class DataFetcher:
         """
         cache_file = self._get_cache_file_path(symbol, timeframe)
         try:
-            data.to_json(cache_file, orient='records')
+            # Временная метка хранится в индексе — сохраняем её как поле записи (в миллисекундах)
+            data.reset_index().to_json(cache_file, orient='records')
             logging.info(f"Saved data to cache for {symbol} ({timeframe}).")
         except Exception as e:
             logging.error(f"Error saving cache for {symbol} ({timeframe}): {e}")
@@ -125,6 +172,16 @@ class DataFetcher:
         :param time_difference: Разница во времени в секундах.
         """
         try:
+            logging.error(f"Local time differs from server time by {time_difference:.2f} seconds.")
+            if self.on_time_warning is not None:
+                # DataFetcher может создаваться в рабочем потоке: окно показывает владелец Tk
+                self.on_time_warning(time_difference)
+                return
+            if self.headless:
+                return
+            # Tk импортируется только для окна предупреждения: без GUI модуль работает без tkinter
+            import tkinter as tk
+            from tkinter import messagebox
             root = tk.Tk()
             root.withdraw()  # Скрыть главное окно
             messagebox.showwarning(
@@ -158,45 +215,145 @@ class DataFetcher:
             logging.error(f"Error checking data delay: {e}")
             return False
 
-    async def fetch_historical_data_async(self, symbol: str, timeframe: str = '60', limit: int = 200) -> pd.DataFrame:
+    @timed("fetcher.fetch_async")
+    async def fetch_historical_data_async(self, symbol: str, timeframe: str = '60', limit: int = 200,
+                                          use_cache: bool = True) -> pd.DataFrame:
         """
         Получает исторические данные для указанного символа и таймфрейма асинхронно.
+        Запрошенные свечи дописываются в хранилище свечей пары так же, как в fetch_incremental_async.
         :param symbol: Торговая пара (например, BTCUSDT).
         :param timeframe: Таймфрейм (например, '1' для 1 минуты, '60' для 1 часа).
         :param limit: Количество свечей.
-        :return: DataFrame с данными OHLCV.
+        :param use_cache: Возвращать данные из кэша, если они актуальны (False — всегда запрашивать биржу).
+        :return: DataFrame с данными OHLCV, отсортированный по времени.
         """
         try:
-            # Проверяем кэш
-            cached_data = self._load_from_cache(symbol, timeframe)
-            if cached_data is not None:
-                return cached_data
-
-            async with aiohttp.ClientSession() as session:
-                url = f"https://api.bybit.com/v5/market/kline?category=spot&symbol={symbol}&interval={timeframe}&limit={limit}"
-                async with session.get(url) as response:
-                    if response.status != 200:
-                        error_message = await response.text()
-                        raise ValueError(f"HTTP {response.status}: {error_message}")
-                    data = await response.json()
-                    if data['retCode'] != 0:
-                        raise ValueError(f"Error fetching data: {data['retMsg']}")
-                    ohlcv = data['result']['list']
-                    df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume', 'extra'])
-                    df['timestamp'] = pd.to_datetime(df['timestamp'].astype(float), unit='ms')
-                    df.set_index('timestamp', inplace=True)
+            # Проверяем кэш: устаревшие данные (закрылась новая свеча) запрашиваются заново
+            if use_cache:
+                cached_data = self._load_from_cache(symbol, timeframe)
+                if cached_data is not None and self._is_cache_fresh(cached_data, timeframe, limit):
+                    inc("candle_cache_requests", result="hit")
+                    return cached_data.sort_index().iloc[-limit:]
+                inc("candle_cache_requests", result="miss")
 
-                    # Сохраняем данные в кэш
-                    self._save_to_cache(symbol, timeframe, df)
-
-                    log_data_fetching(symbol, timeframe)
-                    return df
+            data = await self._update_candle_store(symbol, timeframe, limit)
+            log_data_fetching(symbol, timeframe)
+            return data.iloc[-limit:]
         except Exception as e:
             log_data_fetching_error(symbol, timeframe, e)
             return pd.DataFrame()
         finally:
             await asyncio.sleep(1)  # Задержка между запросами
 
+    @timed("fetcher.fetch_incremental")
+    async def fetch_incremental_async(self, symbol: str, timeframe: str = '60', limit: Optional[int] = 200,
+                                      max_rows: int = CANDLE_STORE_MAX_ROWS) -> pd.DataFrame:
+        """
+        Дозагружает только свечи, появившиеся после последней свечи в кэше (см. _update_candle_store).
+        Задержки между запросами не добавляются: частоту запросов ограничивает вызывающий код (см. scheduler.py).
+        :param symbol: Торговая пара.
+        :param timeframe: Таймфрейм Bybit v5 ('1', '60', 'D' и т.д.).
+        :param limit: Количество последних свечей в результате (None — вся сохраненная история).
+        :param max_rows: Максимальное количество свечей, хранимых в кэше.
+        :return: DataFrame с последними limit свечами, отсортированный по времени (пустой при ошибке).
+        """
+        try:
+            data = await self._update_candle_store(symbol, timeframe, limit or 200, max_rows)
+            log_data_fetching(symbol, timeframe)
+            return data if limit is None else data.iloc[-limit:]
+        except Exception as e:
+            log_data_fetching_error(symbol, timeframe, e)
+            return pd.DataFrame()
+
+    async def _update_candle_store(self, symbol: str, timeframe: str, limit: int,
+                                   max_rows: int = CANDLE_STORE_MAX_ROWS) -> pd.DataFrame:
+        """
+        Дописывает в кэш пары свечи, появившиеся после последней сохраненной (плюс ее саму,
+        т.к. она могла быть сохранена незакрытой). Пропуск любой длины загружается постранично;
+        если он длиннее max_rows свечей и не стыкуется с сохраненной историей, история строится заново.
+        Если в кэше меньше limit свечей, загружаются limit последних свечей.
+        :return: Объединенная история, отсортированная по времени (не больше max_rows свечей).
+        :raises ValueError: Биржа не вернула свечей.
+        """
+        cached_data = self._load_from_cache(symbol, timeframe)
+        if cached_data is not None and cached_data.empty:
+            cached_data = None
+        if cached_data is not None and len(cached_data) >= limit:
+            since = cached_data.index.max()
+            now = pd.Timestamp.now(tz="UTC").tz_localize(None)
+            count = min(max_rows, max(2, int((now - since).total_seconds() // timeframe_to_seconds(timeframe)) + 2))
+        else:
+            since, count = None, limit
+
+        new_data = await self._request_recent_klines_async(symbol, timeframe, count, since=since)
+        if new_data.empty:
+            raise ValueError(f"No candles returned for {symbol} ({timeframe}).")
+        if cached_data is not None and new_data.index.min() > cached_data.index.max():
+            # Между сохраненной историей и новыми свечами остался пропуск: старая история отбрасывается
+            logging.warning(f"Candle store {symbol} ({timeframe}) does not overlap the new candles, rebuilding it.")
+            cached_data = None
+
+        if cached_data is not None:
+            data = pd.concat([cached_data, new_data])
+            data = data[~data.index.duplicated(keep='last')]
+        else:
+            data = new_data
+        data = data.sort_index().iloc[-max_rows:]
+        self._save_to_cache(symbol, timeframe, data)
+        return data
+
+    async def _request_recent_klines_async(self, symbol: str, timeframe: str, count: int,
+                                           since: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+        """
+        Запрашивает count последних свечей постранично (не больше MAX_KLINES_PER_REQUEST за запрос).
+        :param since: Остановиться, как только получена свеча не новее since (стык с сохраненной историей).
+        :return: DataFrame, отсортированный по времени.
+        """
+        pages, end, remaining = [], None, max(1, count)
+        while remaining > 0:
+            page_limit = min(remaining, MAX_KLINES_PER_REQUEST)
+            page = await self._request_klines_async(symbol, timeframe, page_limit, end=end)
+            if page.empty:
+                break
+            pages.append(page)
+            oldest = page.index.min()
+            # Страница короче запрошенной — более ранней истории у пары нет
+            if (since is not None and oldest <= since) or len(page) < page_limit:
+                break
+            remaining -= len(page)
+            end = int(oldest.timestamp() * 1000) - 1
+        if not pages:
+            return page
+        data = pd.concat(pages)
+        return data[~data.index.duplicated(keep='first')].sort_index()
+
+    @timed("fetcher.request_klines")
+    async def _request_klines_async(self, symbol: str, timeframe: str, limit: int,
+                                    end: Optional[int] = None) -> pd.DataFrame:
+        """
+        Запрашивает свечи у Bybit v5 (без кэша).
+        :param end: Время последней свечи (epoch, мс); по умолчанию — до текущей свечи.
+        :return: DataFrame OHLCV с индексом timestamp (в порядке, в котором их отдает биржа).
+        :raises ValueError: Ошибка HTTP или API.
+        """
+        async with aiohttp.ClientSession() as session:
+            url = f"https://api.bybit.com/v5/market/kline?category=spot&symbol={symbol}&interval={timeframe}&limit={limit}"
+            if end is not None:
+                url += f"&end={end}"
+            async with session.get(url) as response:
+                if response.status != 200:
+                    error_message = await response.text()
+                    raise ValueError(f"HTTP {response.status}: {error_message}")
+                data = await response.json()
+                if data['retCode'] != 0:
+                    raise ValueError(f"Error fetching data: {data['retMsg']}")
+                ohlcv = data['result']['list']
+                df = pd.DataFrame(ohlcv, columns=['timestamp', 'open', 'high', 'low', 'close', 'volume', 'extra'])
+                df['timestamp'] = pd.to_datetime(df['timestamp'].astype(float), unit='ms')
+                df.set_index('timestamp', inplace=True)
+                return df
+
+    @timed("fetcher.fetch")
     def fetch_historical_data(self, symbol: str, timeframe: str = '1h', limit: int = 200) -> pd.DataFrame:
         """
         Получает исторические данные для указанного символа и таймфрейма синхронно.
@@ -206,10 +363,12 @@ class DataFetcher:
         :return: DataFrame с данными OHLCV.
         """
         try:
-            # Проверяем кэш
+            # Проверяем кэш: устаревшие данные (закрылась новая свеча) запрашиваются заново
             cached_data = self._load_from_cache(symbol, timeframe)
-            if cached_data is not None:
+            if cached_data is not None and self._is_cache_fresh(cached_data, timeframe, limit):
+                inc("candle_cache_requests", result="hit")
                 return cached_data
+            inc("candle_cache_requests", result="miss")
 
             ohlcv = self.bybit.fetch_ohlcv(symbol, timeframe, limit=limit)
             if not ohlcv:
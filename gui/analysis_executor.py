@@ -0,0 +1,162 @@
+# ========== gui/analysis_executor.py ==========
+
+import queue
+import logging
+import threading
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from analysis_pipeline import AnalysisCancelled
+
+
+class AnalysisTask:
+    """
+    Задача, выполняемая в рабочем потоке. Передается в функцию задачи:
+    task.progress(message) отправляет прогресс в UI, task.is_cancelled() сообщает об отмене.
+    """
+    def __init__(self, executor, task_id, key):
+        self.executor = executor
+        self.task_id = task_id
+        self.key = key
+        self.future = None
+        self._cancel_event = threading.Event()
+
+    def progress(self, message):
+        """Отправляет сообщение о прогрессе в UI-поток."""
+        self.executor._post(self, "progress", message)
+
+    def cancel(self):
+        """Запрашивает отмену: задача прерывается на ближайшей проверке, её результат в UI не передается."""
+        self._cancel_event.set()
+        if self.future is not None:
+            self.future.cancel()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+
+class AnalysisExecutor:
+    """
+    Выполняет долгие операции (загрузка данных, индикаторы, инференс) в пуле рабочих потоков,
+    не блокируя главный поток Tk. Прогресс и результаты передаются в UI через очередь,
+    которая опрашивается из главного потока через after(); callbacks всегда вызываются в главном потоке.
+    Задачи с одинаковым ключом не дублируются: повторный запуск возвращает уже выполняющуюся задачу.
+    """
+    def __init__(self, root, workers=2, poll_interval=50):
+        """
+        :param root: Виджет Tk (для after()).
+        :param workers: Количество рабочих потоков.
+        :param poll_interval: Период опроса очереди сообщений (мс).
+        """
+        self.root = root
+        self.poll_interval = poll_interval
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="analysis")
+        self._messages = queue.Queue()
+        self._active = {}  # key -> AnalysisTask
+        self._callbacks = {}  # task_id -> (on_progress, on_result, on_error, on_cancelled)
+        self._ids = itertools.count(1)
+        self._closed = False
+        self.root.after(self.poll_interval, self._poll)
+
+    def is_running(self, key):
+        """Проверяет, выполняется ли задача с ключом."""
+        return key in self._active
+
+    def submit(self, key, func, *args, on_progress=None, on_result=None, on_error=None, on_cancelled=None,
+               **kwargs):
+        """
+        Запускает func(task, *args, **kwargs) в рабочем потоке. Вызывается из главного потока.
+        :param key: Ключ дедупликации (например, ("analysis", symbol, timeframe_type)).
+        :param on_progress: callback(message) для task.progress.
+        :param on_result: callback(result) при успешном завершении.
+        :param on_error: callback(exception) при ошибке.
+        :param on_cancelled: callback() после отмены.
+        :return: (task, created): created=False, если задача с таким ключом уже выполняется.
+        """
+        active = self._active.get(key)
+        if active is not None:
+            return active, False
+        task = AnalysisTask(self, next(self._ids), key)
+        self._active[key] = task
+        self._callbacks[task.task_id] = (on_progress, on_result, on_error, on_cancelled)
+        task.future = self._pool.submit(self._run, task, func, args, kwargs)
+        return task, True
+
+    def cancel(self, key):
+        """Отменяет задачу с ключом. :return: True, если задача была запущена."""
+        task = self._active.get(key)
+        if task is None:
+            return False
+        task.cancel()
+        if task.future.cancelled():
+            # Задача еще не начала выполняться — рабочий поток о ней не сообщит
+            self._messages.put((task, "cancelled", None))
+        return True
+
+    def cancel_all(self):
+        for key in list(self._active):
+            self.cancel(key)
+
+    def call_in_ui(self, callback, *args):
+        """Выполняет callback(*args) в главном потоке Tk (можно вызывать из любого потока)."""
+        self._messages.put((None, "call", (callback, args)))
+
+    def shutdown(self):
+        """Отменяет задачи и останавливает пул (вызывается при закрытии окна)."""
+        self._closed = True
+        self.cancel_all()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _post(self, task, kind, payload):
+        if not task.is_cancelled():
+            self._messages.put((task, kind, payload))
+
+    def _run(self, task, func, args, kwargs):
+        try:
+            if task.is_cancelled():
+                raise AnalysisCancelled(task.key)
+            result = func(task, *args, **kwargs)
+            kind = "cancelled" if task.is_cancelled() else "result"
+            self._messages.put((task, kind, result))
+        except AnalysisCancelled:
+            self._messages.put((task, "cancelled", None))
+        except Exception as e:
+            self._messages.put((task, "cancelled" if task.is_cancelled() else "error", e))
+
+    def _poll(self):
+        """Разбирает очередь сообщений в главном потоке и перезапускает себя через after()."""
+        try:
+            while True:
+                task, kind, payload = self._messages.get_nowait()
+                self._dispatch(task, kind, payload)
+        except queue.Empty:
+            pass
+        if not self._closed:
+            self.root.after(self.poll_interval, self._poll)
+
+    def _dispatch(self, task, kind, payload):
+        try:
+            if kind == "call":
+                callback, args = payload
+                callback(*args)
+                return
+            callbacks = self._callbacks.get(task.task_id)
+            if callbacks is None:
+                return
+            on_progress, on_result, on_error, on_cancelled = callbacks
+            if kind == "progress":
+                if on_progress is not None and not task.is_cancelled():
+                    on_progress(payload)
+                return
+
+            # Финальное сообщение задачи: освобождаем ключ для следующего запуска
+            del self._callbacks[task.task_id]
+            if self._active.get(task.key) is task:
+                del self._active[task.key]
+            if kind == "result" and on_result is not None:
+                on_result(payload)
+            elif kind == "error" and on_error is not None:
+                on_error(payload)
+            elif kind == "cancelled" and on_cancelled is not None:
+                on_cancelled()
+        except Exception as e:
+            logging.error(f"Error in UI callback: {e}")
@@ -3,16 +3,25 @@ import tkinter as tk
 from tkinter import ttk
 from tkinter.scrolledtext import ScrolledText
 from tkinter import messagebox
-from data_fetcher import DataFetcher
-from ai_predictor import AIPredictor
-from utils.indicators import Supertrend, EMA, RSI, MACD
-from utils.validation_utils import validate_data
-from utils.logging_utils import setup_logging, TextWindowHandler
+from analysis_pipeline import (
+    AnalysisPipeline, AnalysisError, TIMEFRAME_TYPES, generate_recommendation, calculate_trade_parameters
+)
+from gui.analysis_executor import AnalysisExecutor
+from training_jobs import TrainingJob, FINAL_EVENTS
+from utils.logging_utils import TextWindowHandler
 from datetime import datetime, timezone
 import logging
-import threading
-import asyncio
-import sys
+
+# Колонки таблицы сканера: (идентификатор, заголовок, ширина)
+SCANNER_COLUMNS = [
+    ("symbol", "Пара", 90),
+    ("recommendation", "Рекомендация", 100),
+    ("entry", "Вход", 80),
+    ("take_profit", "Тейк-профит", 90),
+    ("stop_loss", "Стоп-лосс", 80),
+    ("confidence", "Уверенность, %", 100),
+    ("status", "Статус", 120),
+]
 
 class TradingApp(tk.Tk):
     def __init__(self):
@@ -21,6 +30,20 @@ class TradingApp(tk.Tk):
         self.geometry("1200x720")
         self.configure(bg="#1e1e2f")
 
+        # Долгие операции выполняются в рабочих потоках, результаты возвращаются в UI через очередь
+        self.ui_executor = AnalysisExecutor(self)
+        # DataFetcher создается в рабочем потоке, поэтому сам не открывает окон Tk:
+        # предупреждение о времени показывается в главном потоке через очередь UI
+        self.analysis_pipeline = AnalysisPipeline(
+            headless=True,
+            on_time_warning=lambda time_difference: self.ui_executor.call_in_ui(self.show_time_warning, time_difference),
+        )
+        self.current_analysis_key = None
+        self.current_scan_key = None
+        self.training_job = None  # Обучение в дочернем процессе (TrainingJob)
+        self.training_progress = {"done": 0, "total": 0}
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
         # Настройка главной сетки окна
         self.grid_columnconfigure(0, weight=0)  # левая панель (фиксированная ширина)
         self.grid_columnconfigure(1, weight=1)  # центральная панель (растягивается)
@@ -45,19 +68,20 @@ class TradingApp(tk.Tk):
         # Настройка логирования в текстовое окно
         self.setup_logging_to_text_window()
 
-        # Обновление статуса ИИ при запуске
-        self.update_ai_status()
+        # Статус ИИ и прогрев моделей — в фоне, после первой отрисовки окна
+        self.after_idle(self.update_ai_status)
 
         # Запуск часов
         self.update_clock()
 
     def setup_logging_to_text_window(self):
         """Настраивает логирование в текстовое окно."""
-        text_handler = TextWindowHandler(self.analysis_text)
-        text_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+        # Записи из любых потоков выводятся пачками по таймеру, в окне хранится не больше max_lines строк
+        self.text_handler = TextWindowHandler(self.analysis_text, max_lines=2000)
+        self.text_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
         logger = logging.getLogger()
         logger.setLevel(logging.INFO)
-        logger.addHandler(text_handler)
+        logger.addHandler(self.text_handler)
 
     def validate_number(self, P):
         """Валидация: разрешает ввод только чисел."""
@@ -113,11 +137,11 @@ class TradingApp(tk.Tk):
         ).grid(row=8, column=0, padx=20, pady=5, sticky="ew")
 
         # Статус ИИ
-        self.ai_status_label = tk.Label(sub_frame, text="Статус ИИ: Не обучена", bg="#28293e", fg="#a9b7c6", anchor="center")
+        self.ai_status_label = tk.Label(sub_frame, text="Статус ИИ: загрузка...", bg="#28293e", fg="#a9b7c6", anchor="center")
         self.ai_status_label.grid(row=9, column=0, padx=20, pady=(10, 0), sticky="ew")
 
         # Рекомендация по обучению
-        self.ai_recommendation_label = tk.Label(sub_frame, text="Рекомендация: Обучить ИИ", bg="#28293e", fg="#a9b7c6", anchor="center")
+        self.ai_recommendation_label = tk.Label(sub_frame, text="Рекомендация: -", bg="#28293e", fg="#a9b7c6", anchor="center")
         self.ai_recommendation_label.grid(row=10, column=0, padx=20, pady=(10, 0), sticky="ew")
 
         # Кнопка "Обучить ИИ на всех парах"
@@ -146,6 +170,33 @@ class TradingApp(tk.Tk):
         )
         self.start_button.grid(row=12, column=0, padx=20, pady=(20, 0), sticky="ew")
 
+        # Кнопка "Отменить анализ" (активна, пока анализ выполняется)
+        self.cancel_button = tk.Button(
+            sub_frame,
+            text="Отменить анализ",
+            bg="#f44336",
+            fg="#ffffff",
+            font=("Arial", 10, "bold"),
+            command=self.cancel_analysis,
+            relief="flat",
+            activebackground="#e53935",
+            state=tk.DISABLED
+        )
+        self.cancel_button.grid(row=13, column=0, padx=20, pady=(10, 0), sticky="ew")
+
+        # Кнопка "Сканировать все пары" (сканер заполняет таблицу в правой панели)
+        self.scan_button = tk.Button(
+            sub_frame,
+            text="Сканировать все пары",
+            bg="#2196f3",
+            fg="#ffffff",
+            font=("Arial", 10, "bold"),
+            command=self.start_scan,
+            relief="flat",
+            activebackground="#1e88e5"
+        )
+        self.scan_button.grid(row=14, column=0, padx=20, pady=(10, 0), sticky="ew")
+
         # Часы (местное время и UTC)
         self.local_time_label = tk.Label(
             sub_frame,
@@ -154,7 +205,7 @@ class TradingApp(tk.Tk):
             fg="#a9b7c6",
             font=("Arial", 10)
         )
-        self.local_time_label.grid(row=13, column=0, padx=20, pady=(20, 5), sticky="ew")
+        self.local_time_label.grid(row=15, column=0, padx=20, pady=(20, 5), sticky="ew")
 
         self.utc_time_label = tk.Label(
             sub_frame,
@@ -163,7 +214,7 @@ class TradingApp(tk.Tk):
             fg="#a9b7c6",
             font=("Arial", 10)
         )
-        self.utc_time_label.grid(row=14, column=0, padx=20, pady=(0, 20), sticky="ew")
+        self.utc_time_label.grid(row=16, column=0, padx=20, pady=(0, 20), sticky="ew")
 
     def update_clock(self):
         """Обновляет время каждую секунду."""
@@ -176,37 +227,87 @@ class TradingApp(tk.Tk):
         self.after(1000, self.update_clock)
 
     def update_ai_status(self):
-        """Обновляет статус ИИ и рекомендацию."""
-        predictor = AIPredictor()
-        status, last_trained = predictor.get_ai_status()
+        """
+        Обновляет статус ИИ и рекомендацию. Выполняется в рабочем потоке и заодно прогревает
+        общий AIPredictor пайплайна (импорт TensorFlow, проверка времени, загрузка моделей),
+        поэтому окно появляется сразу, а первый анализ не ждет загрузки.
+        """
+        def warm_up(task):
+            predictor = self.analysis_pipeline.get_predictor()
+            predictor.reload_state()
+            status, last_trained = predictor.get_ai_status()
+            task.progress((status, last_trained, predictor.get_training_recommendation()))
+            predictor.registry.preload(predictor.get_model_keys())
+            return predictor.get_model_load_stats()
+
+        self.ui_executor.submit("ai_status", warm_up, on_progress=self.show_ai_status,
+                                on_result=self.on_models_loaded,
+                                on_error=lambda error: logging.error(f"Ошибка при обновлении статуса ИИ: {error}"))
+
+    def on_models_loaded(self, load_stats):
+        """Сообщает о завершении фоновой загрузки моделей (вызывается в главном потоке)."""
+        total = sum(stats["last_load_time"] for stats in load_stats.values())
+        logging.info(f"Модели загружены: {len(load_stats)} за {total:.1f} с.")
+
+    def show_ai_status(self, result):
+        """Выводит статус ИИ и рекомендацию (вызывается в главном потоке)."""
+        status, last_trained, recommendation = result
         self.ai_status_label.config(text=f"Статус ИИ: {status}")
         if last_trained:
             self.ai_status_label.config(text=f"Статус ИИ: {status} (обучена {last_trained})")
-        recommendation = predictor.get_training_recommendation()
         self.ai_recommendation_label.config(text=f"Рекомендация: {recommendation}")
 
     def start_train_ai_on_all_pairs(self):
-        """Запускает обучение ИИ в отдельном потоке."""
-        self.analysis_text.delete("1.0", tk.END)  # Очистка окна
-        threading.Thread(target=self.run_async_train, daemon=True).start()
-
-    def run_async_train(self):
-        """Запускает асинхронное обучение."""
-        if sys.platform == 'win32':
-            asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
-        asyncio.run(self.train_ai_on_all_pairs())
+        """
+        Запускает обучение ИИ в отдельном процессе (training_jobs.TrainingJob).
+        Повторное нажатие во время обучения останавливает его после текущего таймфрейма.
+        """
+        if self.training_job is not None and self.training_job.is_running():
+            self.training_job.stop()
+            self.train_all_button.config(state=tk.DISABLED, text="Остановка обучения...")
+            logging.info("Обучение будет остановлено после текущего таймфрейма.")
+            return
 
-    async def train_ai_on_all_pairs(self):
-        """Обработчик кнопки 'Обучить ИИ на всех парах'."""
+        self.analysis_text.delete("1.0", tk.END)  # Очистка окна
         logging.info("Запуск обучения ИИ на всех парах...")
-        try:
-            predictor = AIPredictor()
-            await predictor.train_ai_on_all_timeframes(self.symbols)
+        self.training_progress = {"done": 0, "total": 0}
+        # События приходят из потока-монитора задачи и передаются в главный поток
+        self.training_job = TrainingJob(
+            self.symbols, on_event=lambda event: self.ui_executor.call_in_ui(self.on_training_event, event)
+        )
+        self.training_job.start()
+        self.train_all_button.config(text="Остановить обучение")
+
+    def on_training_event(self, event):
+        """Обрабатывает событие процесса обучения (вызывается в главном потоке)."""
+        kind = event["type"]
+        progress = self.training_progress
+        if kind == "started":
+            progress["done"] = len(event["completed"])
+            progress["total"] = progress["done"] + len(event["pending"])
+            if event["completed"]:
+                logging.info(f"Продолжение прерванного обучения: готово моделей {progress['done']} "
+                             f"из {progress['total']}.")
+        elif kind == "model_start":
+            self.ai_recommendation_label.config(
+                text=f"Обучение: {event['model_key']} ({progress['done'] + 1}/{progress['total']})")
+        elif kind == "epoch":
+            self.ai_recommendation_label.config(
+                text=f"Обучение: {event['model_key']} ({progress['done'] + 1}/{progress['total']}), "
+                     f"эпоха {event['epoch']}, loss {event['loss']:.5f}")
+        elif kind == "model_saved":
+            progress["done"] += 1
+            logging.info(f"Модель {event['model_key']} обучена и подключена к прогнозам.")
+        elif kind in FINAL_EVENTS:
+            self.train_all_button.config(state=tk.NORMAL, text="Обучить ИИ на всех парах")
+            if kind == "finished":
+                logging.info("Обучение ИИ на всех парах завершено.")
+            elif kind == "stopped":
+                logging.info("Обучение остановлено; следующий запуск продолжит его с места остановки.")
+            else:
+                logging.error(f"Ошибка при обучении ИИ: {event['message']}")
+                messagebox.showerror("Ошибка", f"Ошибка при обучении ИИ: {event['message']}")
             self.update_ai_status()
-            logging.info("Обучение ИИ на всех парах завершено.")
-        except Exception as e:
-            logging.error(f"Ошибка при обучении ИИ: {e}")
-            messagebox.showerror("Ошибка", f"Ошибка при обучении ИИ: {e}")
 
     def setup_analysis_section(self):
         """Центральная область: Процесс анализа."""
@@ -243,216 +344,220 @@ class TradingApp(tk.Tk):
         )
         self.result_text.grid(row=1, column=0, padx=10, pady=(0, 10), sticky="nsew")
 
+        tk.Label(self.result_frame, text="Сканер рынка", font=("Arial", 14, "bold"),
+                 bg="#28293e", fg="#ffffff", anchor="center").grid(row=2, column=0, padx=10, pady=10, sticky="ew")
+
+        style = ttk.Style(self)
+        style.configure("Scanner.Treeview", background="#1e1e2f", fieldbackground="#1e1e2f", foreground="#a9b7c6")
+        self.scanner_tree = ttk.Treeview(self.result_frame, columns=[column for column, title, width in SCANNER_COLUMNS],
+                                         show="headings", style="Scanner.Treeview", height=10)
+        for column, title, width in SCANNER_COLUMNS:
+            self.scanner_tree.heading(column, text=title, command=lambda column=column: self.sort_scanner(column))
+            self.scanner_tree.column(column, width=width, anchor="center")
+        self.scanner_tree.grid(row=3, column=0, padx=10, pady=(0, 10), sticky="nsew")
+        self.scanner_sort = ("confidence", True)  # (колонка, по убыванию)
+
         self.result_frame.grid_columnconfigure(0, weight=1)
         self.result_frame.grid_rowconfigure(1, weight=1)
+        self.result_frame.grid_rowconfigure(3, weight=1)
 
     def calculate_trade_parameters(self, data, trend_signal, ema_signal, rsi_signal, macd_signal, predictions):
-        """
-        Рассчитывает параметры сделки: цену входа, тейк-профит, стоп-лосс и вероятность успеха.
-        :param data: Исторические данные.
-        :param trend_signal: Сигнал Supertrend.
-        :param ema_signal: Сигнал EMA.
-        :param rsi_signal: Сигнал RSI.
-        :param macd_signal: Сигнал MACD.
-        :param predictions: Словарь {таймфрейм: float}, прогнозы ИИ.
-        :return: Словарь с параметрами сделки.
-        """
-        try:
-            current_price = data['close'].iloc[-1]
-            entry_price = current_price
-
-            # Простой ATR (как пример)
-            atr = data['high'].iloc[-1] - data['low'].iloc[-1]
-            take_profit = entry_price + atr * 1.5
-            stop_loss = entry_price - atr * 1.0
-            success_probability = 0.7
-
-            if trend_signal == "Покупать":
-                take_profit = entry_price + atr * 2.0
-                stop_loss = entry_price - atr * 0.8
-                success_probability += 0.1
-            elif trend_signal == "Продавать":
-                take_profit = entry_price - atr * 2.0
-                stop_loss = entry_price + atr * 0.8
-                success_probability += 0.1
-
-            if rsi_signal == "Перепроданность":
-                success_probability += 0.05
-            elif rsi_signal == "Перекупленность":
-                success_probability -= 0.05
-
-            if macd_signal == "Покупать":
-                success_probability += 0.05
-            elif macd_signal == "Продавать":
-                success_probability -= 0.05
-
-            # Пример учёта среднего прогноза по всем таймфреймам
-            if predictions:
-                avg_prediction = sum(predictions.values()) / len(predictions)
-                if avg_prediction > 0:
-                    success_probability += 0.03
-                else:
-                    success_probability -= 0.03
-
-            success_probability = max(0.5, min(0.95, success_probability))
-
-            return {
-                "entry_price": round(entry_price, 2),
-                "take_profit": round(take_profit, 2),
-                "stop_loss": round(stop_loss, 2),
-                "success_probability": round(success_probability * 100, 2)
-            }
-        except Exception as e:
-            logging.error(f"Ошибка при расчете параметров сделки: {e}")
-            return {
-                "entry_price": None,
-                "take_profit": None,
-                "stop_loss": None,
-                "success_probability": None
-            }
+        """Рассчитывает параметры сделки (см. analysis_pipeline.calculate_trade_parameters)."""
+        return calculate_trade_parameters(data, trend_signal, ema_signal, rsi_signal, macd_signal, predictions)
 
     def generate_recommendation(self, trend_signal, ema_signal, rsi_signal, macd_signal, predictions):
+        """Генерирует общую рекомендацию (см. analysis_pipeline.generate_recommendation)."""
+        return generate_recommendation(trend_signal, ema_signal, rsi_signal, macd_signal, predictions)
+
+    def start_analysis(self):
         """
-        Генерирует общую рекомендацию и параметры сделки.
-        Здесь пример логики подсчёта buy_signals / sell_signals + итоговая рекомендация.
+        Обработчик кнопки 'Запустить анализ'.
+        Анализ выполняется в рабочем потоке; повторный клик для той же пары и стратегии не запускает дубликат.
         """
-        buy_signals = 0
-        sell_signals = 0
-
-        if trend_signal == "Покупать":
-            buy_signals += 1
-        elif trend_signal == "Продавать":
-            sell_signals += 1
-
-        if ema_signal == "Покупать":
-            buy_signals += 1
-        elif ema_signal == "Продавать":
-            sell_signals += 1
-
-        if rsi_signal == "Перепроданность":
-            buy_signals += 1
-        elif rsi_signal == "Перекупленность":
-            sell_signals += 1
-
-        if macd_signal == "Покупать":
-            buy_signals += 1
-        elif macd_signal == "Продавать":
-            sell_signals += 1
-
-        # Пример: берём «средний» прогноз (последний элемент) и решаем
-        if predictions and len(predictions) > 0:
-            # Можно взять, например, среднее
-            avg_pred = sum(predictions.values()) / len(predictions)
-            if avg_pred > 0:
-                buy_signals += 1
-            else:
-                sell_signals += 1
-
-        if buy_signals > sell_signals:
-            recommendation = "Покупать"
-        elif sell_signals > buy_signals:
-            recommendation = "Продавать"
-        else:
-            recommendation = "Держать"
+        # Значения виджетов читаются в главном потоке, рабочий поток к Tk не обращается
+        symbol = self.symbol_var.get()
+        chosen_tf_type = TIMEFRAME_TYPES.get(self.strategy_var.get(), "short_term")
+        key = ("analysis", symbol, chosen_tf_type)
+        if self.ui_executor.is_running(key):
+            logging.info(f"Анализ {symbol} уже выполняется.")
+            return
+
+        # Одновременно показывается только один анализ: предыдущий (другой пары или стратегии) отменяется
+        if self.current_analysis_key is not None:
+            self.ui_executor.cancel(self.current_analysis_key)
+        self.current_analysis_key = key
 
-        # Возвращаем только итоговую строку (параметры сделки будут считаться отдельно)
-        return recommendation
-
-    def start_analysis(self):
-        """Обработчик кнопки 'Запустить анализ'."""
         self.analysis_text.delete("1.0", tk.END)  # Очистка окна
         logging.info("Запуск анализа...")
+        logging.info(f"Выбрана пара: {symbol}")
+        logging.info(f"Сумма ставки: {self.capital_entry.get()}")
+        logging.info(f"Плечо: {self.leverage_entry.get()}")
+
+        self.ui_executor.submit(
+            key,
+            lambda task: self.analysis_pipeline.run(symbol, chosen_tf_type, progress=task.progress,
+                                                    is_cancelled=task.is_cancelled),
+            on_progress=lambda message: self.show_analysis_progress(key, message),
+            on_result=lambda result: self.on_analysis_result(key, result),
+            on_error=lambda error: self.on_analysis_error(key, error),
+            on_cancelled=lambda: self.on_analysis_cancelled(key),
+        )
+        self._update_cancel_button()
+
+    def cancel_analysis(self):
+        """Обработчик кнопки 'Отменить анализ' (отменяет и анализ пары, и сканирование)."""
+        if self.current_analysis_key is not None and self.ui_executor.cancel(self.current_analysis_key):
+            logging.info("Отмена анализа...")
+        if self.current_scan_key is not None and self.ui_executor.cancel(self.current_scan_key):
+            logging.info("Отмена сканирования...")
+
+    def _update_cancel_button(self):
+        running = self.current_analysis_key is not None or self.current_scan_key is not None
+        self.cancel_button.config(state=tk.NORMAL if running else tk.DISABLED)
+
+    def _finish_analysis(self, key):
+        """Возвращает True, если завершившийся анализ — текущий (результаты устаревших анализов не показываются)."""
+        if key != self.current_analysis_key:
+            return False
+        self.current_analysis_key = None
+        self._update_cancel_button()
+        return True
 
-        try:
-            symbol = self.symbol_var.get()
-            logging.info(f"Выбрана пара: {symbol}")
-
-            capital = self.capital_entry.get()
-            leverage = self.leverage_entry.get()
-            logging.info(f"Сумма ставки: {capital}")
-            logging.info(f"Плечо: {leverage}")
-
-            # === Исправленный блок: маппинг стратегий на short_term / medium_term ===
-            if self.strategy_var.get() == "Краткосрочная торговля":
-                chosen_tf_type = "short_term"
-            elif self.strategy_var.get() == "Среднесрочная торговля":
-                chosen_tf_type = "medium_term"
-            else:
-                chosen_tf_type = "short_term"  # на всякий случай
-
-            # Шаг 1: Загрузка данных
-            logging.info("Шаг 1: Загрузка исторических данных...")
-            fetcher = DataFetcher()
-            data = fetcher.fetch_historical_data(symbol, timeframe='1h', limit=200)
-            if data.empty:
-                logging.error("Ошибка: Не удалось загрузить данные.")
-                messagebox.showerror("Ошибка", "Не удалось загрузить данные. Проверьте интернет-соединение.")
-                return
-            logging.info("Данные успешно загружены.")
-
-            # Шаг 2: Валидация данных
-            logging.info("Шаг 2: Валидация данных...")
-            if not validate_data(data):
-                logging.error("Ошибка: Данные не прошли валидацию.")
-                messagebox.showerror("Ошибка", "Данные не прошли валидацию.")
-                return
-            logging.info("Данные прошли валидацию.")
-
-            # Шаг 3: Расчет индикаторов
-            logging.info("Шаг 3: Расчет индикаторов...")
-            trend_signal = Supertrend.get_signal(data)
-            ema_signal = EMA.get_signal(data)
-            rsi_signal = RSI.get_signal(data)
-            macd_signal = MACD.get_signal(data)
-
-            logging.info(f"Supertrend: {trend_signal}")
-            logging.info(f"EMA: {ema_signal}")
-            logging.info(f"RSI: {rsi_signal}")
-            logging.info(f"MACD: {macd_signal}")
-
-            # Шаг 4: Прогнозирование с помощью ИИ
-            logging.info("Шаг 4: Прогнозирование с помощью ИИ...")
-            predictor = AIPredictor()
-            predictions = predictor.predict_price_movement(data, timeframe_type=chosen_tf_type)
-            if predictions is None or len(predictions) == 0:
-                logging.error("Ошибка: Не удалось выполнить прогноз или прогноз пуст.")
-                messagebox.showerror("Ошибка", "Не удалось выполнить прогноз.")
-                return
-            else:
-                logging.info(f"Полученные прогнозы: {predictions}")
-
-            # Шаг 5: Формирование рекомендации
-            logging.info("Шаг 5: Формирование рекомендации...")
-            final_recommendation = self.generate_recommendation(
-                trend_signal,
-                ema_signal,
-                rsi_signal,
-                macd_signal,
-                predictions
-            )
-            trade_params = self.calculate_trade_parameters(
-                data,
-                trend_signal,
-                ema_signal,
-                rsi_signal,
-                macd_signal,
-                predictions
-            )
-
-            # Выводим итоги
-            self.result_text.delete("1.0", tk.END)
-            self.result_text.insert(tk.END, f"Рекомендация: {final_recommendation}\n")
-            self.result_text.insert(tk.END, f"Цена входа: {trade_params['entry_price']}\n")
-            self.result_text.insert(tk.END, f"Тейк-профит: {trade_params['take_profit']}\n")
-            self.result_text.insert(tk.END, f"Стоп-лосс: {trade_params['stop_loss']}\n")
-            self.result_text.insert(tk.END, f"Вероятность успеха: {trade_params['success_probability']}%\n")
-
-            logging.info("Анализ завершен.")
-
-        except Exception as e:
-            logging.error(f"Ошибка: {str(e)}")
-            messagebox.showerror("Ошибка", f"Произошла ошибка: {str(e)}")
+    def start_scan(self):
+        """
+        Обработчик кнопки 'Сканировать все пары': полный анализ всех пар одновременно.
+        Таблица обновляется по мере готовности каждой пары.
+        """
+        chosen_tf_type = TIMEFRAME_TYPES.get(self.strategy_var.get(), "short_term")
+        key = ("scan", chosen_tf_type)
+        if self.ui_executor.is_running(key):
+            logging.info("Сканирование уже выполняется.")
+            return
+        if self.current_scan_key is not None:
+            self.ui_executor.cancel(self.current_scan_key)
+        self.current_scan_key = key
+
+        symbols = list(self.symbols)
+        self.scanner_tree.delete(*self.scanner_tree.get_children())
+        for symbol in symbols:
+            self.scanner_tree.insert("", tk.END, iid=symbol, values=(symbol, "", "", "", "", "", "ожидание"))
+
+        self.ui_executor.submit(
+            key,
+            lambda task: self.analysis_pipeline.scan(symbols, chosen_tf_type, on_symbol=task.progress,
+                                                     is_cancelled=task.is_cancelled),
+            on_progress=lambda result: self.on_scan_symbol(key, result),
+            on_result=lambda results: self.on_scan_finished(key, "готово"),
+            on_error=lambda error: self.on_scan_finished(key, f"ошибка: {error}"),
+            on_cancelled=lambda: self.on_scan_finished(key, "отменено"),
+        )
+        self._update_cancel_button()
+
+    def on_scan_symbol(self, key, result):
+        """Обновляет строку пары в таблице сканера (вызывается в главном потоке)."""
+        if key != self.current_scan_key or not self.scanner_tree.exists(result["symbol"]):
+            return
+        if "error" in result:
+            values = (result["symbol"], "", "", "", "", "", f"ошибка: {result['error']}")
+        else:
+            trade_params = result["trade_params"]
+            values = (result["symbol"], result["recommendation"], trade_params["entry_price"],
+                      trade_params["take_profit"], trade_params["stop_loss"], result["confidence"], "готово")
+        self.scanner_tree.item(result["symbol"], values=values)
+        self.sort_scanner()
+
+    def on_scan_finished(self, key, status):
+        """Завершение сканирования: незавершенные пары получают итоговый статус."""
+        if key != self.current_scan_key:
+            return
+        self.current_scan_key = None
+        self._update_cancel_button()
+        for item in self.scanner_tree.get_children():
+            values = list(self.scanner_tree.item(item, "values"))
+            if values[-1] == "ожидание":
+                values[-1] = status
+                self.scanner_tree.item(item, values=values)
+        logging.info(f"Сканирование: {status}.")
+
+    def sort_scanner(self, column=None):
+        """
+        Сортирует таблицу сканера. При клике по заголовку сортирует по колонке,
+        повторный клик меняет направление; без аргумента повторяет текущую сортировку.
+        """
+        if column is not None:
+            current_column, descending = self.scanner_sort
+            self.scanner_sort = (column, not descending if column == current_column else column == "confidence")
+        column, descending = self.scanner_sort
+
+        def sort_key(item):
+            value = self.scanner_tree.set(item, column)
+            try:
+                return (0, float(value))
+            except ValueError:
+                # Пустые значения (пары без результата) всегда внизу
+                return (1 if value else 2, value)
+
+        items = sorted(self.scanner_tree.get_children(), key=sort_key)
+        filled = [item for item in items if sort_key(item)[0] < 2]
+        empty = [item for item in items if sort_key(item)[0] == 2]
+        if descending:
+            filled.reverse()
+        for index, item in enumerate(filled + empty):
+            self.scanner_tree.move(item, "", index)
+
+    def show_analysis_progress(self, key, message):
+        """Показывает текущий шаг анализа в панели рекомендации (вызывается в главном потоке)."""
+        if key != self.current_analysis_key:
+            return
+        self.result_text.delete("1.0", tk.END)
+        self.result_text.insert(tk.END, f"Анализ {key[1]}...\n{message}\n")
+
+    def on_analysis_result(self, key, result):
+        """Выводит итоги анализа (вызывается в главном потоке)."""
+        if not self._finish_analysis(key):
+            return
+        trade_params = result["trade_params"]
+        self.result_text.delete("1.0", tk.END)
+        self.result_text.insert(tk.END, f"Рекомендация: {result['recommendation']}\n")
+        self.result_text.insert(tk.END, f"Цена входа: {trade_params['entry_price']}\n")
+        self.result_text.insert(tk.END, f"Тейк-профит: {trade_params['take_profit']}\n")
+        self.result_text.insert(tk.END, f"Стоп-лосс: {trade_params['stop_loss']}\n")
+        self.result_text.insert(tk.END, f"Вероятность успеха: {trade_params['success_probability']}%\n")
+        logging.info("Анализ завершен.")
+
+    def on_analysis_error(self, key, error):
+        """Показывает ошибку анализа (вызывается в главном потоке)."""
+        if not self._finish_analysis(key):
+            return
+        if isinstance(error, AnalysisError):
+            logging.error(f"Ошибка: {error}")
+            messagebox.showerror("Ошибка", str(error))
+        else:
+            logging.error(f"Ошибка: {str(error)}")
+            messagebox.showerror("Ошибка", f"Произошла ошибка: {str(error)}")
+
+    def show_time_warning(self, time_difference):
+        """Предупреждает о рассинхронизации локального времени с биржей (вызывается в главном потоке)."""
+        messagebox.showwarning(
+            "Проблема синхронизации времени",
+            f"Разница между локальным временем и временем сервера составляет {time_difference:.2f} секунд.\n"
+            "Пожалуйста, установите точное время на вашем компьютере.\n"
+            "Без этого программа работать не будет."
+        )
 
+    def on_analysis_cancelled(self, key):
+        if self._finish_analysis(key):
+            logging.info("Анализ отменен.")
+
+    def on_close(self):
+        """Останавливает рабочие потоки и процесс обучения и закрывает окно."""
+        if self.training_job is not None and self.training_job.is_running():
+            # Готовые модели уже сохранены в контрольной точке: следующий запуск продолжит обучение
+            self.training_job.terminate()
+        self.ui_executor.shutdown()
+        logging.getLogger().removeHandler(self.text_handler)
+        self.text_handler.close()
+        self.destroy()
 
 if __name__ == "__main__":
     app = TradingApp()
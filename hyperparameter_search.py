@@ -0,0 +1,509 @@
+# ========== hyperparameter_search.py ==========
+"""
+Подбор гиперпараметров LSTMModel: случайный поиск или successive halving.
+Пробы (trials) обучаются параллельно в отдельных процессах, результаты и кривые val_loss
+записываются в локальную базу SQLite, лучшая конфигурация экспортируется в models/hyperparams.json,
+откуда её берет AIPredictor.train_ai_on_all_timeframes.
+
+Запуск из корня репозитория (данные берутся из дискового кэша свечей DataFetcher):
+    python hyperparameter_search.py --symbols BTCUSDT ETHUSDT --timeframe 60 --mode halving --trials 27 --workers 4
+"""
+
+import os
+import json
+import math
+import time
+import random
+import shutil
+import sqlite3
+import logging
+import argparse
+import datetime
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from parallel_training import _init_worker, resolve_worker_budget
+from utils.logging_utils import log_event
+
+HYPERPARAMS_PATH = "models/hyperparams.json"
+TRIALS_DB_PATH = "models/hyperparam_trials.db"
+
+# Пространство поиска: значения по умолчанию LSTMModel входят в каждый список
+SEARCH_SPACE = {
+    "lstm_units_1": [32, 50, 64, 96, 128],
+    "lstm_units_2": [16, 32, 50, 64],
+    "dropout": [0.0, 0.1, 0.2, 0.3],
+    "dense_units": [16, 25, 32, 64],
+    "learning_rate": [0.0003, 0.001, 0.003],
+    "batch_size": [32, 64, 128],
+    "patience": [3, 5, 8],
+}
+
+
+def load_best_hyperparams(model_key=None, path=HYPERPARAMS_PATH):
+    """
+    Возвращает экспортированные гиперпараметры для модели.
+    :param model_key: Ключ модели; если для него нет отдельной конфигурации, используется "default".
+    :return: Словарь гиперпараметров или None, если файла нет.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            exported = json.load(f)
+    except Exception as e:
+        logging.error(f"Error reading hyperparameters from {path}: {e}")
+        return None
+    entry = exported.get(model_key) or exported.get("default")
+    return entry["params"] if entry else None
+
+
+class TrialStore:
+    """
+    База проб в SQLite: конфигурация, статус, лучшая val_loss, длительность и значения по эпохам.
+    Каждый процесс открывает собственное соединение; WAL позволяет писать из нескольких процессов.
+    """
+    def __init__(self, db_path=TRIALS_DB_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(db_path, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        with self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS trials (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    study TEXT NOT NULL,
+                    config TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    value REAL,
+                    epochs INTEGER DEFAULT 0,
+                    rung INTEGER DEFAULT 0,
+                    duration REAL DEFAULT 0,
+                    error TEXT,
+                    started_at TEXT,
+                    finished_at TEXT
+                )""")
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS intermediate (
+                    trial_id INTEGER NOT NULL,
+                    epoch INTEGER NOT NULL,
+                    value REAL NOT NULL,
+                    PRIMARY KEY (trial_id, epoch)
+                )""")
+
+    def close(self):
+        self.connection.close()
+
+    def create_trial(self, study, config):
+        """Регистрирует пробу. :return: id пробы."""
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO trials (study, config, status, started_at) VALUES (?, ?, 'running', ?)",
+                (study, json.dumps(config, sort_keys=True), datetime.datetime.now().isoformat())
+            )
+        return cursor.lastrowid
+
+    def report(self, trial_id, epoch, value):
+        """Записывает val_loss пробы после эпохи (нумерация эпох с 1)."""
+        with self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO intermediate (trial_id, epoch, value) VALUES (?, ?, ?)",
+                (trial_id, epoch, value)
+            )
+
+    def should_prune(self, study, trial_id, epoch, min_trials=3):
+        """
+        Правило медианы: проба останавливается, если её лучшая val_loss к этой эпохе хуже медианы
+        лучших значений других проб исследования, дошедших до той же эпохи.
+        """
+        rows = self.connection.execute("""
+            SELECT i.trial_id, MIN(i.value), MAX(i.epoch) FROM intermediate i
+            JOIN trials t ON t.id = i.trial_id
+            WHERE t.study = ? AND i.epoch <= ?
+            GROUP BY i.trial_id""", (study, epoch)).fetchall()
+        current = [best for other_id, best, last_epoch in rows if other_id == trial_id]
+        others = [best for other_id, best, last_epoch in rows if other_id != trial_id and last_epoch >= epoch]
+        if not current or len(others) < min_trials:
+            return False
+        return current[0] > float(np.median(others))
+
+    def finish(self, trial_id, status, value=None, epochs=None, rung=None, duration=0.0, error=None):
+        """Обновляет итог пробы (status: running, complete, pruned, failed)."""
+        with self.connection:
+            self.connection.execute("""
+                UPDATE trials SET status = ?, value = COALESCE(?, value), epochs = COALESCE(?, epochs),
+                    rung = COALESCE(?, rung), duration = duration + ?, error = ?, finished_at = ?
+                WHERE id = ?""",
+                (status, value, epochs, rung, duration, error, datetime.datetime.now().isoformat(), trial_id)
+            )
+
+    def get_trials(self, study):
+        """:return: Список проб исследования (словари), лучшие первыми."""
+        rows = self.connection.execute("""
+            SELECT id, config, status, value, epochs, rung, duration, error FROM trials
+            WHERE study = ? ORDER BY value IS NULL, value""", (study,)).fetchall()
+        return [{"id": row[0], "config": json.loads(row[1]), "status": row[2], "value": row[3], "epochs": row[4],
+                 "rung": row[5], "duration": row[6], "error": row[7]} for row in rows]
+
+    def get_best(self, study):
+        """:return: Лучшая завершенная проба исследования или None."""
+        for trial in self.get_trials(study):
+            if trial["status"] == "complete" and trial["value"] is not None:
+                return trial
+        return None
+
+
+def _run_trial(task):
+    """
+    Обучает одну пробу в рабочем процессе (или продолжает её с контрольной точки для successive halving).
+    Ряды читаются из общего .npy-файла (данные не передаются в процесс через pickle).
+    :return: Словарь с итогом пробы (trial_id, value, epochs, pruned, duration).
+    """
+    import tensorflow as tf
+    from tensorflow.keras.callbacks import EarlyStopping, Callback
+    from models.lstm_model import LSTMModel
+
+    start = time.perf_counter()
+    store = TrialStore(task["db_path"])
+
+    class PruningCallback(Callback):
+        """Записывает val_loss после каждой эпохи и останавливает пробу по правилу медианы."""
+        def __init__(self):
+            super().__init__()
+            self.pruned = False
+
+        def on_epoch_end(self, epoch, logs=None):
+            value = (logs or {}).get("val_loss")
+            if value is None or not math.isfinite(value):
+                return
+            store.report(task["trial_id"], epoch + 1, float(value))
+            if task["prune"] and epoch + 1 >= task["warmup_epochs"] and \
+                    store.should_prune(task["study"], task["trial_id"], epoch + 1):
+                self.pruned = True
+                self.model.stop_training = True
+
+    try:
+        series = np.load(task["data_path"], mmap_mode="r")
+        # Окна строятся внутри ряда каждой пары; на валидацию уходят последние окна каждого ряда
+        train_parts, val_parts = [], []
+        for segment_start, segment_end in task["segments"]:
+            X, y = LSTMModel.make_windows(series[segment_start:segment_end], task["look_back"])
+            split_index = int(len(X) * (1 - task["validation_fraction"]))
+            train_parts.append((X[:split_index], y[:split_index]))
+            val_parts.append((X[split_index:], y[split_index:]))
+        X_train = np.concatenate([X for X, y in train_parts])
+        y_train = np.concatenate([y for X, y in train_parts])
+        X_val = np.concatenate([X for X, y in val_parts]).astype(np.float32, copy=False)
+        y_val = np.concatenate([y for X, y in val_parts]).astype(np.float32, copy=False)
+
+        config = task["config"]
+        lstm = LSTMModel(input_shape=(task["look_back"], 1), model_path=task["checkpoint_path"],
+                         build=task["initial_epoch"] == 0, hyperparams=config)
+        if task["initial_epoch"]:
+            lstm.model = tf.keras.models.load_model(task["checkpoint_path"])
+
+        pruning = PruningCallback()
+        history = lstm.model.fit(
+            np.ascontiguousarray(X_train, dtype=np.float32), np.asarray(y_train, dtype=np.float32),
+            epochs=task["epochs"],
+            initial_epoch=task["initial_epoch"],
+            batch_size=lstm.hyperparams["batch_size"],
+            validation_data=(X_val, y_val),
+            callbacks=[EarlyStopping(monitor="val_loss", patience=lstm.hyperparams["patience"],
+                                     restore_best_weights=True), pruning],
+            verbose=0
+        )
+        if task["checkpoint_path"]:
+            lstm.model.save(task["checkpoint_path"])
+
+        val_losses = [value for value in history.history.get("val_loss", []) if math.isfinite(value)]
+        previous = task.get("previous_value")
+        value = min(val_losses + ([previous] if previous is not None else [])) if val_losses else previous
+        return {
+            "trial_id": task["trial_id"],
+            "value": value,
+            "epochs": task["initial_epoch"] + len(history.history.get("loss", [])),
+            "pruned": pruning.pruned,
+            "duration": time.perf_counter() - start,
+        }
+    finally:
+        store.close()
+
+
+class HyperparameterSearch:
+    """
+    Параллельный подбор гиперпараметров LSTMModel.
+    Каждая проба — отдельная задача в пуле процессов (spawn, бюджет потоков TensorFlow как в ParallelTrainer).
+    Слабые пробы останавливаются досрочно: по правилу медианы (случайный поиск) или на ступенях successive halving.
+    """
+    def __init__(self, study, db_path=TRIALS_DB_PATH, workers=None, tf_threads_per_worker=None,
+                 search_space=None, look_back=60, validation_fraction=0.2, work_dir="models/hyperparam_search",
+                 seed=None):
+        """
+        :param study: Имя исследования (пробы разных исследований в базе не смешиваются).
+        :param db_path: Путь к базе проб SQLite.
+        :param workers: Количество рабочих процессов (по умолчанию — по числу ядер).
+        :param tf_threads_per_worker: Потоков TensorFlow на процесс (по умолчанию — ядра / workers).
+        :param search_space: Пространство поиска {параметр: список значений} (по умолчанию SEARCH_SPACE).
+        :param look_back: Длина окна.
+        :param validation_fraction: Доля последних окон каждой пары для валидации.
+        :param work_dir: Директория для данных и контрольных точек проб.
+        :param seed: Зерно генератора конфигураций.
+        """
+        self.study = study
+        self.db_path = db_path
+        self.workers = workers
+        self.tf_threads_per_worker = tf_threads_per_worker
+        self.search_space = search_space or SEARCH_SPACE
+        self.look_back = look_back
+        self.validation_fraction = validation_fraction
+        self.work_dir = os.path.join(work_dir, study)
+        self.random = random.Random(seed)
+        self.store = TrialStore(db_path)
+        self.data_path = None
+        self.segments = []  # [начало, конец) ряда каждой пары в series.npy
+
+    def set_data(self, closes):
+        """
+        Нормализует ряды цен закрытия (MinMax, общий для всех пар, как LSTMModel.prepare_series_data)
+        и сохраняет их для рабочих процессов в один .npy (процессы открывают его через memmap,
+        а не получают копию). Окна строятся внутри ряда каждой пары и не захватывают свечи двух пар.
+        :param closes: Цены закрытия в хронологическом порядке или список таких рядов (по одному на пару).
+        """
+        if not isinstance(closes, (list, tuple)):
+            closes = [closes]
+        series = [np.asarray(values, dtype=np.float32).reshape(-1) for values in closes]
+        series = [values for values in series if len(values) > self.look_back]
+        windows = sum(len(values) - self.look_back for values in series)
+        if windows <= self.look_back:
+            raise ValueError(f"Not enough data for hyperparameter search: {windows} windows.")
+        combined = np.concatenate(series)
+        low, high = float(combined.min()), float(combined.max())
+        bounds = np.cumsum([0] + [len(values) for values in series])
+        self.segments = [[int(start), int(end)] for start, end in zip(bounds[:-1], bounds[1:])]
+        os.makedirs(self.work_dir, exist_ok=True)
+        self.data_path = os.path.join(self.work_dir, "series.npy")
+        np.save(self.data_path, ((combined - low) / ((high - low) or 1.0)).astype(np.float32))
+
+    def sample_config(self, seen=None):
+        """Случайная конфигурация из пространства поиска (повторы по возможности пропускаются)."""
+        seen = seen if seen is not None else set()
+        for _ in range(100):
+            config = {name: self.random.choice(values) for name, values in self.search_space.items()}
+            key = json.dumps(config, sort_keys=True)
+            if key not in seen:
+                seen.add(key)
+                return config
+        return config
+
+    def _make_task(self, trial_id, config, epochs, initial_epoch=0, prune=True, warmup_epochs=3,
+                   checkpoint=False, previous_value=None):
+        return {
+            "db_path": self.db_path,
+            "study": self.study,
+            "trial_id": trial_id,
+            "config": config,
+            "data_path": self.data_path,
+            "segments": self.segments,
+            "look_back": self.look_back,
+            "validation_fraction": self.validation_fraction,
+            "epochs": epochs,
+            "initial_epoch": initial_epoch,
+            "prune": prune,
+            "warmup_epochs": warmup_epochs,
+            "checkpoint_path": os.path.join(self.work_dir, f"trial_{trial_id}.keras") if checkpoint else None,
+            "previous_value": previous_value,
+        }
+
+    def _run_tasks(self, tasks):
+        """
+        Выполняет пробы в пуле процессов.
+        :return: Словарь {trial_id: результат}; упавшие пробы помечаются в базе как failed.
+        """
+        results = {}
+        workers, threads = resolve_worker_budget(self.workers, self.tf_threads_per_worker, len(tasks))
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_worker, initargs=(threads, 2)) as pool:
+            futures = {pool.submit(_run_trial, task): task["trial_id"] for task in tasks}
+            for future in as_completed(futures):
+                trial_id = futures[future]
+                try:
+                    results[trial_id] = future.result()
+                    log_event("Hyperparameter Search", "Trial %d: val_loss=%s, epochs=%s, pruned=%s", trial_id,
+                              results[trial_id]['value'], results[trial_id]['epochs'], results[trial_id]['pruned'])
+                except Exception as e:
+                    self.store.finish(trial_id, "failed", error=str(e))
+                    log_event("Hyperparameter Search", "Trial %d failed: %s", trial_id, e, level="error")
+        return results
+
+    def random_search(self, n_trials=20, max_epochs=50, warmup_epochs=5):
+        """
+        Случайный поиск: n_trials конфигураций обучаются параллельно, слабые останавливаются по правилу медианы.
+        :return: Отчет поиска (см. _make_report).
+        """
+        self._check_data()
+        start = time.perf_counter()
+        seen = set()
+        tasks = []
+        for _ in range(n_trials):
+            config = self.sample_config(seen)
+            trial_id = self.store.create_trial(self.study, config)
+            tasks.append(self._make_task(trial_id, config, max_epochs, warmup_epochs=warmup_epochs))
+        log_event("Hyperparameter Search", "Random search '%s': %d trials, up to %d epochs", self.study, n_trials, max_epochs)
+
+        for trial_id, result in self._run_tasks(tasks).items():
+            self.store.finish(trial_id, "pruned" if result["pruned"] else "complete", value=result["value"],
+                              epochs=result["epochs"], duration=result["duration"])
+        return self._make_report(time.perf_counter() - start)
+
+    def successive_halving(self, n_trials=27, min_epochs=3, max_epochs=50, eta=3):
+        """
+        Successive halving: все конфигурации получают min_epochs эпох, в следующую ступень проходит
+        лучшая 1/eta часть, бюджет эпох на ступени растет в eta раз (до max_epochs).
+        Пробы следующей ступени продолжают обучение со своих контрольных точек.
+        :return: Отчет поиска (см. _make_report).
+        """
+        self._check_data()
+        start = time.perf_counter()
+        seen = set()
+        survivors = []
+        for _ in range(n_trials):
+            config = self.sample_config(seen)
+            survivors.append({"trial_id": self.store.create_trial(self.study, config), "config": config,
+                              "epochs": 0, "value": None})
+        log_event("Hyperparameter Search", "Successive halving '%s': %d trials, %d..%d epochs, eta=%d",
+                  self.study, n_trials, min_epochs, max_epochs, eta)
+
+        rung, budget = 0, min_epochs
+        try:
+            while survivors:
+                tasks = [self._make_task(trial["trial_id"], trial["config"], budget, initial_epoch=trial["epochs"],
+                                         prune=False, checkpoint=True, previous_value=trial["value"])
+                         for trial in survivors]
+                results = self._run_tasks(tasks)
+                finished = []
+                for trial in survivors:
+                    result = results.get(trial["trial_id"])
+                    if result is None:
+                        continue
+                    trial["epochs"], trial["value"] = result["epochs"], result["value"]
+                    self.store.finish(trial["trial_id"], "running", value=result["value"], epochs=result["epochs"],
+                                      rung=rung, duration=result["duration"])
+                    if result["value"] is not None:
+                        finished.append(trial)
+
+                finished.sort(key=lambda trial: trial["value"])
+                last_rung = budget >= max_epochs or len(finished) <= 1
+                keep = finished if last_rung else finished[:max(1, math.ceil(len(finished) / eta))]
+                for trial in finished[len(keep):]:
+                    self.store.finish(trial["trial_id"], "pruned")
+                if last_rung:
+                    for trial in keep:
+                        self.store.finish(trial["trial_id"], "complete")
+                    break
+                log_event("Hyperparameter Search", "Rung %d (%d epochs): %d of %d trials promoted",
+                          rung, budget, len(keep), len(finished))
+                survivors = keep
+                rung += 1
+                budget = min(max_epochs, budget * eta)
+        finally:
+            for name in os.listdir(self.work_dir):
+                if name.startswith("trial_"):
+                    path = os.path.join(self.work_dir, name)
+                    if os.path.isdir(path):
+                        shutil.rmtree(path)
+                    else:
+                        os.remove(path)
+        return self._make_report(time.perf_counter() - start)
+
+    def _check_data(self):
+        if self.data_path is None:
+            raise ValueError("Search data is not set, call set_data first.")
+
+    def _make_report(self, wall_time):
+        trials = self.store.get_trials(self.study)
+        best = self.store.get_best(self.study)
+        report = {
+            "study": self.study,
+            "trials": len(trials),
+            "complete": sum(trial["status"] == "complete" for trial in trials),
+            "pruned": sum(trial["status"] == "pruned" for trial in trials),
+            "failed": sum(trial["status"] == "failed" for trial in trials),
+            "trial_time": round(sum(trial["duration"] or 0.0 for trial in trials), 2),
+            "wall_time": round(wall_time, 2),
+            "best": best,
+        }
+        log_event("Hyperparameter Search", "Search '%s' done in %s s: %s complete, %s pruned, %s failed, best val_loss=%s",
+                  self.study, report['wall_time'], report['complete'], report['pruned'], report['failed'],
+                  best['value'] if best else None)
+        return report
+
+    def export_best(self, model_key="default", path=HYPERPARAMS_PATH, max_epochs=50):
+        """
+        Экспортирует лучшую конфигурацию исследования для обучения (AIPredictor.train_ai_on_all_timeframes).
+        :param model_key: Ключ модели или "default" (для всех моделей без отдельной конфигурации).
+        :param max_epochs: Бюджет эпох полного обучения (остановка по-прежнему по EarlyStopping).
+        :return: Экспортированные гиперпараметры или None, если завершенных проб нет.
+        """
+        best = self.store.get_best(self.study)
+        if best is None:
+            return None
+        exported = {}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                exported = json.load(f)
+        params = {**best["config"], "epochs": max_epochs}
+        exported[model_key] = {
+            "params": params,
+            "val_loss": best["value"],
+            "study": self.study,
+            "trial_id": best["id"],
+            "exported_at": datetime.datetime.now().isoformat(),
+        }
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        temp_path = path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(exported, f, indent=2)
+        os.replace(temp_path, path)
+        log_event("Hyperparameter Search", "Best configuration of '%s' exported to %s as %s", self.study, path, model_key)
+        return params
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hyperparameter search for LSTMModel.")
+    parser.add_argument("--symbols", nargs="+", required=True)
+    parser.add_argument("--timeframe", default="60")
+    parser.add_argument("--cache-dir", default="data_cache")
+    parser.add_argument("--mode", choices=["random", "halving"], default="halving")
+    parser.add_argument("--trials", type=int, default=27)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--tf-threads", type=int, default=None)
+    parser.add_argument("--min-epochs", type=int, default=3)
+    parser.add_argument("--max-epochs", type=int, default=50)
+    parser.add_argument("--eta", type=int, default=3)
+    parser.add_argument("--study", default=None)
+    parser.add_argument("--model-key", default="default", help="Export key: a model key or 'default'.")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    from utils.dataset_utils import load_symbol_closes
+    # Ряды пар не склеиваются: окна строятся по каждой паре, как при обычном обучении
+    # (AIPredictor._prepare_timeframe_dataset)
+    closes = [load_symbol_closes(args.cache_dir, symbol, args.timeframe) for symbol in args.symbols]
+    study = args.study or f"{args.mode}_{args.timeframe}_{datetime.datetime.now():%Y%m%d_%H%M%S}"
+
+    search = HyperparameterSearch(study, workers=args.workers, tf_threads_per_worker=args.tf_threads, seed=args.seed)
+    search.set_data(closes)
+    if args.mode == "random":
+        report = search.random_search(args.trials, max_epochs=args.max_epochs)
+    else:
+        report = search.successive_halving(args.trials, min_epochs=args.min_epochs, max_epochs=args.max_epochs,
+                                           eta=args.eta)
+    params = search.export_best(args.model_key, max_epochs=args.max_epochs)
+    print(json.dumps({**report, "exported": params}, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,8 @@
 
 import asyncio
 import sys
-from gui.trading_app import TradingApp
 from utils.logging_utils import setup_logging
+from utils import metrics
 
 # Единственное исправление:
 # Устанавливаем SelectorEventLoopPolicy на Windows,
@@ -12,10 +12,18 @@ if sys.platform == 'win32':
     asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
 def main():
+    # Без GUI: python main.py --headless --symbols BTCUSDT ... (аргументы см. cli.py)
+    if "--headless" in sys.argv[1:]:
+        import cli
+        sys.exit(cli.main([arg for arg in sys.argv[1:] if arg != "--headless"]))
+
     # Настройка логирования
     setup_logging()
+    # Метрики выключены, если не заданы METRICS_PORT / METRICS_FILE (см. utils/metrics.py)
+    metrics.configure()
 
-    # Создание и запуск приложения (GUI)
+    # Создание и запуск приложения (GUI); Tk импортируется только здесь
+    from gui.trading_app import TradingApp
     app = TradingApp()
     app.mainloop()
 
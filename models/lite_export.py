@@ -0,0 +1,184 @@
+# ========== models/lite_export.py ==========
+"""
+Экспорт обученных моделей из models/*.keras в TFLite и сравнение точности и задержки квантованных вариантов.
+
+Запуск из корня репозитория:
+    python -m models.lite_export --quantization float16
+    python -m models.lite_export --compare --repeats 200
+"""
+
+import os
+import time
+import argparse
+import logging
+import tempfile
+import numpy as np
+import tensorflow as tf
+from models.lstm_model import LSTMModel
+from models.lite_model import LiteModel
+
+QUANTIZATION_MODES = ("none", "float16", "dynamic", "int8")
+
+
+def _representative_windows(windows, limit=200):
+    """Генератор окон для калибровки полной int8-квантизации."""
+    def generator():
+        for window in windows[:limit]:
+            yield [np.asarray(window, dtype=np.float32)[np.newaxis]]
+    return generator
+
+
+def convert_to_tflite(lstm_model, quantization="none", representative_windows=None):
+    """
+    Конвертирует Keras-модель в TFLite.
+    :param lstm_model: Загруженный LSTMModel.
+    :param quantization: "none", "float16", "dynamic" (int8-веса) или "int8" (полная целочисленная).
+    :param representative_windows: Окна для калибровки (обязательны для "int8").
+    :return: Байты модели TFLite.
+    """
+    if quantization not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode: {quantization}")
+
+    keras_model = lstm_model.model
+    # Фиксированный батч 1 позволяет конвертеру собрать LSTM в один встроенный оператор
+    spec = tf.TensorSpec(shape=(1, *lstm_model.input_shape), dtype=tf.float32)
+    concrete = tf.function(lambda x: keras_model(x, training=False)).get_concrete_function(spec)
+
+    def build_converter(select_ops):
+        converter = tf.lite.TFLiteConverter.from_concrete_functions([concrete], keras_model)
+        if select_ops:
+            converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS, tf.lite.OpsSet.SELECT_TF_OPS]
+            converter._experimental_lower_tensor_list_ops = False
+        if quantization != "none":
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if quantization == "float16":
+            converter.target_spec.supported_types = [tf.float16]
+        elif quantization == "int8":
+            if representative_windows is None:
+                raise ValueError("int8 quantization requires representative windows.")
+            converter.representative_dataset = _representative_windows(representative_windows)
+        return converter
+
+    try:
+        return build_converter(select_ops=False).convert()
+    except Exception as e:
+        # Без встроенных операторов модель требует Flex-делегат (доступен в tf.lite, но не в tflite_runtime)
+        logging.warning(f"Builtin-only conversion failed ({e}); retrying with SELECT_TF_OPS.")
+        return build_converter(select_ops=True).convert()
+
+
+def export_model(model_key, models_dir="models", quantization="none", representative_windows=None, output_path=None):
+    """
+    Экспортирует models/<model_key>.keras в models/<model_key>.tflite.
+    :return: Путь к файлу .tflite.
+    """
+    keras_path = os.path.join(models_dir, f"{model_key}.keras")
+    lstm = LSTMModel(input_shape=(60, 1), model_path=keras_path, build=False)
+    lstm.load_model()
+    tflite_bytes = convert_to_tflite(lstm, quantization, representative_windows)
+    output_path = output_path or os.path.join(models_dir, f"{model_key}.tflite")
+    with open(output_path, "wb") as f:
+        f.write(tflite_bytes)
+    logging.info(f"Exported {model_key} to {output_path} ({quantization}, {len(tflite_bytes) / 1024:.1f} KB).")
+    return output_path
+
+
+def list_model_keys(models_dir="models"):
+    """Возвращает ключи всех обученных моделей таймфреймов в директории."""
+    return sorted(
+        name[:-len(".keras")] for name in os.listdir(models_dir)
+        if name.endswith(".keras") and name.startswith(("short_term_", "medium_term_"))
+    )
+
+
+def make_evaluation_windows(rows=2000, look_back=60, seed=7):
+    """Синтетический ряд (случайное блуждание), нарезанный на окна, для сравнения бэкендов."""
+    rng = np.random.default_rng(seed)
+    series = 100 + np.cumsum(rng.normal(0, 1, rows))
+    series = ((series - series.min()) / (series.max() - series.min())).astype(np.float32)
+    X, y = LSTMModel.make_windows(series, look_back)
+    return np.ascontiguousarray(X), y
+
+
+def _median_latency_ms(func, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def compare_backends(model_keys, models_dir="models", quantizations=QUANTIZATION_MODES, repeats=200, windows=None):
+    """
+    Сравнивает Keras и TFLite (с разной квантизацией) по точности и задержке одиночного прогноза.
+    Точность считается относительно выходов Keras-модели на одних и тех же окнах.
+    :return: Список строк отчета (словари).
+    """
+    X, y = windows if windows is not None else make_evaluation_windows()
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for model_key in model_keys:
+            lstm = LSTMModel(input_shape=(60, 1), model_path=os.path.join(models_dir, f"{model_key}.keras"), build=False)
+            lstm.load_model()
+            reference = lstm.predict_last(X)[:, 0]
+            single = X[-1:]
+            lstm.predict_last(single)
+            rows.append({
+                "model": model_key, "backend": "keras", "size_kb": os.path.getsize(lstm.model_path) / 1024,
+                "latency_ms": _median_latency_ms(lambda: lstm.predict_last(single), repeats),
+                "mae_vs_keras": 0.0, "direction_agreement": 1.0,
+            })
+
+            for quantization in quantizations:
+                path = os.path.join(tmp_dir, f"{model_key}_{quantization}.tflite")
+                try:
+                    with open(path, "wb") as f:
+                        f.write(convert_to_tflite(lstm, quantization, representative_windows=X))
+                except Exception as e:
+                    logging.error(f"Export of {model_key} ({quantization}) failed: {e}")
+                    continue
+                lite = LiteModel(path)
+                lite.load_model()
+                outputs = lite.predict_last(X)[:, 0]
+                last_close = X[:, -1, 0]
+                rows.append({
+                    "model": model_key, "backend": f"tflite-{quantization}", "size_kb": os.path.getsize(path) / 1024,
+                    "latency_ms": _median_latency_ms(lambda: lite.predict_last(single), repeats),
+                    "mae_vs_keras": float(np.mean(np.abs(outputs - reference))),
+                    # Совпадение направления прогноза (выше/ниже последней цены окна) с Keras
+                    "direction_agreement": float(np.mean((outputs > last_close) == (reference > last_close))),
+                })
+    return rows
+
+
+def print_comparison(rows):
+    """Печатает таблицу сравнения бэкендов."""
+    print(f"{'model':<18}{'backend':<18}{'size KB':>10}{'latency ms':>12}{'MAE vs keras':>14}{'dir. agree':>12}")
+    for row in rows:
+        print(f"{row['model']:<18}{row['backend']:<18}{row['size_kb']:>10.1f}{row['latency_ms']:>12.3f}"
+              f"{row['mae_vs_keras']:>14.2e}{row['direction_agreement']:>12.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export timeframe models to TFLite.")
+    parser.add_argument("--models-dir", default="models")
+    parser.add_argument("--quantization", choices=QUANTIZATION_MODES, default="none",
+                        help="Quantization for exported files in models/.")
+    parser.add_argument("--compare", action="store_true", help="Compare accuracy and latency of all quantization modes.")
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    model_keys = list_model_keys(args.models_dir)
+    if args.compare:
+        print_comparison(compare_backends(model_keys, args.models_dir, repeats=args.repeats))
+        return
+
+    X, y = make_evaluation_windows()
+    for model_key in model_keys:
+        export_model(model_key, args.models_dir, args.quantization, representative_windows=X)
+
+
+if __name__ == "__main__":
+    main()
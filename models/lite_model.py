@@ -0,0 +1,98 @@
+# ========== models/lite_model.py ==========
+
+import logging
+import threading
+import numpy as np
+from models.model_bundle import ModelBundle
+from utils.metrics import timed
+
+# Облегченный рантайм предпочтительнее: он не тянет за собой весь TensorFlow
+try:
+    from tflite_runtime.interpreter import Interpreter
+except ImportError:
+    Interpreter = None
+
+
+def _get_interpreter_class():
+    if Interpreter is not None:
+        return Interpreter
+    import tensorflow as tf
+    return tf.lite.Interpreter
+
+
+class LiteModel:
+    """
+    Модель для CPU-инференса в формате TFLite (экспортируется из LSTMModel, см. models/lite_export.py).
+    Повторяет интерфейс прогнозирования LSTMModel (predict_last), поэтому может использоваться AIPredictor
+    вместо Keras-модели.
+    """
+    def __init__(self, model_path, num_threads=None):
+        """
+        :param model_path: Путь к файлу .tflite.
+        :param num_threads: Количество потоков интерпретатора (None — по умолчанию).
+        """
+        self.model_path = model_path
+        self.num_threads = num_threads
+        self.interpreter = None
+        self.is_trained = False
+        self.bundle = None
+        # Интерпретатор TFLite не потокобезопасен
+        self._lock = threading.Lock()
+
+    @timed("model.load", backend="tflite")
+    def load_model(self, filepath=None):
+        """
+        Загружает модель TFLite из файла.
+        :param filepath: Путь к файлу (если None, используется self.model_path).
+        """
+        try:
+            if filepath is None:
+                filepath = self.model_path
+            interpreter_class = _get_interpreter_class()
+            self.interpreter = interpreter_class(model_path=filepath, num_threads=self.num_threads)
+            self.interpreter.allocate_tensors()
+            self._input = self.interpreter.get_input_details()[0]
+            self._output = self.interpreter.get_output_details()[0]
+            # Бандл общий с исходной .keras-моделью (models/<key>.bundle.json); хэш относится к .keras
+            self.bundle = ModelBundle.load(filepath, check_version=False)
+            self.is_trained = True
+            logging.info(f"TFLite model loaded from {filepath}.")
+        except Exception as e:
+            logging.error(f"Error loading TFLite model: {e}")
+            raise
+
+    def _quantize_input(self, window):
+        scale, zero_point = self._input.get("quantization", (0.0, 0))
+        if self._input["dtype"] != np.float32 and scale:
+            window = np.round(window / scale + zero_point)
+        return window.astype(self._input["dtype"])
+
+    def _dequantize_output(self, output):
+        scale, zero_point = self._output.get("quantization", (0.0, 0))
+        if self._output["dtype"] != np.float32 and scale:
+            output = (output.astype(np.float32) - zero_point) * scale
+        return output.astype(np.float32)
+
+    @timed("model.predict_last", backend="tflite")
+    def predict_last(self, X_last):
+        """
+        Прогноз для небольшого батча окон (модель экспортирована с батчем 1, окна обрабатываются по одному).
+        :param X_last: Окна формы (batch, look_back, 1).
+        :return: Прогнозируемые значения формы (batch, 1).
+        """
+        try:
+            if X_last is None:
+                raise ValueError("Input window is None.")
+            if self.interpreter is None:
+                raise ValueError("TFLite model is not loaded.")
+            X_last = np.asarray(X_last, dtype=np.float32)
+            outputs = []
+            with self._lock:
+                for window in X_last:
+                    self.interpreter.set_tensor(self._input["index"], self._quantize_input(window[np.newaxis]))
+                    self.interpreter.invoke()
+                    outputs.append(self._dequantize_output(self.interpreter.get_tensor(self._output["index"])))
+            return np.concatenate(outputs, axis=0)
+        except Exception as e:
+            logging.error(f"Error during TFLite prediction: {e}")
+            raise
@@ -1,89 +1,215 @@
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import pandas as pd
+import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import LSTM, Dense, Dropout, Input
-from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint, Callback
+from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint, Callback, LambdaCallback
+from tensorflow.keras.optimizers import Adam
 from sklearn.preprocessing import MinMaxScaler
 import datetime
 import logging
 import os
 from utils.logging_utils import log_ai_training_progress
+from models.model_bundle import ModelBundle
+from utils.metrics import timed
+
+# Гиперпараметры архитектуры и обучения по умолчанию (подбираются hyperparameter_search.py)
+DEFAULT_HYPERPARAMS = {
+    "lstm_units_1": 50,
+    "lstm_units_2": 50,
+    "dropout": 0.2,
+    "dense_units": 25,
+    "learning_rate": 0.001,
+    "epochs": 50,
+    "batch_size": 32,
+    "patience": 5,
+}
+
 
 class LSTMModel:
-    def __init__(self, input_shape, model_path="models/lstm_model.keras"):
+    def __init__(self, input_shape, model_path="models/lstm_model.keras", build=True, hyperparams=None):
         """
         Инициализация LSTM-модели.
         :param input_shape: Форма входных данных (например, (60, 1) для 60 временных шагов и 1 признака).
         :param model_path: Путь для сохранения/загрузки модели.
+        :param build: Строить ли новую сеть (False, если модель сразу будет загружена с диска).
+        :param hyperparams: Гиперпараметры, переопределяющие DEFAULT_HYPERPARAMS (None — значения по умолчанию).
         """
         self.input_shape = input_shape
         self.model_path = model_path
-        self.model = self._build_model()
+        self.hyperparams = {**DEFAULT_HYPERPARAMS, **(hyperparams or {})}
+        self.model = self._build_model() if build else None
         self.is_trained = False
         self.last_trained = None
         self.scaler = MinMaxScaler(feature_range=(0, 1))
+        self.bundle = None  # ModelBundle: нормализация и метаданные обучения (сохраняется рядом с .keras)
+        self._forward = None  # Скомпилированный tf.function для инференса, создается лениво
 
     def _build_model(self):
         """
         Создает архитектуру LSTM-модели.
         :return: Модель Keras.
         """
+        params = self.hyperparams
         model = Sequential()
         model.add(Input(shape=self.input_shape))
-        model.add(LSTM(50, return_sequences=True))
-        model.add(Dropout(0.2))
-        model.add(LSTM(50, return_sequences=False))
-        model.add(Dropout(0.2))
-        model.add(Dense(25, activation='relu'))
+        model.add(LSTM(params["lstm_units_1"], return_sequences=True))
+        model.add(Dropout(params["dropout"]))
+        model.add(LSTM(params["lstm_units_2"], return_sequences=False))
+        model.add(Dropout(params["dropout"]))
+        model.add(Dense(params["dense_units"], activation='relu'))
         model.add(Dense(1))
-        model.compile(optimizer='adam', loss='mean_squared_error')
+        model.compile(optimizer=Adam(learning_rate=params["learning_rate"]), loss='mean_squared_error')
         return model
 
     @staticmethod
+    def make_windows(series, look_back=60):
+        """
+        Строит окна для LSTM как strided-представления (без копирования данных).
+        :param series: Одномерный массив нормализованных значений.
+        :param look_back: Количество временных шагов в окне.
+        :return: X (представление формы (N, look_back, 1)), y (представление формы (N,)).
+        """
+        series = np.asarray(series).reshape(-1)
+        if len(series) <= look_back:
+            raise ValueError(f"Not enough data: {len(series)} rows for look_back={look_back}.")
+        # Окно i охватывает series[i:i + look_back], целевое значение — series[i + look_back]
+        X = sliding_window_view(series[:-1], look_back)[..., np.newaxis]
+        y = series[look_back:]
+        return X, y
+
+    @staticmethod
+    def iter_batches(X, y, batch_size=1024):
+        """
+        Лениво материализует окна батчами (копируется только текущий батч).
+        :param X: Окна, полученные из make_windows/prepare_data.
+        :param y: Целевые значения.
+        :param batch_size: Размер батча.
+        :return: Генератор пар (X_batch, y_batch) в виде непрерывных массивов float32.
+        """
+        for start in range(0, len(X), batch_size):
+            end = start + batch_size
+            yield (np.ascontiguousarray(X[start:end], dtype=np.float32),
+                   np.ascontiguousarray(y[start:end], dtype=np.float32))
+
+    @staticmethod
+    @timed("model.prepare_data")
     def prepare_data(data, look_back=60):
         """
         Подготавливает данные для обучения модели.
+        Окна — strided-представления; батчами их материализует iter_batches(X, y, batch_size).
         :param data: DataFrame с историческими данными.
         :param look_back: Количество временных шагов для анализа.
-        :return: X (входные данные), y (целевые значения), scaler (объект для нормализации).
+        :return: X (входные данные, float32), y (целевые значения, float32), scaler (объект для нормализации).
         """
         try:
             if data is None or data.empty:
                 raise ValueError("Data is None or empty.")
             scaler = MinMaxScaler(feature_range=(0, 1))
-            scaled_data = scaler.fit_transform(data['close'].values.reshape(-1, 1))
-            X, y = [], []
-            for i in range(look_back, len(scaled_data)):
-                X.append(scaled_data[i - look_back:i, 0])
-                y.append(scaled_data[i, 0])
-            X, y = np.array(X), np.array(y)
-            X = np.reshape(X, (X.shape[0], X.shape[1], 1))
+            closes = data['close'].to_numpy(dtype=np.float32).reshape(-1, 1)
+            scaled_data = scaler.fit_transform(closes).astype(np.float32, copy=False)
+            X, y = LSTMModel.make_windows(scaled_data[:, 0], look_back)
             return X, y, scaler
         except Exception as e:
             logging.error(f"Error preparing data: {e}")
             raise
 
-    def train(self, X_train, y_train, epochs=50, batch_size=32, validation_split=0.2):
+    @staticmethod
+    @timed("model.prepare_series_data")
+    def prepare_series_data(frames, look_back=60):
+        """
+        Подготавливает данные нескольких пар: MinMax общий для всех пар (как prepare_data на объединенных
+        данных), но окна строятся внутри каждой пары и не захватывают свечи двух пар.
+        Пары короче look_back + 1 свечей пропускаются.
+        :param frames: Список DataFrame (по одному на пару), отсортированных по времени.
+        :param look_back: Количество временных шагов для анализа.
+        :return: X (входные данные, float32), y (целевые значения, float32), scaler (объект для нормализации).
+        """
+        try:
+            frames = [frame for frame in frames if frame is not None and len(frame) > look_back]
+            if not frames:
+                raise ValueError(f"No series longer than look_back={look_back}.")
+            scaler = MinMaxScaler(feature_range=(0, 1))
+            scaler.fit(np.concatenate([frame['close'].to_numpy(dtype=np.float32) for frame in frames]).reshape(-1, 1))
+            X_parts, y_parts = [], []
+            for frame in frames:
+                closes = frame['close'].to_numpy(dtype=np.float32).reshape(-1, 1)
+                X, y = LSTMModel.make_windows(scaler.transform(closes).astype(np.float32, copy=False)[:, 0], look_back)
+                X_parts.append(X)
+                y_parts.append(y)
+            return np.concatenate(X_parts), np.concatenate(y_parts), scaler
+        except Exception as e:
+            logging.error(f"Error preparing data: {e}")
+            raise
+
+    @staticmethod
+    @timed("model.prepare_last_window")
+    def prepare_last_window(data, look_back=60):
+        """
+        Подготавливает только последнее окно для прогнозирования: look_back последних свечей,
+        т.е. прогноз следующей, еще не известной свечи (как ModelBundle.make_window).
+        В отличие от X[-1] из prepare_data, окно включает последнюю свечу: у обучающих окон она — цель.
+        :param data: DataFrame с историческими данными.
+        :param look_back: Количество временных шагов для анализа.
+        :return: X формы (1, look_back, 1) в float32, scaler (объект для нормализации).
+        """
+        try:
+            if data is None or data.empty:
+                raise ValueError("Data is None or empty.")
+            if len(data) < look_back:
+                raise ValueError(f"Not enough data: {len(data)} rows for look_back={look_back}.")
+            scaler = MinMaxScaler(feature_range=(0, 1))
+            closes = data['close'].to_numpy(dtype=np.float32).reshape(-1, 1)
+            # Нормализация по всему фрейму, как в prepare_data, но трансформируется только нужное окно
+            scaler.fit(closes)
+            window = scaler.transform(closes[-look_back:]).astype(np.float32, copy=False)
+            return window.reshape(1, look_back, 1), scaler
+        except Exception as e:
+            logging.error(f"Error preparing last window: {e}")
+            raise
+
+    def prepare_training_data(self, data):
+        """
+        Готовит окна для дообучения: с сохраненной нормализацией бандла (без нового fit), если она есть.
+        :param data: DataFrame с историческими данными.
+        :return: X, y.
+        """
+        if self.bundle is not None and self.bundle.normalization == "minmax":
+            closes = data['close'].to_numpy(dtype=np.float32)
+            series = ModelBundle.transform(closes, self.bundle.get_scale(closes))
+            return LSTMModel.make_windows(series, self.bundle.look_back)
+        X, y, scaler = LSTMModel.prepare_data(data)
+        return X, y
+
+    @timed("model.train")
+    def train(self, X_train, y_train, epochs=None, batch_size=None, validation_split=0.2, on_epoch_end=None):
         """
         Обучает модель на предоставленных данных.
         :param X_train: Входные данные для обучения.
         :param y_train: Целевые значения для обучения.
-        :param epochs: Количество эпох обучения.
-        :param batch_size: Размер батча.
+        :param epochs: Количество эпох обучения (None — из гиперпараметров).
+        :param batch_size: Размер батча (None — из гиперпараметров).
         :param validation_split: Доля данных для валидации.
+        :param on_epoch_end: Функция on_epoch_end(epoch, logs), вызывается после каждой эпохи (прогресс).
+        :return: История обучения Keras.
         """
         try:
             if X_train is None or y_train is None:
                 raise ValueError("Training data is None.")
+            epochs = epochs or self.hyperparams["epochs"]
+            batch_size = batch_size or self.hyperparams["batch_size"]
             
             logging.info(f"Starting training for {epochs} epochs.")
             
             # Callbacks для ранней остановки и сохранения лучшей модели
             callbacks = [
-                EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True),
+                EarlyStopping(monitor='val_loss', patience=self.hyperparams["patience"], restore_best_weights=True),
                 ModelCheckpoint(self.model_path, monitor='val_loss', save_best_only=True),
                 TrainingProgressLogger()
             ]
+            if on_epoch_end is not None:
+                callbacks.append(LambdaCallback(on_epoch_end=on_epoch_end))
             
             history = self.model.fit(
                 X_train, 
@@ -98,10 +224,99 @@ class LSTMModel:
             self.last_trained = datetime.datetime.now()
             
             logging.info(f"Training completed. Final loss: {history.history['loss'][-1]}")
+            return history
         except Exception as e:
             logging.error(f"Error during training: {e}")
             raise
 
+    @timed("model.train")
+    def train_on_dataset(self, train_dataset, validation_dataset=None, epochs=None, on_epoch_end=None):
+        """
+        Обучает модель на потоковом наборе данных (tf.data.Dataset, уже разбитом на батчи).
+        :param train_dataset: Набор данных для обучения.
+        :param validation_dataset: Набор данных для валидации (опционально).
+        :param epochs: Количество эпох обучения (None — из гиперпараметров).
+        :param on_epoch_end: Функция on_epoch_end(epoch, logs), вызывается после каждой эпохи (прогресс).
+        :return: История обучения (keras History).
+        """
+        try:
+            if train_dataset is None:
+                raise ValueError("Training dataset is None.")
+            epochs = epochs or self.hyperparams["epochs"]
+
+            logging.info(f"Starting streaming training for {epochs} epochs.")
+
+            monitor = 'val_loss' if validation_dataset is not None else 'loss'
+            callbacks = [
+                EarlyStopping(monitor=monitor, patience=self.hyperparams["patience"], restore_best_weights=True),
+                ModelCheckpoint(self.model_path, monitor=monitor, save_best_only=True),
+                TrainingProgressLogger()
+            ]
+            if on_epoch_end is not None:
+                callbacks.append(LambdaCallback(on_epoch_end=on_epoch_end))
+
+            history = self.model.fit(
+                train_dataset,
+                epochs=epochs,
+                validation_data=validation_dataset,
+                callbacks=callbacks
+            )
+
+            self.is_trained = True
+            self.last_trained = datetime.datetime.now()
+
+            logging.info(f"Training completed. Final loss: {history.history['loss'][-1]}")
+            return history
+        except Exception as e:
+            logging.error(f"Error during training: {e}")
+            raise
+
+    def evaluate(self, X, y, batch_size=256):
+        """
+        Считает функцию потерь (MSE) модели на данных.
+        :return: Значение потерь.
+        """
+        return float(self.model.evaluate(X, y, batch_size=batch_size, verbose=0))
+
+    def fine_tuned_copy(self, X_train, y_train, epochs=3, batch_size=32, learning_rate=1e-4):
+        """
+        Дообучает копию модели (warm start с текущих весов) на новых данных; исходная модель не меняется.
+        :param X_train: Новые входные окна.
+        :param y_train: Новые целевые значения.
+        :param epochs: Количество эпох дообучения.
+        :param batch_size: Размер батча.
+        :param learning_rate: Скорость обучения (меньше, чем при обучении с нуля).
+        :return: Новый LSTMModel с дообученными весами.
+        """
+        try:
+            if X_train is None or y_train is None:
+                raise ValueError("Training data is None.")
+            from tensorflow.keras.models import clone_model
+
+            candidate = LSTMModel(self.input_shape, model_path=self.model_path, build=False,
+                                  hyperparams=self.hyperparams)
+            candidate.bundle = self.bundle.copy() if self.bundle is not None else None
+            candidate.model = clone_model(self.model)
+            candidate.model.set_weights(self.model.get_weights())
+            candidate.model.compile(optimizer=Adam(learning_rate=learning_rate), loss='mean_squared_error')
+
+            logging.info(f"Starting fine-tuning for {epochs} epochs on {len(y_train)} windows.")
+            history = candidate.model.fit(
+                X_train,
+                y_train,
+                epochs=epochs,
+                batch_size=batch_size,
+                callbacks=[TrainingProgressLogger()]
+            )
+            candidate.is_trained = True
+            candidate.last_trained = datetime.datetime.now()
+            logging.info(f"Fine-tuning completed. Final loss: {history.history['loss'][-1]}")
+            return candidate
+        except Exception as e:
+            logging.error(f"Error during fine-tuning: {e}")
+            raise
+
+    @timed("model.predict")
     def predict(self, X_test):
         """
         Прогнозирует значения на основе входных данных.
@@ -116,6 +331,48 @@ class LSTMModel:
             logging.error(f"Error during prediction: {e}")
             raise
 
+    def _get_forward(self):
+        """
+        Возвращает скомпилированную функцию прямого прохода модели.
+        Сигнатура фиксирована, поэтому граф трассируется один раз на модель.
+        """
+        if self._forward is None:
+            model = self.model
+
+            @tf.function(input_signature=[tf.TensorSpec(shape=(None, *self.input_shape), dtype=tf.float32)])
+            def forward(x):
+                return model(x, training=False)
+
+            self._forward = forward
+        return self._forward
+
+    @timed("model.predict_last", backend="keras")
+    def predict_last(self, X_last):
+        """
+        Быстрый прогноз для небольшого батча окон прямым вызовом модели (без model.predict).
+        :param X_last: Окна формы (batch, look_back, 1).
+        :return: Прогнозируемые значения формы (batch, 1).
+        """
+        try:
+            if X_last is None:
+                raise ValueError("Input window is None.")
+            return self._get_forward()(tf.convert_to_tensor(X_last, dtype=tf.float32)).numpy()
+        except Exception as e:
+            logging.error(f"Error during prediction: {e}")
+            raise
+
+    def create_stream(self, resync_interval=60, scale_window=200):
+        """
+        Создает потоковый инференс для модели: состояние LSTM хранится по парам,
+        каждая новая свеча стоит одного временного шага (см. models/streaming_lstm.py).
+        :param resync_interval: Через сколько свечей пересчитывать состояние по полному окну.
+        :param scale_window: Сколько последних свечей используется для нормализации.
+        :return: StreamingLSTM.
+        """
+        from models.streaming_lstm import StreamingLSTM
+        return StreamingLSTM.from_lstm_model(self, resync_interval=resync_interval, scale_window=scale_window)
+
+    @timed("model.save")
     def save_model(self, filepath=None):
         """
         Сохраняет модель в файл.
@@ -129,12 +386,21 @@ class LSTMModel:
             if not filepath.endswith('.keras'):
                 filepath += '.keras'
 
-            self.model.save(filepath)
+            if self.bundle is None:
+                self.model.save(filepath)
+            else:
+                # Бандл пишется до замены файла модели, чтобы загрузка новой модели всегда видела её бандл
+                temp_path = filepath[:-len('.keras')] + '.saving.keras'
+                self.model.save(temp_path)
+                self.bundle.version = ModelBundle.compute_version(temp_path)
+                self.bundle.save(filepath)
+                os.replace(temp_path, filepath)
             logging.info(f"Model saved to {filepath}.")
         except Exception as e:
             logging.error(f"Error saving model: {e}")
             raise
 
+    @timed("model.load", backend="keras")
     def load_model(self, filepath=None):
         """
         Загружает модель из файла.
@@ -151,6 +417,8 @@ class LSTMModel:
 
             from tensorflow.keras.models import load_model
             self.model = load_model(filepath)
+            self.bundle = ModelBundle.load(filepath)
+            self._forward = None
             self.is_trained = True
             logging.info(f"Model loaded from {filepath}.")
         except Exception as e:
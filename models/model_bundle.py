@@ -0,0 +1,172 @@
+# ========== models/model_bundle.py ==========
+
+import os
+import json
+import hashlib
+import logging
+import datetime
+import numpy as np
+
+BUNDLE_FORMAT_VERSION = 1
+
+
+class ModelBundle:
+    """
+    Метаданные обученной модели, сохраняемые рядом с файлом .keras (models/<key>.bundle.json):
+    параметры нормализации, look_back, список признаков, диапазон обучающих данных и хэш версии модели.
+    Позволяют применять на инференсе ту же нормализацию, что при обучении, без повторного fit.
+    """
+    def __init__(self, look_back=60, features=("close",), normalization="minmax", data_min=None, data_max=None,
+                 first_candle=None, last_candle=None, version=None, created_at=None):
+        """
+        :param look_back: Длина окна модели.
+        :param features: Признаки входа (сейчас только close).
+        :param normalization: "minmax" — сохраненные min/max обучающих данных;
+                              "per_series" — MinMax по каждому ряду (модель обучена с нормализацией по паре).
+        :param data_min: Минимум обучающих данных (для "minmax").
+        :param data_max: Максимум обучающих данных (для "minmax").
+        :param first_candle: Первая свеча обучающих данных (ISO-строка).
+        :param last_candle: Последняя свеча обучающих данных (ISO-строка).
+        :param version: Хэш файла модели (заполняется при сохранении).
+        :param created_at: Время создания (ISO-строка).
+        """
+        if normalization not in ("minmax", "per_series"):
+            raise ValueError(f"Unknown normalization: {normalization}")
+        self.look_back = look_back
+        self.features = list(features)
+        self.normalization = normalization
+        self.data_min = data_min
+        self.data_max = data_max
+        self.first_candle = first_candle
+        self.last_candle = last_candle
+        self.version = version
+        self.created_at = created_at or datetime.datetime.now().isoformat()
+
+    @classmethod
+    def from_scaler(cls, scaler, look_back=60, data_range=None):
+        """
+        Создает бандл из обученного MinMaxScaler (как возвращает LSTMModel.prepare_data).
+        :param data_range: (первая, последняя свеча) обучающих данных.
+        """
+        first_candle, last_candle = data_range if data_range else (None, None)
+        return cls(
+            look_back=look_back,
+            data_min=float(scaler.data_min_[0]),
+            data_max=float(scaler.data_max_[0]),
+            first_candle=_to_iso(first_candle),
+            last_candle=_to_iso(last_candle),
+        )
+
+    @classmethod
+    def per_series(cls, look_back=60, data_range=None):
+        """Создает бандл для модели, обученной с нормализацией по каждому ряду."""
+        first_candle, last_candle = data_range if data_range else (None, None)
+        return cls(look_back=look_back, normalization="per_series",
+                   first_candle=_to_iso(first_candle), last_candle=_to_iso(last_candle))
+
+    def copy(self, **changes):
+        """Возвращает копию бандла с измененными полями (версия сбрасывается)."""
+        values = self.to_dict()
+        values.pop("format_version", None)
+        values.update(version=None, created_at=None)
+        values.update(changes)
+        return ModelBundle(**values)
+
+    def get_scale(self, closes):
+        """
+        Возвращает параметры нормализации (min, max) для ряда цен закрытия.
+        Для "minmax" — сохраненные значения (без fit), для "per_series" — по самому ряду.
+        """
+        if self.normalization == "minmax":
+            return self.data_min, self.data_max
+        closes = np.asarray(closes, dtype=np.float32)
+        return float(closes.min()), float(closes.max())
+
+    @staticmethod
+    def transform(values, scale):
+        """Нормализует значения параметрами scale = (min, max)."""
+        low, high = scale
+        return ((np.asarray(values, dtype=np.float32) - low) / ((high - low) or 1.0)).astype(np.float32)
+
+    @staticmethod
+    def inverse_transform(values, scale):
+        """Возвращает нормализованные значения в исходный масштаб цен."""
+        low, high = scale
+        return np.asarray(values, dtype=np.float32) * ((high - low) or 1.0) + low
+
+    def make_window(self, data):
+        """
+        Готовит последнее окно для прогноза с сохраненной нормализацией.
+        :param data: DataFrame с колонкой close (не короче look_back).
+        :return: X формы (1, look_back, 1), scale для inverse_transform.
+        """
+        closes = data['close'].to_numpy(dtype=np.float32)
+        if len(closes) < self.look_back:
+            raise ValueError(f"Not enough data: {len(closes)} rows for look_back={self.look_back}.")
+        scale = self.get_scale(closes)
+        window = self.transform(closes[-self.look_back:], scale)
+        return window.reshape(1, self.look_back, 1), scale
+
+    def to_dict(self):
+        return {
+            "format_version": BUNDLE_FORMAT_VERSION,
+            "look_back": self.look_back,
+            "features": self.features,
+            "normalization": self.normalization,
+            "data_min": self.data_min,
+            "data_max": self.data_max,
+            "first_candle": self.first_candle,
+            "last_candle": self.last_candle,
+            "version": self.version,
+            "created_at": self.created_at,
+        }
+
+    @classmethod
+    def from_dict(cls, values):
+        values = dict(values)
+        values.pop("format_version", None)
+        return cls(**values)
+
+    @staticmethod
+    def sidecar_path(model_path):
+        """Путь к файлу бандла рядом с файлом модели: models/<key>.keras -> models/<key>.bundle.json."""
+        base, _ = os.path.splitext(model_path)
+        return f"{base}.bundle.json"
+
+    @staticmethod
+    def compute_version(model_path):
+        """Хэш содержимого файла модели (первые 16 символов SHA-256)."""
+        digest = hashlib.sha256()
+        with open(model_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()[:16]
+
+    def save(self, model_path):
+        """Сохраняет бандл рядом с файлом модели."""
+        path = self.sidecar_path(model_path)
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+        return path
+
+    @classmethod
+    def load(cls, model_path, check_version=True):
+        """
+        Загружает бандл для файла модели.
+        :param check_version: Сверять ли хэш бандла с файлом модели.
+        :return: ModelBundle или None, если файла бандла нет.
+        """
+        path = cls.sidecar_path(model_path)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            bundle = cls.from_dict(json.load(f))
+        if check_version and bundle.version and os.path.exists(model_path) and bundle.version != cls.compute_version(model_path):
+            logging.warning(f"Bundle {path} does not match model file {model_path} (version mismatch).")
+        return bundle
+
+
+def _to_iso(value):
+    if value is None or isinstance(value, str):
+        return value
+    return value.isoformat()
@@ -0,0 +1,226 @@
+# ========== models/model_registry.py ==========
+
+import os
+import time
+import logging
+import threading
+
+MODEL_EXTENSIONS = {"keras": ".keras", "tflite": ".tflite"}
+
+
+class ModelRegistry:
+    """
+    Общий для процесса реестр LSTM-моделей.
+    Модель загружается с диска при первом обращении и разделяется всеми экземплярами AIPredictor.
+    Если файл модели изменился на диске (по mtime), при следующем обращении она перезагружается.
+    Бэкенд tflite не отдает модель, экспортированную раньше последнего сохранения ее .keras-файла
+    (переобучение и дообучение обновляют только .keras и бандл): такую модель нужно экспортировать заново.
+    """
+    def __init__(self, models_dir="models", input_shape=(60, 1), backend="keras"):
+        """
+        :param models_dir: Директория с файлами моделей.
+        :param input_shape: Форма входных данных моделей.
+        :param backend: "keras" (*.keras, LSTMModel) или "tflite" (*.tflite, LiteModel).
+        """
+        if backend not in MODEL_EXTENSIONS:
+            raise ValueError(f"Unknown model backend: {backend}")
+        self.models_dir = models_dir
+        self.input_shape = input_shape
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._entries = {}  # model_key -> {"model": LSTMModel, "mtime": float | None}
+        self._load_stats = {}  # model_key -> {"loads": int, "last_load_time": float, "total_load_time": float}
+        self._generations = {}  # model_key -> номер версии в памяти (растет при каждой загрузке/публикации)
+        self._listeners = []  # Функции model_key -> None, вызываются при смене версии модели
+        self._failed = {}  # model_key -> mtime файла, загрузка которого не удалась (повтор — после его изменения)
+        self._stale = {}  # model_key -> mtime устаревшего файла .tflite (предупреждение выводится один раз)
+
+    def model_path(self, model_key):
+        """Возвращает путь к файлу модели для ключа (например, short_term_1)."""
+        return os.path.join(self.models_dir, f"{model_key}{MODEL_EXTENSIONS[self.backend]}")
+
+    @staticmethod
+    def _get_mtime(path):
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return None
+
+    def _get_key_lock(self, model_key):
+        with self._lock:
+            return self._key_locks.setdefault(model_key, threading.Lock())
+
+    def get(self, model_key, factory=None):
+        """
+        Возвращает модель по ключу, загружая или перезагружая её при необходимости.
+        :param model_key: Ключ модели (например, short_term_1).
+        :param factory: Функция path -> объект модели с методом load_model (по умолчанию — по бэкенду).
+        :return: LSTMModel (LiteModel для tflite) или None, если модели нет ни в памяти, ни на диске.
+        """
+        path = self.model_path(model_key)
+        mtime = self._get_mtime(path)
+        if mtime is not None and self._is_outdated_export(model_key, path, mtime):
+            return None
+        entry = self._entries.get(model_key)
+        if entry is not None and (mtime is None or entry["mtime"] == mtime):
+            return entry["model"]
+        if mtime is None or self._failed.get(model_key) == mtime:
+            # Эта версия файла уже не загрузилась: ждем, пока файл снова изменится
+            return entry["model"] if entry is not None else None
+
+        # Загрузка под блокировкой ключа: параллельные запросы одной модели ждут одну загрузку
+        with self._get_key_lock(model_key):
+            entry = self._entries.get(model_key)
+            if entry is not None and entry["mtime"] == mtime:
+                return entry["model"]
+            if self._failed.get(model_key) == mtime:
+                return entry["model"] if entry is not None else None
+            return self._load(model_key, path, mtime, previous=entry, factory=factory)
+
+    def _load(self, model_key, path, mtime, previous=None, factory=None):
+        start = time.perf_counter()
+        try:
+            lstm = (factory or self._create_model)(path)
+            lstm.load_model()
+        except Exception as e:
+            logging.error(f"Ошибка при загрузке модели {model_key} из {path}: {e}")
+            # Файл мог быть недописан — продолжаем работать с предыдущей версией;
+            # повторная загрузка — только после следующего изменения файла
+            with self._lock:
+                self._failed[model_key] = mtime
+            return previous["model"] if previous is not None else None
+        load_time = time.perf_counter() - start
+
+        with self._lock:
+            self._entries[model_key] = {"model": lstm, "mtime": mtime}
+            self._failed.pop(model_key, None)
+            self._generations[model_key] = self._generations.get(model_key, 0) + 1
+            stats = self._load_stats.setdefault(model_key, {"loads": 0, "last_load_time": 0.0, "total_load_time": 0.0})
+            stats["loads"] += 1
+            stats["last_load_time"] = load_time
+            stats["total_load_time"] += load_time
+
+        action = "Перезагружена" if previous is not None else "Загружена"
+        logging.info(f"{action} модель {model_key} из {path} за {load_time:.2f} с")
+        self._notify(model_key)
+        return lstm
+
+    def _is_outdated_export(self, model_key, path, mtime):
+        """
+        Для tflite: True, если .keras-модель сохранена позже экспорта (файл .tflite устарел).
+        Устаревшая модель выгружается из реестра.
+        """
+        if self.backend != "tflite":
+            return False
+        source_mtime = self._get_mtime(os.path.join(self.models_dir, f"{model_key}{MODEL_EXTENSIONS['keras']}"))
+        if source_mtime is None or source_mtime <= mtime:
+            return False
+        if self._stale.get(model_key) != mtime:
+            self._stale[model_key] = mtime
+            logging.warning(f"Модель {path} старше {model_key}.keras и не используется; "
+                            f"экспортируйте ее заново: python -m models.lite_export")
+        if model_key in self._entries:
+            self.invalidate(model_key)
+        return True
+
+    def _create_model(self, path):
+        # Импорт по требованию: бэкенду tflite не нужен TensorFlow/Keras
+        if self.backend == "tflite":
+            from models.lite_model import LiteModel
+            return LiteModel(path)
+        from models.lstm_model import LSTMModel
+        return LSTMModel(input_shape=self.input_shape, model_path=path, build=False)
+
+    def publish(self, model_key, lstm_model):
+        """
+        Регистрирует уже находящуюся в памяти модель (например, только что обученную).
+        :param model_key: Ключ модели.
+        :param lstm_model: Экземпляр LSTMModel.
+        """
+        mtime = self._get_mtime(self.model_path(model_key))
+        with self._lock:
+            self._entries[model_key] = {"model": lstm_model, "mtime": mtime}
+            self._generations[model_key] = self._generations.get(model_key, 0) + 1
+        self._notify(model_key)
+
+    def preload(self, model_keys):
+        """Загружает перечисленные модели заранее (например, для прогрева)."""
+        for model_key in model_keys:
+            self.get(model_key)
+
+    def invalidate(self, model_key=None):
+        """
+        Удаляет модель (или все модели) из реестра; следующее обращение загрузит её с диска.
+        :param model_key: Ключ модели или None для всех моделей.
+        """
+        with self._lock:
+            if model_key is None:
+                invalidated = list(self._entries)
+                self._entries.clear()
+                self._failed.clear()
+            else:
+                self._failed.pop(model_key, None)
+                invalidated = [model_key] if self._entries.pop(model_key, None) is not None else []
+        for key in invalidated:
+            self._notify(key)
+
+    def get_version(self, model_key):
+        """
+        Возвращает версию модели в памяти: (mtime файла, номер загрузки/публикации).
+        :return: Кортеж или None, если модель не загружена.
+        """
+        with self._lock:
+            entry = self._entries.get(model_key)
+            if entry is None:
+                return None
+            return entry["mtime"], self._generations.get(model_key, 0)
+
+    def add_listener(self, callback):
+        """
+        Подписывает функцию callback(model_key) на смену версии модели (загрузка, публикация, сброс).
+        Повторная подписка той же функции игнорируется.
+        """
+        with self._lock:
+            if callback not in self._listeners:
+                self._listeners.append(callback)
+
+    def _notify(self, model_key):
+        with self._lock:
+            listeners = list(self._listeners)
+        for callback in listeners:
+            try:
+                callback(model_key)
+            except Exception as e:
+                logging.error(f"Model registry listener failed for {model_key}: {e}")
+
+    def loaded_keys(self):
+        """Возвращает ключи моделей, загруженных в память."""
+        with self._lock:
+            return list(self._entries.keys())
+
+    def get_load_stats(self):
+        """
+        Возвращает статистику загрузок по моделям.
+        :return: Словарь {model_key: {"loads", "last_load_time", "total_load_time"}} (время в секундах).
+        """
+        with self._lock:
+            return {key: dict(stats) for key, stats in self._load_stats.items()}
+
+
+_registries = {}
+_registry_lock = threading.Lock()
+
+
+def get_model_registry(backend="keras"):
+    """
+    Возвращает общий для процесса экземпляр ModelRegistry для бэкенда (создается при первом вызове).
+    :param backend: "keras" или "tflite".
+    """
+    registry = _registries.get(backend)
+    if registry is None:
+        with _registry_lock:
+            registry = _registries.get(backend)
+            if registry is None:
+                registry = _registries[backend] = ModelRegistry(backend=backend)
+    return registry
@@ -0,0 +1,169 @@
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.models import Model
+from tensorflow.keras.layers import LSTM, Dense, Dropout, Input, Embedding, Flatten, Concatenate
+from tensorflow.keras.callbacks import EarlyStopping, ModelCheckpoint
+import datetime
+import logging
+from models.lstm_model import TrainingProgressLogger
+
+MULTI_HORIZON_KEY = "multi_horizon"
+
+
+class MultiHorizonModel:
+    def __init__(self, model_keys, input_shape=(60, 1), model_path="models/multi_horizon.keras", build=True,
+                 embedding_dim=8):
+        """
+        Одна LSTM-сеть для всех таймфреймов: общий рекуррентный ствол и эмбеддинг таймфрейма перед выходным слоем.
+        Прогноз для всех таймфреймов получается одним батчевым проходом.
+        :param model_keys: Упорядоченный список ключей таймфреймов (например, short_term_1, ..., medium_term_D).
+        :param input_shape: Форма входных данных (look_back, 1).
+        :param model_path: Путь для сохранения/загрузки модели.
+        :param build: Строить ли новую сеть (False, если модель сразу будет загружена с диска).
+        :param embedding_dim: Размерность эмбеддинга таймфрейма.
+        """
+        self.model_keys = list(model_keys)
+        self.key_index = {key: index for index, key in enumerate(self.model_keys)}
+        self.input_shape = input_shape
+        self.model_path = model_path
+        self.embedding_dim = embedding_dim
+        self.model = self._build_model() if build else None
+        self.is_trained = False
+        self.last_trained = None
+        self._forward = None
+
+    def _build_model(self):
+        """
+        Создает архитектуру: LSTM(50) -> LSTM(50) -> [+ эмбеддинг таймфрейма] -> Dense(25) -> Dense(1).
+        :return: Модель Keras с входами [окно, индекс таймфрейма].
+        """
+        window = Input(shape=self.input_shape, name="window")
+        timeframe_id = Input(shape=(1,), dtype="int32", name="timeframe_id")
+
+        x = LSTM(50, return_sequences=True)(window)
+        x = Dropout(0.2)(x)
+        x = LSTM(50, return_sequences=False)(x)
+        x = Dropout(0.2)(x)
+        embedding = Flatten()(Embedding(len(self.model_keys), self.embedding_dim)(timeframe_id))
+        x = Concatenate()([x, embedding])
+        x = Dense(25, activation='relu')(x)
+        output = Dense(1)(x)
+
+        model = Model(inputs=[window, timeframe_id], outputs=output)
+        model.compile(optimizer='adam', loss='mean_squared_error')
+        return model
+
+    def train(self, datasets, epochs=50, batch_size=32, validation_split=0.2, seed=None):
+        """
+        Обучает модель на окнах всех таймфреймов.
+        :param datasets: Словарь {model_key: (X, y)}.
+        :param epochs: Количество эпох обучения.
+        :param batch_size: Размер батча.
+        :param validation_split: Доля данных для валидации.
+        :param seed: Зерно перемешивания.
+        """
+        try:
+            if not datasets:
+                raise ValueError("Training data is empty.")
+
+            X = np.concatenate([np.asarray(X_tf, dtype=np.float32) for X_tf, y_tf in datasets.values()])
+            y = np.concatenate([np.asarray(y_tf, dtype=np.float32) for X_tf, y_tf in datasets.values()])
+            ids = np.concatenate([
+                np.full(len(y_tf), self.key_index[key], dtype=np.int32) for key, (X_tf, y_tf) in datasets.items()
+            ])
+            # Перемешиваем заранее: иначе validation_split взял бы только последний таймфрейм
+            order = np.random.default_rng(seed).permutation(len(y))
+            X, y, ids = X[order], y[order], ids[order, np.newaxis]
+
+            logging.info(f"Starting multi-horizon training on {len(y)} windows for {epochs} epochs.")
+            callbacks = [
+                EarlyStopping(monitor='val_loss', patience=5, restore_best_weights=True),
+                ModelCheckpoint(self.model_path, monitor='val_loss', save_best_only=True),
+                TrainingProgressLogger()
+            ]
+            history = self.model.fit(
+                [X, ids],
+                y,
+                epochs=epochs,
+                batch_size=batch_size,
+                validation_split=validation_split,
+                callbacks=callbacks
+            )
+
+            self.is_trained = True
+            self.last_trained = datetime.datetime.now()
+            logging.info(f"Training completed. Final loss: {history.history['loss'][-1]}")
+        except Exception as e:
+            logging.error(f"Error during training: {e}")
+            raise
+
+    def _get_forward(self):
+        if self._forward is None:
+            model = self.model
+
+            @tf.function(input_signature=[
+                tf.TensorSpec(shape=(None, *self.input_shape), dtype=tf.float32),
+                tf.TensorSpec(shape=(None, 1), dtype=tf.int32),
+            ])
+            def forward(window, timeframe_id):
+                return model([window, timeframe_id], training=False)
+
+            self._forward = forward
+        return self._forward
+
+    def predict_keys(self, X_last, model_keys):
+        """
+        Прогноз одного окна сразу для нескольких таймфреймов одним батчевым проходом.
+        :param X_last: Окно формы (1, look_back, 1).
+        :param model_keys: Ключи таймфреймов.
+        :return: Словарь {model_key: массив формы (1,)} (как prediction[-1] у отдельных моделей).
+        """
+        try:
+            if X_last is None:
+                raise ValueError("Input window is None.")
+            model_keys = [key for key in model_keys if key in self.key_index]
+            if not model_keys:
+                return {}
+            windows = np.repeat(np.asarray(X_last[-1:], dtype=np.float32), len(model_keys), axis=0)
+            ids = np.array([[self.key_index[key]] for key in model_keys], dtype=np.int32)
+            outputs = self._get_forward()(tf.convert_to_tensor(windows), tf.convert_to_tensor(ids)).numpy()
+            return {key: outputs[index] for index, key in enumerate(model_keys)}
+        except Exception as e:
+            logging.error(f"Error during prediction: {e}")
+            raise
+
+    def save_model(self, filepath=None):
+        """
+        Сохраняет модель в файл.
+        :param filepath: Путь для сохранения модели (если None, используется self.model_path).
+        """
+        try:
+            if filepath is None:
+                filepath = self.model_path
+            if not filepath.endswith('.keras'):
+                filepath += '.keras'
+            self.model.save(filepath)
+            logging.info(f"Model saved to {filepath}.")
+        except Exception as e:
+            logging.error(f"Error saving model: {e}")
+            raise
+
+    def load_model(self, filepath=None):
+        """
+        Загружает модель из файла.
+        :param filepath: Путь к файлу модели (если None, используется self.model_path).
+        """
+        try:
+            if filepath is None:
+                filepath = self.model_path
+            if not filepath.endswith('.keras'):
+                filepath += '.keras'
+
+            from tensorflow.keras.models import load_model
+            self.model = load_model(filepath)
+            self._forward = None
+            self.is_trained = True
+            logging.info(f"Model loaded from {filepath}.")
+        except Exception as e:
+            logging.error(f"Error loading model: {e}")
+            raise
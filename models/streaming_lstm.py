@@ -0,0 +1,237 @@
+# ========== models/streaming_lstm.py ==========
+
+import logging
+import threading
+from collections import deque
+import numpy as np
+from models.model_bundle import ModelBundle
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+_ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0.0),
+    "tanh": np.tanh,
+    "sigmoid": _sigmoid,
+}
+
+
+def extract_layers(keras_model):
+    """
+    Извлекает веса LSTM- и Dense-слоев Keras-модели для пошагового инференса на NumPy.
+    Dropout на инференсе не действует и пропускается.
+    :return: Список слоев ("lstm", kernel, recurrent_kernel, bias) и ("dense", kernel, bias, activation).
+    """
+    layers = []
+    for layer in keras_model.layers:
+        class_name = layer.__class__.__name__
+        if class_name == "LSTM":
+            if layer.activation.__name__ != "tanh" or layer.recurrent_activation.__name__ != "sigmoid":
+                raise ValueError(f"Unsupported LSTM activations in layer {layer.name}.")
+            kernel, recurrent_kernel, bias = layer.get_weights()
+            layers.append(("lstm", kernel, recurrent_kernel, bias))
+        elif class_name == "Dense":
+            kernel, bias = layer.get_weights()
+            layers.append(("dense", kernel, bias, layer.activation.__name__))
+        elif class_name not in ("Dropout", "InputLayer"):
+            raise ValueError(f"Unsupported layer for streaming inference: {class_name}")
+    return layers
+
+
+class StreamingLSTM:
+    """
+    Потоковый инференс LSTMModel: рекуррентные состояния (h, c) хранятся для каждой пары,
+    и каждая новая подтвержденная свеча стоит одного временного шага вычислений.
+    Шаг выполняется на NumPy сразу для всех обновляемых пар (батчем).
+    Каждые resync_interval шагов состояние пары пересчитывается с нуля по полному окну,
+    чтобы ограничить дрейф относительно обычного прогноза по окну.
+    Нормализация берется из бандла модели (сохраненные min/max обучения); для моделей без бандла —
+    MinMax по scale_window последним свечам пары.
+    Прогноз — ожидаемое относительное изменение цены к последнему закрытию (как в AIPredictor.predict_price_movement).
+    """
+    def __init__(self, layers, look_back=60, resync_interval=60, scale_window=200, bundle=None):
+        """
+        :param layers: Слои из extract_layers.
+        :param look_back: Длина окна модели.
+        :param resync_interval: Через сколько шагов пересчитывать состояние по полному окну.
+        :param scale_window: Сколько последних свечей хранится для пересинхронизации и нормализации по ряду.
+        :param bundle: ModelBundle модели (None — модель без бандла, нормализация по последним свечам).
+        """
+        self.layers = layers
+        self.look_back = look_back
+        self.bundle = bundle
+        self.resync_interval = resync_interval
+        self.scale_window = max(scale_window, look_back)
+        self._lstm_units = [layer[2].shape[0] for layer in layers if layer[0] == "lstm"]
+        self._lock = threading.Lock()
+        self._rows = {}  # symbol -> строка в массивах состояний
+        self._h = [np.zeros((0, units), dtype=np.float32) for units in self._lstm_units]
+        self._c = [np.zeros((0, units), dtype=np.float32) for units in self._lstm_units]
+        self._history = {}  # symbol -> deque последних цен закрытия
+        self._scale = {}  # symbol -> (min, max) на момент последней синхронизации
+        self._steps_since_sync = {}
+        self._last_output = {}
+
+    @classmethod
+    def from_lstm_model(cls, lstm_model, **kwargs):
+        """Создает потоковый инференс из обученного LSTMModel (с нормализацией из его бандла)."""
+        return cls(extract_layers(lstm_model.model), look_back=lstm_model.input_shape[0],
+                   bundle=lstm_model.bundle, **kwargs)
+
+    def _row(self, symbol):
+        row = self._rows.get(symbol)
+        if row is None:
+            row = self._rows[symbol] = len(self._rows)
+            self._h = [np.vstack([h, np.zeros((1, h.shape[1]), dtype=np.float32)]) for h in self._h]
+            self._c = [np.vstack([c, np.zeros((1, c.shape[1]), dtype=np.float32)]) for c in self._c]
+        return row
+
+    def _step(self, x, h_states, c_states):
+        """
+        Один временной шаг сети для батча пар.
+        :param x: Нормализованные цены формы (batch, 1).
+        :return: (выход формы (batch,), новые h, новые c).
+        """
+        new_h, new_c = [], []
+        lstm_index = 0
+        for layer in self.layers:
+            if layer[0] == "lstm":
+                kernel, recurrent_kernel, bias = layer[1:]
+                h, c = h_states[lstm_index], c_states[lstm_index]
+                z = x @ kernel + h @ recurrent_kernel + bias
+                i, f, g, o = np.split(z, 4, axis=1)  # порядок гейтов Keras: input, forget, cell, output
+                c = _sigmoid(f) * c + _sigmoid(i) * np.tanh(g)
+                h = _sigmoid(o) * np.tanh(c)
+                new_h.append(h)
+                new_c.append(c)
+                x = h
+                lstm_index += 1
+            else:
+                kernel, bias, activation = layer[1:]
+                x = _ACTIVATIONS[activation](x @ kernel + bias)
+        return x[:, 0], new_h, new_c
+
+    def _normalize(self, symbol, closes):
+        return ModelBundle.transform(closes, self._scale[symbol])
+
+    def _to_expected_change(self, symbol, output):
+        """Переводит выход сети (нормализованная цена следующей свечи) в изменение к последнему закрытию."""
+        price = float(ModelBundle.inverse_transform(output, self._scale[symbol]))
+        last_close = float(self._history[symbol][-1])
+        return price / last_close - 1.0 if last_close else 0.0
+
+    def _resync(self, symbol):
+        """Пересчитывает состояние пары с нуля по последнему окну и обновляет нормализацию."""
+        history = np.asarray(self._history[symbol], dtype=np.float32)
+        if self.bundle is not None:
+            self._scale[symbol] = self.bundle.get_scale(history)
+        else:
+            self._scale[symbol] = (float(history.min()), float(history.max()))
+        window = self._normalize(symbol, history[-self.look_back:])
+        h_states = [np.zeros((1, units), dtype=np.float32) for units in self._lstm_units]
+        c_states = [np.zeros((1, units), dtype=np.float32) for units in self._lstm_units]
+        output = None
+        for value in window:
+            output, h_states, c_states = self._step(np.array([[value]], dtype=np.float32), h_states, c_states)
+
+        row = self._row(symbol)
+        for layer_index in range(len(self._lstm_units)):
+            self._h[layer_index][row] = h_states[layer_index][0]
+            self._c[layer_index][row] = c_states[layer_index][0]
+        self._steps_since_sync[symbol] = 0
+        self._last_output[symbol] = self._to_expected_change(symbol, output[0])
+        return self._last_output[symbol]
+
+    def sync(self, symbol, closes):
+        """
+        Инициализирует (или принудительно пересинхронизирует) пару по истории цен закрытия.
+        :param symbol: Торговая пара.
+        :param closes: Цены закрытия в хронологическом порядке (не меньше look_back).
+        :return: Прогноз после последней свечи.
+        """
+        closes = np.asarray(closes, dtype=np.float32).reshape(-1)
+        if len(closes) < self.look_back:
+            raise ValueError(f"Not enough data to sync {symbol}: {len(closes)} < {self.look_back}.")
+        with self._lock:
+            self._history[symbol] = deque(closes[-self.scale_window:], maxlen=self.scale_window)
+            return self._resync(symbol)
+
+    def update_many(self, closes_by_symbol):
+        """
+        Продвигает состояния сразу нескольких пар на одну подтвержденную свечу.
+        Пары без синхронизации накапливают историю и начинают выдавать прогноз, когда наберется окно.
+        :param closes_by_symbol: Словарь {symbol: цена закрытия новой свечи}.
+        :return: Словарь {symbol: прогноз или None, если окно еще не набрано}.
+        """
+        results = {}
+        with self._lock:
+            step_symbols = []
+            for symbol, close in closes_by_symbol.items():
+                history = self._history.setdefault(symbol, deque(maxlen=self.scale_window))
+                history.append(float(close))
+                if symbol not in self._scale:
+                    results[symbol] = self._resync(symbol) if len(history) >= self.look_back else None
+                elif self._steps_since_sync[symbol] + 1 >= self.resync_interval:
+                    results[symbol] = self._resync(symbol)
+                else:
+                    step_symbols.append(symbol)
+
+            if step_symbols:
+                rows = np.array([self._rows[symbol] for symbol in step_symbols])
+                x = np.array([[self._normalize(symbol, self._history[symbol][-1])] for symbol in step_symbols],
+                             dtype=np.float32)
+                output, h_states, c_states = self._step(
+                    x, [h[rows] for h in self._h], [c[rows] for c in self._c]
+                )
+                for layer_index in range(len(self._lstm_units)):
+                    self._h[layer_index][rows] = h_states[layer_index]
+                    self._c[layer_index][rows] = c_states[layer_index]
+                for symbol, value in zip(step_symbols, output):
+                    self._steps_since_sync[symbol] += 1
+                    self._last_output[symbol] = self._to_expected_change(symbol, value)
+                    results[symbol] = self._last_output[symbol]
+        return results
+
+    def update(self, symbol, close):
+        """Продвигает состояние одной пары на одну свечу (см. update_many)."""
+        return self.update_many({symbol: close})[symbol]
+
+    def last_prediction(self, symbol):
+        """Возвращает последний прогноз пары (None, если его еще нет)."""
+        return self._last_output.get(symbol)
+
+
+class StreamingSession:
+    """
+    Потоковый инференс сразу для нескольких моделей (например, всех таймфреймов одного типа).
+    Состояние хранится для каждой пары (symbol, model).
+    """
+    def __init__(self, models, **kwargs):
+        """
+        :param models: Словарь {имя: LSTMModel} (например, {"1": ..., "3": ...}).
+        :param kwargs: Параметры StreamingLSTM (resync_interval, scale_window).
+        """
+        self.streams = {name: StreamingLSTM.from_lstm_model(model, **kwargs) for name, model in models.items()}
+        logging.info(f"Streaming session created for models: {list(self.streams)}")
+
+    def sync(self, symbol, closes):
+        """Синхронизирует пару во всех моделях. :return: {имя модели: прогноз}."""
+        return {name: stream.sync(symbol, closes) for name, stream in self.streams.items()}
+
+    def update_many(self, closes_by_symbol):
+        """
+        Продвигает все модели на одну свечу для нескольких пар.
+        :return: {symbol: {имя модели: прогноз или None}}.
+        """
+        results = {symbol: {} for symbol in closes_by_symbol}
+        for name, stream in self.streams.items():
+            for symbol, value in stream.update_many(closes_by_symbol).items():
+                results[symbol][name] = value
+        return results
+
+    def update(self, symbol, close):
+        """Продвигает все модели на одну свечу для одной пары. :return: {имя модели: прогноз}."""
+        return self.update_many({symbol: close})[symbol]
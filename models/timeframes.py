@@ -0,0 +1,8 @@
+# ========== models/timeframes.py ==========
+# Модуль без тяжелых зависимостей: таймфреймы моделей нужны CLI и сервису, которым не нужен TensorFlow.
+
+# Таймфреймы моделей по типам стратегий; ключ модели — "<тип>_<таймфрейм>" (например, short_term_60)
+TIMEFRAMES = {
+    "short_term": ["1", "3", "5", "15", "30", "60"],  # 1мин, 3мин, 5мин, 15мин, 30мин, 1час
+    "medium_term": ["60", "240", "D"]  # 1час, 4часа, 1день
+}
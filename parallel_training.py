@@ -0,0 +1,133 @@
+# ========== parallel_training.py ==========
+
+import os
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from utils.logging_utils import log_event
+
+
+def _init_worker(intra_op_threads, inter_op_threads):
+    """
+    Инициализация рабочего процесса: бюджет потоков TensorFlow и логирование.
+    Вызывается до первого импорта TensorFlow в процессе.
+    """
+    os.environ["TF_NUM_INTRAOP_THREADS"] = str(intra_op_threads)
+    os.environ["TF_NUM_INTEROP_THREADS"] = str(inter_op_threads)
+    os.environ["OMP_NUM_THREADS"] = str(intra_op_threads)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - [pid %(process)d] %(message)s")
+
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+
+
+def _train_job(job):
+    """
+    Обучает одну модель в рабочем процессе и сохраняет её во временный файл.
+    :param job: Словарь с ключами model_key, X, y, model_path, hyperparams, train_kwargs.
+    :return: Словарь с результатом (model_key, model_path, duration, val_loss, pid).
+    """
+    from models.lstm_model import LSTMModel
+
+    start = time.perf_counter()
+    lstm = LSTMModel(input_shape=job["X"].shape[1:], model_path=job["model_path"], hyperparams=job.get("hyperparams"))
+    history = lstm.train(job["X"], job["y"], **job.get("train_kwargs", {}))
+    lstm.save_model(job["model_path"])
+    return {
+        "model_key": job["model_key"],
+        "model_path": job["model_path"],
+        "duration": time.perf_counter() - start,
+        "val_loss": float(min(history.history.get('val_loss', [float('nan')]))),
+        "pid": os.getpid(),
+    }
+
+
+def resolve_worker_budget(workers, tf_threads_per_worker, jobs_count):
+    """
+    Делит ядра между рабочими процессами.
+    :param workers: Желаемое количество процессов (None — по числу ядер), не больше числа задач.
+    :param tf_threads_per_worker: Потоков TensorFlow на процесс (None — ядра / процессы).
+    :return: (workers, threads).
+    """
+    cpu_count = os.cpu_count() or 1
+    workers = max(1, min(workers or cpu_count, jobs_count))
+    threads = tf_threads_per_worker or max(1, cpu_count // workers)
+    return workers, threads
+
+
+class ParallelTrainer:
+    """
+    Оркестратор обучения: независимые модели таймфреймов обучаются в отдельных процессах.
+    """
+    def __init__(self, workers=None, tf_threads_per_worker=None, models_dir="models"):
+        """
+        :param workers: Количество рабочих процессов (по умолчанию — по числу ядер, но не больше числа задач).
+        :param tf_threads_per_worker: Потоков TensorFlow (intra-op) на процесс (по умолчанию — ядра / workers).
+        :param models_dir: Директория для временных файлов моделей.
+        """
+        self.workers = workers
+        self.tf_threads_per_worker = tf_threads_per_worker
+        self.models_dir = models_dir
+
+    def make_job(self, model_key, X, y, hyperparams=None, **train_kwargs):
+        """
+        Формирует задачу обучения.
+        :param model_key: Ключ модели (например, short_term_1).
+        :param X: Входные окна.
+        :param y: Целевые значения.
+        :param hyperparams: Гиперпараметры LSTMModel (None — значения по умолчанию).
+        :param train_kwargs: Параметры LSTMModel.train (epochs, batch_size, validation_split).
+        """
+        return {
+            "model_key": model_key,
+            "X": X,
+            "y": y,
+            "model_path": os.path.join(self.models_dir, f"{model_key}.training.keras"),
+            "hyperparams": hyperparams,
+            "train_kwargs": train_kwargs,
+        }
+
+    def run(self, jobs):
+        """
+        Запускает задачи в пуле процессов и ждет их завершения.
+        :param jobs: Список задач из make_job.
+        :return: (results, report): результаты по model_key и отчет о длительности и ускорении.
+        """
+        if not jobs:
+            return {}, {"jobs": {}, "errors": {}, "wall_time": 0.0, "serial_time": 0.0, "speedup": 0.0}
+
+        workers, threads = resolve_worker_budget(self.workers, self.tf_threads_per_worker, len(jobs))
+        log_event("AI Training", "Parallel training: %s jobs, %s workers, %s TF threads per worker", len(jobs), workers, threads)
+
+        results, errors = {}, {}
+        start = time.perf_counter()
+        # spawn: TensorFlow не переживает fork процесса с уже инициализированным рантаймом
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_worker, initargs=(threads, 2)) as pool:
+            futures = {pool.submit(_train_job, job): job["model_key"] for job in jobs}
+            for future in as_completed(futures):
+                model_key = futures[future]
+                try:
+                    results[model_key] = future.result()
+                    log_event("AI Training", "Job %s finished in %.1f s", model_key, results[model_key]['duration'])
+                except Exception as e:
+                    errors[model_key] = str(e)
+                    log_event("AI Training", "Job %s failed: %s", model_key, e, level="error")
+        wall_time = time.perf_counter() - start
+
+        serial_time = sum(result["duration"] for result in results.values())
+        report = {
+            "jobs": {key: round(result["duration"], 2) for key, result in results.items()},
+            "errors": errors,
+            "workers": workers,
+            "tf_threads_per_worker": threads,
+            "wall_time": round(wall_time, 2),
+            "serial_time": round(serial_time, 2),
+            "speedup": round(serial_time / wall_time, 2) if wall_time > 0 else 0.0,
+        }
+        log_event("AI Training", "Parallel training done in %s s (sum of jobs %s s, speedup x%s)",
+                  report['wall_time'], report['serial_time'], report['speedup'])
+        return results, report
@@ -0,0 +1,91 @@
+# ========== prediction_cache.py ==========
+
+import threading
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """
+    LRU-кэш результатов прогноза моделей.
+    Ключ — кортеж, первый элемент которого — ключ модели (model_key); это позволяет
+    сбрасывать все записи модели при её переобучении или перезагрузке.
+    """
+    def __init__(self, max_entries=1024):
+        """
+        :param max_entries: Максимальное количество записей (самые давние по использованию вытесняются).
+        """
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def get(self, key):
+        """
+        Возвращает закэшированный прогноз.
+        :return: Значение или None, если записи нет.
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key, value):
+        """Сохраняет прогноз, вытесняя самые давние записи при переполнении."""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate_model(self, model_key):
+        """Удаляет все записи модели (вызывается реестром моделей при смене версии)."""
+        with self._lock:
+            stale = [key for key in self._entries if key[0] == model_key]
+            for key in stale:
+                del self._entries[key]
+            self._invalidations += len(stale)
+
+    def clear(self):
+        """Полностью очищает кэш."""
+        with self._lock:
+            self._invalidations += len(self._entries)
+            self._entries.clear()
+
+    def get_stats(self):
+        """
+        Возвращает метрики кэша.
+        :return: Словарь с размером, попаданиями, промахами, долей попаданий, вытеснениями и сбросами.
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
+
+
+_prediction_cache = None
+_prediction_cache_lock = threading.Lock()
+
+
+def get_prediction_cache():
+    """Возвращает общий для процесса экземпляр PredictionCache (создается при первом вызове)."""
+    global _prediction_cache
+    if _prediction_cache is None:
+        with _prediction_cache_lock:
+            if _prediction_cache is None:
+                _prediction_cache = PredictionCache()
+    return _prediction_cache
@@ -0,0 +1,217 @@
+# ========== scheduler.py ==========
+
+import sys
+import math
+import time
+import signal
+import asyncio
+import logging
+import argparse
+from data_fetcher import timeframe_to_seconds
+from utils.logging_utils import setup_logging
+from utils import metrics
+
+if sys.platform == 'win32':
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+
+def next_close_time(timeframe, now=None):
+    """
+    Время закрытия текущей свечи таймфрейма (epoch, сек). Свечи Bybit выровнены по UTC
+    от начала эпохи: часовые — по началу часа, 4-часовые — по 0/4/8... UTC, дневные — по полуночи UTC.
+    :param timeframe: Таймфрейм Bybit v5 ('1', '60', 'D' и т.д.).
+    :param now: Текущее время (epoch, сек); по умолчанию time.time().
+    """
+    period = timeframe_to_seconds(timeframe)
+    now = time.time() if now is None else now
+    return (math.floor(now / period) + 1) * period
+
+
+class CandleScheduler:
+    """
+    Запускает обновление данных и анализ сразу после закрытия свечей, без участия пользователя.
+    Для каждого таймфрейма работает свой цикл: ждет закрытия свечи (+ close_delay, чтобы биржа
+    успела сформировать свечу), дозагружает новые свечи всех пар (DataFetcher.fetch_incremental_async)
+    и, для таймфрейма анализа, выполняет AnalysisPipeline.analyze_batch по каждой стратегии.
+
+    Запросы к бирже всех циклов проходят через общий ограничитель: между запросами не меньше
+    stagger секунд. Если тик не успел завершиться до следующего закрытия (система отстает),
+    пропущенные закрытия не догоняются по одному, а объединяются в один тик по последней свече.
+    По каждому таймфрейму считается лаг: задержка фактического старта тика относительно планового.
+    """
+    def __init__(self, pipeline, symbols, timeframes=None, analysis_timeframe="60",
+                 strategies=("short_term", "medium_term"), close_delay=2.0, stagger=0.2, limit=200,
+                 on_result=None):
+        """
+        :param pipeline: AnalysisPipeline (общий DataFetcher и AIPredictor).
+        :param symbols: Торговые пары.
+        :param timeframes: Таймфреймы для обновления данных; по умолчанию все из AIPredictor.timeframes.
+        :param analysis_timeframe: Таймфрейм, после закрытия свечи которого выполняется анализ.
+        :param strategies: Стратегии анализа ("short_term", "medium_term").
+        :param close_delay: Задержка после закрытия свечи перед запросом (сек).
+        :param stagger: Минимальный интервал между запросами к бирже (сек).
+        :param limit: Количество последних свечей для анализа.
+        :param on_result: Функция on_result(result, strategy) для результатов анализа
+                          (вызывается в потоке цикла событий).
+        """
+        self.pipeline = pipeline
+        self.symbols = list(symbols)
+        if timeframes is None:
+            timeframes = sorted({tf for tfs in pipeline.get_predictor().timeframes.values() for tf in tfs},
+                                key=timeframe_to_seconds)
+        self.timeframes = list(timeframes)
+        self.analysis_timeframe = analysis_timeframe
+        if analysis_timeframe not in self.timeframes:
+            self.timeframes.append(analysis_timeframe)
+        self.strategies = list(strategies)
+        self.close_delay = close_delay
+        self.stagger = stagger
+        self.limit = limit
+        self.on_result = on_result
+        self._next_request_at = 0.0
+        self._stop = None
+        self.stats = {timeframe: {"ticks": 0, "coalesced": 0, "failed_symbols": 0, "last_lag": None,
+                                  "max_lag": 0.0, "total_lag": 0.0, "last_duration": None}
+                      for timeframe in self.timeframes}
+
+    def get_stats(self):
+        """Статистика по таймфреймам: тики, объединенные пропуски, лаг (последний, средний, максимальный)."""
+        report = {}
+        for timeframe, stats in self.stats.items():
+            ticks = stats["ticks"]
+            report[timeframe] = {**stats, "avg_lag": stats["total_lag"] / ticks if ticks else None}
+        return report
+
+    def stop(self):
+        """Останавливает циклы (можно вызывать из обработчика сигнала в потоке цикла событий)."""
+        if self._stop is not None:
+            self._stop.set()
+
+    async def run(self):
+        """Выполняет циклы всех таймфреймов до вызова stop()."""
+        self._stop = asyncio.Event()
+        loops = [asyncio.ensure_future(self._timeframe_loop(timeframe)) for timeframe in self.timeframes]
+        try:
+            await self._stop.wait()
+        finally:
+            for task in loops:
+                task.cancel()
+            await asyncio.gather(*loops, return_exceptions=True)
+
+    async def _sleep_until(self, wall_time):
+        """Ждет наступления момента wall_time (epoch) или остановки. :return: False при остановке."""
+        try:
+            await asyncio.wait_for(self._stop.wait(), timeout=max(0.0, wall_time - time.time()))
+            return False
+        except asyncio.TimeoutError:
+            return True
+
+    async def _throttle(self):
+        """Резервирует слот запроса к бирже: запросы всех циклов идут не чаще, чем раз в stagger секунд."""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        slot = max(now, self._next_request_at)
+        self._next_request_at = slot + self.stagger
+        await asyncio.sleep(slot - now)
+
+    async def _fetch(self, symbol, timeframe):
+        await self._throttle()
+        return await self.pipeline.get_fetcher().fetch_incremental_async(symbol, timeframe, limit=self.limit)
+
+    async def _timeframe_loop(self, timeframe):
+        period = timeframe_to_seconds(timeframe)
+        stats = self.stats[timeframe]
+        close_time = next_close_time(timeframe)
+        while True:
+            due = close_time + self.close_delay
+            if not await self._sleep_until(due):
+                return
+            started = time.time()
+            lag = started - due
+            try:
+                await self._tick(timeframe)
+            except Exception as e:
+                logging.error(f"Ошибка тика планировщика ({timeframe}): {e}")
+            finished = time.time()
+
+            # Закрытия, прошедшие во время тика, не выполняются по одному — следующий тик берет последнюю свечу
+            next_close = next_close_time(timeframe, finished)
+            coalesced = int(round((next_close - close_time) / period)) - 1
+            if coalesced > 0:
+                logging.warning(f"Планировщик {timeframe}: отставание, объединено пропущенных тиков: {coalesced}.")
+            stats["ticks"] += 1
+            stats["coalesced"] += max(0, coalesced)
+            stats["last_lag"] = lag
+            stats["max_lag"] = max(stats["max_lag"], lag)
+            stats["total_lag"] += lag
+            stats["last_duration"] = finished - started
+            logging.info(f"Тик {timeframe}: лаг {lag:.2f} с, длительность {finished - started:.2f} с.")
+            close_time = next_close
+
+    async def _tick(self, timeframe):
+        frames = await asyncio.gather(*(self._fetch(symbol, timeframe) for symbol in self.symbols))
+        data_by_symbol = dict(zip(self.symbols, frames))
+        self.stats[timeframe]["failed_symbols"] += sum(data.empty for data in frames)
+        if timeframe != self.analysis_timeframe:
+            return
+        loop = asyncio.get_running_loop()
+        for strategy in self.strategies:
+            results = await loop.run_in_executor(None, self.pipeline.analyze_batch, data_by_symbol, strategy,
+                                                 timeframe)
+            if self.on_result is not None:
+                for result in results.values():
+                    self.on_result(result, strategy)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Refresh candles and run the analysis right after each candle close; results as JSON Lines.")
+    parser.add_argument("--symbols", nargs="+", required=True)
+    parser.add_argument("--timeframes", nargs="+", default=None,
+                        help="Timeframes to refresh (default: all timeframes of the models).")
+    parser.add_argument("--analysis-timeframe", default="60")
+    parser.add_argument("--strategies", nargs="+", choices=("short_term", "medium_term"),
+                        default=["short_term", "medium_term"])
+    parser.add_argument("--close-delay", type=float, default=2.0)
+    parser.add_argument("--stagger", type=float, default=0.2)
+    parser.add_argument("--output", default=None, help="Append records to this file instead of stdout.")
+    parser.add_argument("--backend", choices=("keras", "tflite"), default="keras")
+    parser.add_argument("--log-file", default="logs/scheduler.log")
+    parser.add_argument("--log-json", action="store_true", help="Write log records as JSON lines.")
+    metrics.add_arguments(parser)
+    args = parser.parse_args(argv)
+    setup_logging(log_file=args.log_file, json_format=args.log_json)
+    metrics.configure(args.metrics_port, args.metrics_file)
+
+    from analysis_pipeline import AnalysisPipeline
+    from cli import JsonLinesWriter, make_record
+
+    writer = JsonLinesWriter(args.output)
+    scheduler = CandleScheduler(AnalysisPipeline(headless=True, backend=args.backend), args.symbols,
+                                timeframes=args.timeframes, analysis_timeframe=args.analysis_timeframe,
+                                strategies=args.strategies, close_delay=args.close_delay, stagger=args.stagger,
+                                on_result=lambda result, strategy: writer.write(make_record(result, strategy)))
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, scheduler.stop)
+            except (NotImplementedError, AttributeError, ValueError):
+                pass  # Windows: остановка по KeyboardInterrupt
+        await scheduler.run()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        writer.close()
+        for timeframe, stats in scheduler.get_stats().items():
+            avg_lag = f"{stats['avg_lag']:.2f}" if stats["avg_lag"] is not None else "-"
+            logging.info(f"Планировщик {timeframe}: тиков {stats['ticks']}, объединено {stats['coalesced']}, "
+                         f"средний лаг {avg_lag} с, максимальный {stats['max_lag']:.2f} с.")
+
+
+if __name__ == "__main__":
+    main()
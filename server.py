@@ -0,0 +1,325 @@
+# ========== server.py ==========
+
+import sys
+import time
+import asyncio
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from aiohttp import web
+from analysis_pipeline import AnalysisPipeline, SCAN_TIMEFRAME, to_json_compatible, to_numeric_candles
+from models.timeframes import TIMEFRAMES as MODEL_TIMEFRAMES
+from utils.indicators import EMA, RSI, MACD, ATR, BollingerBands
+from utils.validation_utils import validate_data
+from utils.logging_utils import setup_logging
+from utils import metrics
+
+if sys.platform == 'win32':
+    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+STRATEGIES = tuple(MODEL_TIMEFRAMES)
+# Интервалы Bybit v5, для которых есть модели (те же, что ai_predictor.TIMEFRAMES)
+TIMEFRAMES = tuple(dict.fromkeys(timeframe for timeframes in MODEL_TIMEFRAMES.values() for timeframe in timeframes))
+
+
+class ServiceError(Exception):
+    """Ошибка запроса с HTTP-статусом ответа."""
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class CandleCache:
+    """
+    Свечи в памяти, общие для всех запросов сервиса. Данные пары живут ttl секунд;
+    одновременные запросы одной пары ждут одну и ту же загрузку, а не запрашивают биржу каждый.
+    """
+    def __init__(self, fetch, ttl=30.0):
+        """
+        :param fetch: Корутина fetch(symbol, timeframe) -> DataFrame (пустой при ошибке).
+        :param ttl: Время жизни данных (сек).
+        """
+        self.fetch = fetch
+        self.ttl = ttl
+        self._entries = {}  # (symbol, timeframe) -> (loaded_at, DataFrame)
+        self._loading = {}  # (symbol, timeframe) -> Future загрузки
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, symbol, timeframe):
+        """
+        :return: Очищенный и отсортированный по времени DataFrame.
+        :raises ServiceError: Данные не загрузились или не прошли валидацию.
+        """
+        key = (symbol, timeframe)
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        future = self._loading.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._load(key))
+            self._loading[key] = future
+        # shield: отмена одного запроса клиентом не прерывает загрузку для остальных
+        return await asyncio.shield(future)
+
+    async def _load(self, key):
+        try:
+            data = await self.fetch(*key)
+            if data.empty:
+                raise ServiceError(502, "Не удалось загрузить данные.")
+            data = to_numeric_candles(data)
+            if not validate_data(data):
+                raise ServiceError(422, "Данные не прошли валидацию.")
+            self._entries[key] = (time.monotonic(), data)
+            return data
+        finally:
+            del self._loading[key]
+
+    def get_stats(self):
+        return {"entries": len(self._entries), "loading": len(self._loading), "hits": self.hits, "misses": self.misses}
+
+
+class PredictionBatcher:
+    """
+    Микро-батчинг инференса: запросы прогноза, пришедшие в течение batch_window секунд
+    (или пока не наберется max_batch), объединяются в один вызов AIPredictor.predict_price_movement_batch,
+    т.е. каждая модель вызывается один раз на весь батч. Одновременно выполняется не больше
+    model_concurrency батчей на группу моделей стратегии (short_term_* или medium_term_*).
+    """
+    def __init__(self, get_predictor, executor, batch_window=0.01, max_batch=64, model_concurrency=1):
+        """
+        :param get_predictor: Функция без аргументов, возвращающая общий AIPredictor.
+        :param executor: Пул потоков для инференса.
+        :param batch_window: Время накопления батча (сек).
+        :param max_batch: Максимальный размер батча (запросов).
+        :param model_concurrency: Одновременных батчей на группу моделей.
+        """
+        self.get_predictor = get_predictor
+        self.executor = executor
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.model_concurrency = model_concurrency
+        self._pending = {}  # (timeframe_type, data_timeframe) -> [(symbol, data, future)]
+        self._timers = {}
+        self._semaphores = {}  # timeframe_type -> asyncio.Semaphore
+        self.batches = 0
+        self.batched_requests = 0
+
+    async def predict(self, symbol, data, timeframe_type, data_timeframe):
+        """:return: Словарь {таймфрейм: прогноз} (как predict_price_movement)."""
+        loop = asyncio.get_running_loop()
+        key = (timeframe_type, data_timeframe)
+        future = loop.create_future()
+        pending = self._pending.setdefault(key, [])
+        pending.append((symbol, data, future))
+        if len(pending) >= self.max_batch:
+            self._flush(key)
+        elif len(pending) == 1:
+            self._timers[key] = loop.call_later(self.batch_window, self._flush, key)
+        return await future
+
+    def _flush(self, key):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        pending = self._pending.pop(key, None)
+        if pending:
+            asyncio.ensure_future(self._run_batch(key, pending))
+
+    async def _run_batch(self, key, pending):
+        timeframe_type, data_timeframe = key
+        # Повторные запросы одной пары в батче используют один прогноз
+        data_by_symbol = {symbol: data for symbol, data, _ in pending}
+        semaphore = self._semaphores.get(timeframe_type)
+        if semaphore is None:
+            semaphore = self._semaphores[timeframe_type] = asyncio.Semaphore(self.model_concurrency)
+        errors = {}  # Пары, исключенные из батча (например, мало свечей): остальные получают прогноз
+        try:
+            async with semaphore:
+                predictions = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, self.get_predictor().predict_price_movement_batch,
+                    data_by_symbol, timeframe_type, data_timeframe, errors
+                )
+        except Exception as e:
+            logging.error(f"Ошибка батчевого прогноза ({timeframe_type}, {len(data_by_symbol)} пар): {e}")
+            predictions = {}
+        self.batches += 1
+        self.batched_requests += len(pending)
+        for symbol, _, future in pending:
+            if future.done():
+                continue
+            if predictions.get(symbol):
+                future.set_result(predictions[symbol])
+            elif symbol in errors:
+                future.set_exception(ServiceError(422, f"Не удалось выполнить прогноз: {errors[symbol]}"))
+            else:
+                future.set_exception(ServiceError(503, "Не удалось выполнить прогноз."))
+
+    def get_stats(self):
+        return {
+            "batches": self.batches,
+            "requests": self.batched_requests,
+            "avg_batch_size": round(self.batched_requests / self.batches, 2) if self.batches else 0.0,
+            "pending": sum(len(pending) for pending in self._pending.values()),
+        }
+
+
+class AnalysisService:
+    """
+    HTTP JSON сервис анализа поверх AnalysisPipeline: один AIPredictor (и общий реестр моделей),
+    один кэш свечей и один батчер инференса на все запросы.
+
+    GET /health
+    GET /stats
+    GET /metrics                                   — метрики Prometheus (если включены)
+    GET /indicators/{symbol}?timeframe=60          — сигналы и значения индикаторов
+    GET /predict/{symbol}?strategy=short_term&timeframe=60   — прогнозы моделей
+    GET /analysis/{symbol}?strategy=short_term&timeframe=60  — рекомендация и параметры сделки
+    """
+    def __init__(self, pipeline=None, candles=None, workers=4, batch_window=0.01, max_batch=64,
+                 model_concurrency=1, candle_ttl=30.0):
+        """
+        :param pipeline: AnalysisPipeline (по умолчанию — без GUI).
+        :param candles: CandleCache (по умолчанию загружает свечи с Bybit через DataFetcher пайплайна).
+        :param workers: Потоков для индикаторов и инференса.
+        """
+        self.pipeline = pipeline or AnalysisPipeline(headless=True)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="service")
+        self.candles = candles or CandleCache(self._fetch_candles, ttl=candle_ttl)
+        self.batcher = PredictionBatcher(self.pipeline.get_predictor, self.executor, batch_window=batch_window,
+                                         max_batch=max_batch, model_concurrency=model_concurrency)
+        self.started_at = time.monotonic()
+        self.requests = 0
+
+    async def _fetch_candles(self, symbol, timeframe):
+        # Сервису нужны свежие свечи: дисковый кэш DataFetcher не читается (но обновляется)
+        return await self.pipeline.get_fetcher().fetch_historical_data_async(symbol, timeframe, limit=200,
+                                                                             use_cache=False)
+
+    def make_app(self):
+        app = web.Application(middlewares=[self._error_middleware])
+        app.router.add_get("/health", self.handle_health)
+        app.router.add_get("/stats", self.handle_stats)
+        app.router.add_get("/metrics", self.handle_metrics)
+        app.router.add_get("/indicators/{symbol}", self.handle_indicators)
+        app.router.add_get("/predict/{symbol}", self.handle_predict)
+        app.router.add_get("/analysis/{symbol}", self.handle_analysis)
+        app.on_startup.append(self._on_startup)
+        app.on_cleanup.append(self._on_cleanup)
+        return app
+
+    async def _on_startup(self, app):
+        # DataFetcher (проверка времени) и AIPredictor создаются до первого запроса
+        await asyncio.get_running_loop().run_in_executor(self.executor, self.pipeline.get_predictor)
+        logging.info("Сервис анализа запущен.")
+
+    async def _on_cleanup(self, app):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    @web.middleware
+    async def _error_middleware(self, request, handler):
+        self.requests += 1
+        try:
+            return await handler(request)
+        except ServiceError as e:
+            return web.json_response({"error": str(e)}, status=e.status)
+        except web.HTTPException:
+            raise
+        except Exception as e:
+            logging.error(f"Ошибка обработки {request.path}: {e}")
+            return web.json_response({"error": "Внутренняя ошибка сервиса."}, status=500)
+
+    @staticmethod
+    def _get_params(request, strategy=True):
+        symbol = request.match_info["symbol"].upper()
+        timeframe = request.query.get("timeframe", SCAN_TIMEFRAME)
+        if timeframe not in TIMEFRAMES:
+            raise ServiceError(400, f"Неизвестный таймфрейм: {timeframe}.")
+        if not strategy:
+            return symbol, timeframe, None
+        timeframe_type = request.query.get("strategy", "short_term")
+        if timeframe_type not in STRATEGIES:
+            raise ServiceError(400, f"Неизвестная стратегия: {timeframe_type}.")
+        return symbol, timeframe, timeframe_type
+
+    async def _in_executor(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    @staticmethod
+    def compute_indicators(data):
+        """Сигналы и последние значения индикаторов."""
+        values = {"close": float(data['close'].iloc[-1]), "atr": float(ATR.get_atr(data))}
+        for indicator in (EMA, RSI, MACD, BollingerBands):
+            values.update(indicator.get_values(data))
+        return {**AnalysisPipeline.compute_signals(data), "values": values}
+
+    async def handle_health(self, request):
+        return web.json_response({"status": "ok"})
+
+    async def handle_stats(self, request):
+        predictor = self.pipeline.get_predictor()
+        return web.json_response(to_json_compatible({
+            "uptime": round(time.monotonic() - self.started_at, 1),
+            "requests": self.requests,
+            "candles": self.candles.get_stats(),
+            "batching": self.batcher.get_stats(),
+            "prediction_cache": predictor.prediction_cache.get_stats(),
+            "model_load": predictor.get_model_load_stats(),
+        }))
+
+    async def handle_metrics(self, request):
+        """Метрики utils/metrics.py в формате Prometheus (пусто, если сбор метрик выключен)."""
+        return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8")
+
+    async def handle_indicators(self, request):
+        symbol, timeframe, _ = self._get_params(request, strategy=False)
+        data = await self.candles.get(symbol, timeframe)
+        indicators = await self._in_executor(self.compute_indicators, data)
+        return web.json_response(to_json_compatible({"symbol": symbol, "timeframe": timeframe, **indicators}))
+
+    async def handle_predict(self, request):
+        symbol, timeframe, timeframe_type = self._get_params(request)
+        data = await self.candles.get(symbol, timeframe)
+        predictions = await self.batcher.predict(symbol, data, timeframe_type, timeframe)
+        return web.json_response(to_json_compatible({
+            "symbol": symbol, "timeframe": timeframe, "strategy": timeframe_type, "predictions": predictions
+        }))
+
+    async def handle_analysis(self, request):
+        symbol, timeframe, timeframe_type = self._get_params(request)
+        data = await self.candles.get(symbol, timeframe)
+        signals, predictions = await asyncio.gather(
+            self._in_executor(AnalysisPipeline.compute_signals, data),
+            self.batcher.predict(symbol, data, timeframe_type, timeframe),
+        )
+        result = AnalysisPipeline.build_result(symbol, timeframe_type, data, signals, predictions)
+        return web.json_response(to_json_compatible({"timeframe": timeframe, **result}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local HTTP JSON service for analysis, indicators and predictions.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--backend", choices=("keras", "tflite"), default="keras")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--batch-window-ms", type=float, default=10.0)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--model-concurrency", type=int, default=1)
+    parser.add_argument("--candle-ttl", type=float, default=30.0)
+    parser.add_argument("--log-file", default="logs/server.log")
+    parser.add_argument("--log-json", action="store_true", help="Write log records as JSON lines.")
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    setup_logging(log_file=args.log_file, json_format=args.log_json)
+    metrics.configure(args.metrics_port, args.metrics_file)
+
+    service = AnalysisService(AnalysisPipeline(headless=True, backend=args.backend), workers=args.workers,
+                              batch_window=args.batch_window_ms / 1000, max_batch=args.max_batch,
+                              model_concurrency=args.model_concurrency, candle_ttl=args.candle_ttl)
+    web.run_app(service.make_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+# ========== training_jobs.py ==========
+
+import os
+import json
+import queue
+import asyncio
+import logging
+import datetime
+import threading
+import multiprocessing
+from parallel_training import _init_worker, resolve_worker_budget
+from utils.logging_utils import log_event
+
+CHECKPOINT_PATH = "models/training_checkpoint.json"
+# События, после которых дочерний процесс завершается
+FINAL_EVENTS = ("finished", "stopped", "error")
+
+
+class TrainingCheckpoint:
+    """
+    Контрольная точка полного обучения: список моделей таймфреймов, уже обученных и сохраненных на диск.
+    Прерванный запуск с теми же парами и параметрами продолжается со следующей модели;
+    контрольная точка другого запуска игнорируется и перезаписывается.
+    """
+    def __init__(self, path=CHECKPOINT_PATH, symbols=(), options=None):
+        """
+        :param path: Файл контрольной точки.
+        :param symbols: Торговые пары запуска.
+        :param options: Параметры обучения (streaming, window_cache и т.п.), входят в отпечаток запуска.
+        """
+        self.path = path
+        self.fingerprint = {"symbols": sorted(symbols), "options": options or {}}
+        self.completed = {}  # model_key -> время сохранения (ISO)
+        if os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    state = json.load(f)
+                if state.get("fingerprint") == self.fingerprint:
+                    self.completed = state.get("completed", {})
+                else:
+                    logging.info("Контрольная точка обучения относится к другому запуску и будет перезаписана.")
+            except Exception as e:
+                logging.error(f"Ошибка чтения контрольной точки обучения {path}: {e}")
+
+    def is_done(self, model_key):
+        return model_key in self.completed
+
+    def mark_done(self, model_key):
+        """Отмечает модель обученной и сохраняет контрольную точку (атомарно)."""
+        self.completed[model_key] = datetime.datetime.now().isoformat()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"fingerprint": self.fingerprint, "completed": self.completed}, f, indent=2)
+        os.replace(temp_path, self.path)
+
+    def clear(self):
+        """Удаляет контрольную точку после успешного завершения запуска."""
+        self.completed = {}
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class _EventLogHandler(logging.Handler):
+    """Пересылает записи лога дочернего процесса в очередь событий (для окна логов GUI)."""
+    def __init__(self, events):
+        super().__init__(level=logging.INFO)
+        self.events = events
+
+    def emit(self, record):
+        try:
+            self.events.put({"type": "log", "level": record.levelno, "message": record.getMessage()})
+        except Exception:
+            self.handleError(record)
+
+
+def _run_training(symbols, options, checkpoint_path, resume, tf_threads, events, stop_event):
+    """
+    Точка входа дочернего процесса: обучение всех таймфреймов с контрольной точкой.
+    Прогресс, логи и итог передаются через очередь events.
+    """
+    _init_worker(tf_threads, 2)
+    # Логи идут только в родительский процесс, который выводит их в консоль, файл и окно GUI
+    logging.getLogger().handlers = [_EventLogHandler(events)]
+
+    from ai_predictor import AIPredictor, TrainingStopped
+    from data_fetcher import DataFetcher
+
+    try:
+        checkpoint = TrainingCheckpoint(checkpoint_path, symbols, options)
+        if not resume:
+            checkpoint.clear()
+        predictor = AIPredictor(fetcher=DataFetcher(headless=True))
+        asyncio.run(predictor.train_ai_on_all_timeframes(
+            symbols, progress=events.put, checkpoint=checkpoint, should_stop=stop_event.is_set, **options
+        ))
+        events.put({"type": "finished", "report": predictor.last_training_report})
+    except TrainingStopped:
+        events.put({"type": "stopped"})
+    except Exception as e:
+        events.put({"type": "error", "message": str(e)})
+
+
+class TrainingJob:
+    """
+    Полное обучение (AIPredictor.train_ai_on_all_timeframes) в дочернем процессе со своим бюджетом
+    потоков TensorFlow: обучение не делит GIL и память с GUI и анализом.
+
+    Прогресс передается событиями (словари с ключом "type": started, model_start, epoch, model_saved,
+    log, finished, stopped, error). Каждая обученная модель сразу сохраняется в models/ и отмечается
+    в контрольной точке; в этом процессе она тут же подменяется в общем реестре моделей (hot swap),
+    поэтому прогнозы используют новую модель без перезапуска. Остановка (stop) происходит между
+    таймфреймами, прерывание (terminate) — немедленно; в обоих случаях следующий запуск с resume=True
+    продолжит обучение со следующей необученной модели.
+    """
+    def __init__(self, symbols, on_event=None, tf_threads=None, resume=True, checkpoint_path=CHECKPOINT_PATH,
+                 **options):
+        """
+        :param symbols: Торговые пары.
+        :param on_event: Функция on_event(event); вызывается в потоке-мониторе (для Tk — через call_in_ui).
+        :param tf_threads: Потоков TensorFlow в дочернем процессе (по умолчанию — все ядра).
+        :param resume: Продолжить прерванный запуск по контрольной точке (False — начать заново).
+        :param checkpoint_path: Файл контрольной точки.
+        :param options: Параметры train_ai_on_all_timeframes (prefetch, streaming, window_cache, ...).
+        """
+        self.symbols = list(symbols)
+        self.on_event = on_event
+        self.tf_threads = tf_threads or resolve_worker_budget(1, None, 1)[1]
+        self.resume = resume
+        self.checkpoint_path = checkpoint_path
+        self.options = options
+        self.status = "created"
+        self._process = None
+        self._monitor = None
+        # spawn: TensorFlow не переживает fork процесса с уже инициализированным рантаймом
+        self._context = multiprocessing.get_context("spawn")
+        self._events = self._context.Queue()
+        self._stop_event = self._context.Event()
+
+    def start(self):
+        """Запускает дочерний процесс и поток, разбирающий его события."""
+        if self._process is not None:
+            raise RuntimeError("Training job already started.")
+        self._process = self._context.Process(
+            target=_run_training, name="ai-training", daemon=True,
+            args=(self.symbols, self.options, self.checkpoint_path, self.resume, self.tf_threads,
+                  self._events, self._stop_event),
+        )
+        self._process.start()
+        self.status = "running"
+        log_event("AI Training", "Training job started in process %s (%s TF threads)", self._process.pid, self.tf_threads)
+        self._monitor = threading.Thread(target=self._monitor_events, name="ai-training-monitor", daemon=True)
+        self._monitor.start()
+
+    def is_running(self):
+        return self._process is not None and self._process.is_alive()
+
+    def stop(self):
+        """Просит остановить обучение после текущего таймфрейма (прогресс сохраняется)."""
+        self._stop_event.set()
+
+    def terminate(self, timeout=5.0):
+        """Прерывает обучение немедленно; модели, сохраненные до этого, остаются в контрольной точке."""
+        if self._process is None:
+            return
+        self._stop_event.set()
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process.join(timeout)
+
+    def join(self, timeout=None):
+        """Ждет завершения процесса и обработки всех его событий."""
+        if self._monitor is not None:
+            self._monitor.join(timeout)
+
+    def _monitor_events(self):
+        while True:
+            try:
+                event = self._events.get(timeout=0.5)
+            except queue.Empty:
+                if self._process.is_alive():
+                    continue
+                # Процесс завершился без итогового события (аварийно или через terminate)
+                try:
+                    event = self._events.get(timeout=0.5)
+                except queue.Empty:
+                    stopped = self._stop_event.is_set()
+                    event = {"type": "stopped"} if stopped else {
+                        "type": "error", "message": f"Training process exited with code {self._process.exitcode}"
+                    }
+            if event["type"] == "model_saved":
+                self._hot_swap(event["model_key"])
+            if event["type"] in FINAL_EVENTS:
+                self.status = event["type"]
+            self._emit(event)
+            if event["type"] in FINAL_EVENTS:
+                break
+        self._process.join()
+
+    @staticmethod
+    def _hot_swap(model_key):
+        """Загружает новую версию модели в общий реестр процесса (по изменившемуся mtime файла)."""
+        from models.model_registry import get_model_registry
+
+        try:
+            get_model_registry("keras").preload([model_key])
+        except Exception as e:
+            logging.error(f"Ошибка загрузки обновленной модели {model_key}: {e}")
+
+    def _emit(self, event):
+        if event["type"] == "log":
+            # Записи лога дочернего процесса выводятся через логирование этого процесса
+            logging.log(event["level"], event["message"])
+            return
+        if self.on_event is not None:
+            try:
+                self.on_event(event)
+            except Exception as e:
+                logging.error(f"Error in training event callback: {e}")
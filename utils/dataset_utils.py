@@ -0,0 +1,141 @@
+import os
+import json
+import logging
+import numpy as np
+import tensorflow as tf
+from models.lstm_model import LSTMModel
+from utils.logging_utils import log_event
+
+
+def get_candle_store_path(cache_dir: str, symbol: str, timeframe: str) -> str:
+    """
+    Возвращает путь к файлу свечей в дисковом кэше DataFetcher.
+    :param cache_dir: Директория кэша (DataFetcher.cache_dir).
+    :param symbol: Торговая пара.
+    :param timeframe: Таймфрейм.
+    """
+    return os.path.join(cache_dir, f"{symbol}_{timeframe}.json")
+
+
+def load_symbol_closes(cache_dir: str, symbol: str, timeframe: str) -> np.ndarray:
+    """
+    Читает цены закрытия одной пары из дискового кэша в хронологическом порядке.
+    :return: Массив float32 (пустой, если файла нет или он поврежден).
+    """
+    path = get_candle_store_path(cache_dir, symbol, timeframe)
+    if not os.path.exists(path):
+        return np.empty(0, dtype=np.float32)
+    try:
+        with open(path, "r") as f:
+            records = json.load(f)
+        timestamps = np.array([float(record["timestamp"]) for record in records])
+        closes = np.array([float(record["close"]) for record in records], dtype=np.float32)
+        return closes[np.argsort(timestamps, kind="stable")]
+    except Exception as e:
+        logging.error(f"Error reading candle store {path}: {e}")
+        return np.empty(0, dtype=np.float32)
+
+
+def iter_symbol_windows(closes: np.ndarray, look_back: int = 60, split: str = "train",
+                        validation_fraction: float = 0.2, chunk_size: int = 4096):
+    """
+    Нормализует ряд одной пары (MinMax по этой паре) и отдает окна кусками.
+    Окна никогда не пересекают границу между парами.
+    :param closes: Цены закрытия одной пары.
+    :param look_back: Длина окна.
+    :param split: "train" — первые окна ряда, "val" — последние validation_fraction окон.
+    :param validation_fraction: Доля окон для валидации (хвост ряда).
+    :param chunk_size: Сколько окон материализуется за раз.
+    :return: Генератор пар (X_chunk, y_chunk).
+    """
+    if len(closes) <= look_back:
+        return
+    low, high = float(closes.min()), float(closes.max())
+    scale = (high - low) or 1.0
+    scaled = ((closes - low) / scale).astype(np.float32, copy=False)
+
+    X, y = LSTMModel.make_windows(scaled, look_back)
+    split_index = int(len(X) * (1 - validation_fraction))
+    if split == "train":
+        X, y = X[:split_index], y[:split_index]
+    else:
+        X, y = X[split_index:], y[split_index:]
+    yield from LSTMModel.iter_batches(X, y, chunk_size)
+
+
+def make_streaming_dataset(symbols, timeframe: str, cache_dir: str = "data_cache", look_back: int = 60,
+                           batch_size: int = 32, shuffle_buffer: int = 10000, validation_fraction: float = 0.2,
+                           cycle_length: int = 4, chunk_size: int = 4096, seed=None):
+    """
+    Строит потоковые tf.data-наборы для обучения и валидации из дискового кэша свечей.
+    Ряды пар читаются по одной (не более cycle_length одновременно), окна разных пар
+    перемешиваются через interleave и буфер shuffle, поэтому пиковая память не зависит от числа пар.
+    :param symbols: Список торговых пар.
+    :param timeframe: Таймфрейм.
+    :param cache_dir: Директория кэша свечей.
+    :param look_back: Длина окна.
+    :param batch_size: Размер батча.
+    :param shuffle_buffer: Размер буфера перемешивания (в окнах).
+    :param validation_fraction: Доля окон каждой пары для валидации.
+    :param cycle_length: Сколько пар читается параллельно.
+    :param chunk_size: Сколько окон материализуется за раз.
+    :param seed: Зерно перемешивания.
+    :return: (train_dataset, validation_dataset).
+    """
+    signature = (
+        tf.TensorSpec(shape=(None, look_back, 1), dtype=tf.float32),
+        tf.TensorSpec(shape=(None,), dtype=tf.float32),
+    )
+
+    def generator(symbol, split):
+        closes = load_symbol_closes(cache_dir, symbol.decode(), timeframe)
+        yield from iter_symbol_windows(closes, look_back, split.decode(), validation_fraction, chunk_size)
+
+    def build(split, shuffle):
+        symbols_ds = tf.data.Dataset.from_tensor_slices(list(symbols))
+        if shuffle:
+            symbols_ds = symbols_ds.shuffle(len(symbols), seed=seed, reshuffle_each_iteration=True)
+        dataset = symbols_ds.interleave(
+            lambda symbol: tf.data.Dataset.from_generator(generator, output_signature=signature, args=(symbol, split)),
+            cycle_length=max(1, min(cycle_length, len(symbols))),
+            num_parallel_calls=tf.data.AUTOTUNE,
+        ).unbatch()
+        if shuffle:
+            dataset = dataset.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+        return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+    log_event("AI Training", "Streaming dataset for timeframe %s: %d symbols from %s", timeframe, len(symbols), cache_dir)
+    return build("train", shuffle=True), build("val", shuffle=False)
+
+
+def make_cached_windows_dataset(windows, batch_size: int = 32, shuffle_buffer: int = 10000,
+                                validation_fraction: float = 0.2, chunk_size: int = 4096, seed=None):
+    """
+    Строит tf.data-наборы для обучения и валидации поверх memmap-рядов WindowCache.
+    Окна читаются с диска кусками по chunk_size, поэтому пиковая память не зависит от длины истории.
+    :param windows: CachedWindows (см. utils/window_cache.py).
+    :param batch_size: Размер батча.
+    :param shuffle_buffer: Размер буфера перемешивания (в окнах).
+    :param validation_fraction: Доля окон каждой пары для валидации (хвост ряда).
+    :param chunk_size: Сколько окон материализуется за раз.
+    :param seed: Зерно перемешивания.
+    :return: (train_dataset, validation_dataset).
+    """
+    signature = (
+        tf.TensorSpec(shape=(None, windows.look_back, 1), dtype=tf.float32),
+        tf.TensorSpec(shape=(None,), dtype=tf.float32),
+    )
+    symbols = list(windows.series)
+
+    def build(split, shuffle):
+        def generator():
+            for symbol in symbols:
+                yield from windows.iter_batches(symbol, split, validation_fraction, chunk_size)
+
+        dataset = tf.data.Dataset.from_generator(generator, output_signature=signature).unbatch()
+        if shuffle:
+            dataset = dataset.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+        return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+    log_event("AI Training", "Cached window dataset %s: %d windows, %d symbols", windows.key, len(windows), len(symbols))
+    return build("train", shuffle=True), build("val", shuffle=False)
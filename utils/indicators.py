@@ -3,9 +3,11 @@ import numpy as np
 import logging
 from typing import Optional, Dict, List
 from utils.logging_utils import log_event
+from utils.metrics import timed
 
 class Supertrend:
     @staticmethod
+    @timed("indicator.supertrend")
     def get_signal(data: pd.DataFrame, period: int = 10, multiplier: float = 3.0) -> str:
         """
         Возвращает сигнал Supertrend.
@@ -52,11 +54,12 @@ class Supertrend:
             else:
                 return "Нейтрально"
         except Exception as e:
-            log_event("Indicator Error", f"Error calculating Supertrend: {e}", level="error")
+            log_event("Indicator Error", "Error calculating Supertrend: %s", e, level="error")
             return "Нейтрально"
 
 class EMA:
     @staticmethod
+    @timed("indicator.ema")
     def get_signal(data: pd.DataFrame, short_period: int = 9, long_period: int = 21) -> str:
         """
         Возвращает сигнал EMA.
@@ -77,11 +80,31 @@ class EMA:
             else:
                 return "Продавать"
         except Exception as e:
-            log_event("Indicator Error", f"Error calculating EMA: {e}", level="error")
+            log_event("Indicator Error", "Error calculating EMA: %s", e, level="error")
             return "Нейтрально"
 
+    @staticmethod
+    def get_values(data: pd.DataFrame, short_period: int = 9, long_period: int = 21) -> Dict[str, float]:
+        """
+        Возвращает последние значения короткой и длинной EMA.
+        :param data: DataFrame с данными OHLCV.
+        :return: Словарь {"ema_short", "ema_long"} или пустой словарь при ошибке.
+        """
+        try:
+            if data is None or data.empty:
+                raise ValueError("Data is None or empty.")
+
+            return {
+                "ema_short": float(data['close'].ewm(span=short_period, adjust=False).mean().iloc[-1]),
+                "ema_long": float(data['close'].ewm(span=long_period, adjust=False).mean().iloc[-1]),
+            }
+        except Exception as e:
+            log_event("Indicator Error", "Error calculating EMA values: %s", e, level="error")
+            return {}
+
 class RSI:
     @staticmethod
+    @timed("indicator.rsi")
     def get_signal(data: pd.DataFrame, period: int = 14, overbought: float = 70, oversold: float = 30) -> str:
         """
         Возвращает сигнал RSI.
@@ -108,11 +131,32 @@ class RSI:
             else:
                 return "Нейтрально"
         except Exception as e:
-            log_event("Indicator Error", f"Error calculating RSI: {e}", level="error")
+            log_event("Indicator Error", "Error calculating RSI: %s", e, level="error")
             return "Нейтрально"
 
+    @staticmethod
+    def get_values(data: pd.DataFrame, period: int = 14) -> Dict[str, float]:
+        """
+        Возвращает последнее значение RSI.
+        :param data: DataFrame с данными OHLCV.
+        :return: Словарь {"rsi"} или пустой словарь при ошибке.
+        """
+        try:
+            if data is None or data.empty:
+                raise ValueError("Data is None or empty.")
+
+            delta = data['close'].diff()
+            gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
+            loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+            rsi = 100 - (100 / (1 + gain / loss))
+            return {"rsi": float(rsi.iloc[-1])}
+        except Exception as e:
+            log_event("Indicator Error", "Error calculating RSI values: %s", e, level="error")
+            return {}
+
 class MACD:
     @staticmethod
+    @timed("indicator.macd")
     def get_signal(data: pd.DataFrame, fast_period: int = 12, slow_period: int = 26, signal_period: int = 9) -> str:
         """
         Возвращает сигнал MACD.
@@ -136,11 +180,36 @@ class MACD:
             else:
                 return "Продавать"
         except Exception as e:
-            log_event("Indicator Error", f"Error calculating MACD: {e}", level="error")
+            log_event("Indicator Error", "Error calculating MACD: %s", e, level="error")
             return "Нейтрально"
 
+    @staticmethod
+    def get_values(data: pd.DataFrame, fast_period: int = 12, slow_period: int = 26, signal_period: int = 9) -> Dict[str, float]:
+        """
+        Возвращает последние значения линии MACD, сигнальной линии и гистограммы.
+        :param data: DataFrame с данными OHLCV.
+        :return: Словарь {"macd", "macd_signal", "macd_histogram"} или пустой словарь при ошибке.
+        """
+        try:
+            if data is None or data.empty:
+                raise ValueError("Data is None or empty.")
+
+            fast_ema = data['close'].ewm(span=fast_period, adjust=False).mean()
+            slow_ema = data['close'].ewm(span=slow_period, adjust=False).mean()
+            macd = fast_ema - slow_ema
+            signal = macd.ewm(span=signal_period, adjust=False).mean()
+            return {
+                "macd": float(macd.iloc[-1]),
+                "macd_signal": float(signal.iloc[-1]),
+                "macd_histogram": float(macd.iloc[-1] - signal.iloc[-1]),
+            }
+        except Exception as e:
+            log_event("Indicator Error", "Error calculating MACD values: %s", e, level="error")
+            return {}
+
 class ATR:
     @staticmethod
+    @timed("indicator.atr")
     def get_atr(data: pd.DataFrame, period: int = 14) -> float:
         """
         Возвращает значение ATR.
@@ -159,11 +228,12 @@ class ATR:
             atr = true_range.rolling(window=period).mean()
             return atr.iloc[-1]
         except Exception as e:
-            log_event("Indicator Error", f"Error calculating ATR: {e}", level="error")
+            log_event("Indicator Error", "Error calculating ATR: %s", e, level="error")
             return 0.0
 
 class BollingerBands:
     @staticmethod
+    @timed("indicator.bollinger")
     def get_signal(data: pd.DataFrame, period: int = 20, multiplier: float = 2.0) -> str:
         """
         Возвращает сигнал на основе Bollinger Bands.
@@ -188,5 +258,27 @@ class BollingerBands:
             else:
                 return "Нейтрально"
         except Exception as e:
-            log_event("Indicator Error", f"Error calculating Bollinger Bands: {e}", level="error")
-            return "Нейтрально"
\ No newline at end of file
+            log_event("Indicator Error", "Error calculating Bollinger Bands: %s", e, level="error")
+            return "Нейтрально"
+
+    @staticmethod
+    def get_values(data: pd.DataFrame, period: int = 20, multiplier: float = 2.0) -> Dict[str, float]:
+        """
+        Возвращает последние значения полос Боллинджера.
+        :param data: DataFrame с данными OHLCV.
+        :return: Словарь {"bb_upper", "bb_middle", "bb_lower"} или пустой словарь при ошибке.
+        """
+        try:
+            if data is None or data.empty:
+                raise ValueError("Data is None or empty.")
+
+            sma = data['close'].rolling(window=period).mean()
+            std = data['close'].rolling(window=period).std()
+            return {
+                "bb_upper": float(sma.iloc[-1] + multiplier * std.iloc[-1]),
+                "bb_middle": float(sma.iloc[-1]),
+                "bb_lower": float(sma.iloc[-1] - multiplier * std.iloc[-1]),
+            }
+        except Exception as e:
+            log_event("Indicator Error", "Error calculating Bollinger Bands values: %s", e, level="error")
+            return {}
@@ -1,32 +1,146 @@
 import logging
 import os
-from logging.handlers import RotatingFileHandler
+import json
+import queue
+import atexit
+import datetime
+import threading
+from collections import deque
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 from typing import Optional, Dict, List
-import tkinter as tk
 
 class TextWindowHandler(logging.Handler):
-    """Обработчик для вывода логов в текстовое окно."""
-    def __init__(self, text_widget: tk.Text):
+    """
+    Обработчик для вывода логов в текстовое окно.
+    emit только кладет запись в очередь (не блокирует и не обращается к Tk, поэтому безопасен из любого потока);
+    записи выводятся в виджет пачками по таймеру after() в главном потоке Tk.
+    В окне хранится не больше max_lines строк (старые удаляются, как в кольцевом буфере).
+    Если записи поступают быстрее, чем выводятся, подряд идущие одинаковые сообщения склеиваются,
+    а при переполнении очереди самые старые записи отбрасываются (с итоговой строкой о пропуске).
+    """
+    def __init__(self, text_widget: "tkinter.Text", max_lines: int = 2000, flush_interval: int = 100,
+                 max_batch: int = 200, max_pending: int = 5000):
+        """
+        Должен создаваться в главном потоке Tk.
+        :param text_widget: Текстовый виджет.
+        :param max_lines: Максимальное количество строк в окне.
+        :param flush_interval: Период вывода накопленных записей (мс).
+        :param max_batch: Сколько записей выводится за один раз (остальные ждут следующего вывода).
+        :param max_pending: Размер очереди; при переполнении отбрасываются самые старые записи.
+        """
         super().__init__()
         self.text_widget = text_widget
+        self.max_lines = max_lines
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self._pending = deque()  # [ключ записи, сообщение, количество повторов]
+        self._pending_lock = threading.Lock()
+        self._dropped = 0
+        self._closed = False
+        self._after_id = self.text_widget.after(self.flush_interval, self._flush)
 
     def emit(self, record):
-        """Выводит сообщение в текстовое окно."""
+        """Ставит сообщение в очередь вывода."""
         try:
             log_message = self.format(record)
-            self.text_widget.insert(tk.END, log_message + "\n")  # Добавляем сообщение в конец окна
-            self.text_widget.see(tk.END)  # Прокручиваем окно до последнего сообщения
+            # Повторы сравниваются без времени записи: одинаковые сообщения подряд выводятся одной строкой
+            key = (record.levelno, record.getMessage())
+            with self._pending_lock:
+                if self._pending and self._pending[-1][0] == key:
+                    self._pending[-1][2] += 1
+                    return
+                if len(self._pending) >= self.max_pending:
+                    self._pending.popleft()
+                    self._dropped += 1
+                self._pending.append([key, log_message, 1])
+        except Exception:
+            self.handleError(record)
+
+    def _take_batch(self):
+        with self._pending_lock:
+            count = min(len(self._pending), self.max_batch)
+            batch = [self._pending.popleft() for _ in range(count)]
+            dropped, self._dropped = self._dropped, 0
+        lines = [f"... пропущено сообщений: {dropped}"] if dropped else []
+        for key, message, repeats in batch:
+            lines.append(message if repeats == 1 else f"{message} (x{repeats})")
+        return lines
+
+    def _flush(self):
+        """Выводит накопленные записи одной вставкой и обрезает окно до max_lines (главный поток Tk)."""
+        if self._closed:
+            return
+        # tkinter импортируется лениво: модуль логирования используется и без GUI (cli.py)
+        from tkinter import TclError
+        try:
+            lines = self._take_batch()
+            if lines:
+                self.text_widget.insert("end", "\n".join(lines) + "\n")
+                # Текст заканчивается переводом строки, поэтому последняя строка виджета пустая
+                line_count = int(self.text_widget.index("end-1c").split(".")[0]) - 1
+                if line_count > self.max_lines:
+                    self.text_widget.delete("1.0", f"{line_count - self.max_lines + 1}.0")
+                self.text_widget.see("end")  # Прокручиваем окно до последнего сообщения
+            self._after_id = self.text_widget.after(self.flush_interval, self._flush)
+        except TclError:
+            # Виджет уничтожен: дальнейшие записи некуда выводить
+            self._closed = True
         except Exception as e:
             print(f"Error emitting log to text window: {e}")
+            self._after_id = self.text_widget.after(self.flush_interval, self._flush)
 
-def setup_logging(log_file: str = "logs/application.log", level: int = logging.INFO, max_log_size: int = 10 * 1024 * 1024, backup_count: int = 5) -> None:
+    def close(self):
+        """Останавливает вывод по таймеру."""
+        self._closed = True
+        try:
+            self.text_widget.after_cancel(self._after_id)
+        except Exception:
+            pass
+        super().close()
+
+class JsonFormatter(logging.Formatter):
+    """
+    Структурированный формат: одна запись — одна строка JSON (time, level, logger, event, message).
+    Поле event заполняется log_event (тип события), для остальных записей — null. За очередью
+    (setup_logging) трассировка исключения уже входит в message: ее подставляет QueueHandler.
+    """
+    def format(self, record):
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": getattr(record, "event_type", None),
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+_listener: Optional[QueueListener] = None
+
+def stop_logging() -> None:
+    """Дописывает накопленные записи и останавливает фоновый поток записи логов (вызывается при выходе)."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+atexit.register(stop_logging)
+
+def setup_logging(log_file: str = "logs/application.log", level: int = logging.INFO, max_log_size: int = 10 * 1024 * 1024,
+                  backup_count: int = 5, json_format: bool = False) -> None:
     """
     Настройка логирования для записи в файл и вывода в консоль.
+    Корневой логгер только кладет записи в очередь (QueueHandler); в файл и консоль их пишет
+    фоновый поток QueueListener, поэтому вызовы логирования не ждут дискового ввода-вывода.
     :param log_file: Путь к файлу логов (по умолчанию: 'logs/application.log').
     :param level: Уровень логирования (по умолчанию: logging.INFO).
     :param max_log_size: Максимальный размер файла лога в байтах (по умолчанию: 10 МБ).
     :param backup_count: Количество резервных копий логов (по умолчанию: 5).
+    :param json_format: Писать записи строками JSON (JsonFormatter) вместо текстового формата.
     """
+    global _listener
     try:
         # Создаем папку logs, если её нет
         log_dir = os.path.dirname(log_file)
@@ -34,7 +148,10 @@ def setup_logging(log_file: str = "logs/application.log", level: int = logging.I
             os.makedirs(log_dir)
 
         # Формат логов
-        log_format = "%(asctime)s - %(levelname)s - %(message)s"
+        if json_format:
+            formatter = JsonFormatter()
+        else:
+            formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
 
         # Настройка ротации логов
         file_handler = RotatingFileHandler(
@@ -43,40 +160,56 @@ def setup_logging(log_file: str = "logs/application.log", level: int = logging.I
             backupCount=backup_count,
             encoding='utf-8'
         )
-        file_handler.setFormatter(logging.Formatter(log_format))
+        file_handler.setFormatter(formatter)
 
         # Настройка вывода в консоль
         console_handler = logging.StreamHandler()
-        console_handler.setFormatter(logging.Formatter(log_format))
+        console_handler.setFormatter(formatter)
+
+        # Повторная настройка заменяет предыдущий поток записи
+        stop_logging()
+        log_queue = queue.SimpleQueue()
+        _listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+        _listener.start()
 
         # Настройка основного логгера
-        logging.basicConfig(
-            level=level,
-            handlers=[file_handler, console_handler]
-        )
+        root = logging.getLogger()
+        for handler in [h for h in root.handlers if isinstance(h, QueueHandler)]:
+            root.removeHandler(handler)
+        root.addHandler(QueueHandler(log_queue))
+        root.setLevel(level)
 
         logging.info("Logging is configured.")
     except Exception as e:
         print(f"Error setting up logging: {e}")
 
-def log_event(event_type: str, message: str, level: str = "info") -> None:
+_LEVELS = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "warning": logging.WARNING,
+    "error": logging.ERROR,
+    "critical": logging.CRITICAL,
+}
+
+def log_event(event_type: str, message: str, *args, level: str = "info") -> None:
     """
     Логирует событие с указанным типом и уровнем.
+    Сообщение форматируется лениво, в стиле %: log_event("AI Training", "Epoch %d", epoch) —
+    подстановка args выполняется, только если уровень включен.
     :param event_type: Тип события (например, "AI Training", "Data Fetching").
-    :param message: Сообщение для логирования.
-    :param level: Уровень логирования ('info', 'warning', 'error', 'critical').
+    :param message: Сообщение для логирования (шаблон %, если переданы args).
+    :param args: Аргументы шаблона message.
+    :param level: Уровень логирования ('info', 'warning', 'error', 'critical'; иначе — debug).
     """
-    log_message = f"[{event_type}] {message}"
-    if level == "info":
-        logging.info(log_message)
-    elif level == "warning":
-        logging.warning(log_message)
-    elif level == "error":
-        logging.error(log_message)
-    elif level == "critical":
-        logging.critical(log_message)
+    levelno = _LEVELS.get(level, logging.DEBUG)
+    logger = logging.getLogger()
+    if not logger.isEnabledFor(levelno):
+        return
+    if args:
+        logger.log(levelno, "[%s] " + message, event_type, *args, extra={"event_type": event_type})
     else:
-        logging.debug(log_message)
+        # Без args сообщение не форматируется: символы % в нем выводятся как есть
+        logger.log(levelno, "[%s] %s", event_type, message, extra={"event_type": event_type})
 
 def log_ai_training_start() -> None:
     """Логирует начало обучения ИИ."""
@@ -84,19 +217,18 @@ def log_ai_training_start() -> None:
 
 def log_ai_training_progress(epoch: int, loss: float, val_loss: float) -> None:
     """Логирует прогресс обучения модели."""
-    log_message = f"Epoch {epoch} - Loss: {loss:.4f}, Val Loss: {val_loss:.4f}"
-    log_event("AI Training", log_message)
+    log_event("AI Training", "Epoch %d - Loss: %.4f, Val Loss: %.4f", epoch, loss, val_loss)
 
 def log_ai_training_complete(duration: Optional[float] = None) -> None:
     """Логирует успешное завершение обучения ИИ."""
-    message = "AI training completed successfully."
     if duration:
-        message += f" Training took {duration:.2f} seconds."
-    log_event("AI Training", message)
+        log_event("AI Training", "AI training completed successfully. Training took %.2f seconds.", duration)
+    else:
+        log_event("AI Training", "AI training completed successfully.")
 
 def log_ai_training_error(error: Exception) -> None:
     """Логирует ошибку при обучении ИИ."""
-    log_event("AI Training", f"Error during training: {str(error)}", level="error")
+    log_event("AI Training", "Error during training: %s", error, level="error")
 
 def log_prediction_start() -> None:
     """Логирует начало прогнозирования."""
@@ -104,19 +236,20 @@ def log_prediction_start() -> None:
 
 def log_prediction_result(result: Dict[str, float]) -> None:
     """Логирует результат прогнозирования."""
-    log_event("Prediction", f"Prediction result: {result}")
+    log_event("Prediction", "Prediction result: %s", result)
 
 def log_prediction_error(error: Exception) -> None:
     """Логирует ошибку при прогнозировании."""
-    log_event("Prediction", f"Error during prediction: {str(error)}", level="error")
+    log_event("Prediction", "Error during prediction: %s", error, level="error")
 
 def log_data_fetching(symbol: str, timeframe: str) -> None:
     """Логирует успешное получение данных."""
-    log_event("Data Fetching", f"Historical data for {symbol} ({timeframe}) fetched successfully.")
+    log_event("Data Fetching", "Historical data for %s (%s) fetched successfully.", symbol, timeframe)
 
 def log_data_fetching_error(symbol: str, timeframe: str, error: Exception) -> None:
     """Логирует ошибку при получении данных."""
-    log_event("Data Fetching", f"Error fetching data for {symbol} ({timeframe}): {str(error)}", level="error")
+    log_event("Data Fetching", "Error fetching data for %s (%s): %s", symbol, timeframe, error,
+              level="error")
 
 def log_data_validation(success: bool = True) -> None:
     """Логирует результат валидации данных."""
@@ -127,15 +260,15 @@ def log_data_validation(success: bool = True) -> None:
 
 def log_user_action(action: str) -> None:
     """Логирует действия пользователя."""
-    log_event("User Action", f"User clicked '{action}'.")
+    log_event("User Action", "User clicked '%s'.", action)
 
 def log_critical_error(error: Exception) -> None:
     """Логирует критические ошибки."""
-    log_event("Critical Error", f"Critical error: {str(error)}", level="critical")
+    log_event("Critical Error", "Critical error: %s", error, level="critical")
 
 def log_analysis_step(step: int, message: str) -> None:
     """Логирует шаг анализа."""
-    log_event("Analysis", f"Step {step}: {message}")
+    log_event("Analysis", "Step %s: %s", step, message)
 
 def log_application_start() -> None:
     """Логирует запуск приложения."""
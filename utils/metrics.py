@@ -0,0 +1,265 @@
+# ========== utils/metrics.py ==========
+
+import os
+import time
+import atexit
+import bisect
+import inspect
+import logging
+import functools
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_PREFIX = "cryptosignals"
+# Границы корзин гистограмм длительности (секунды)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+                   60.0, 300.0)
+
+
+class Histogram:
+    """Гистограмма длительностей с фиксированными корзинами (как Prometheus histogram)."""
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Последняя корзина — +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Счетчики и гистограммы длительностей в памяти процесса.
+    Пока реестр выключен (enabled=False), spans, декораторы и счетчики ничего не записывают:
+    стоимость инструментирования — одна проверка флага на вызов.
+    """
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._histograms = {}  # (name, labels) -> Histogram
+        self._counters = {}  # (name, labels) -> float
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def observe(self, name, seconds, **labels):
+        """Записывает длительность span'а name (секунды)."""
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name, value=1, **labels):
+        """Увеличивает счетчик name на value."""
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def get_snapshot(self):
+        """
+        Возвращает копию метрик.
+        :return: (histograms, counters): {(name, labels): (counts, sum, count)} и {(name, labels): value}.
+        """
+        with self._lock:
+            histograms = {key: (list(h.counts), h.sum, h.count) for key, h in self._histograms.items()}
+            return histograms, dict(self._counters)
+
+    def render(self):
+        """Метрики в текстовом формате Prometheus (exposition format 0.0.4)."""
+        histograms, counters = self.get_snapshot()
+        lines = []
+        if histograms:
+            metric = f"{METRICS_PREFIX}_span_duration_seconds"
+            lines += [f"# HELP {metric} Duration of instrumented code spans.", f"# TYPE {metric} histogram"]
+            for (name, labels), (counts, total, count) in sorted(histograms.items()):
+                labels = (("span", name),) + labels
+                cumulative = 0
+                for bound, bucket_count in zip(DEFAULT_BUCKETS + (float("inf"),), counts):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{metric}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{metric}_sum{_format_labels(labels)} {total!r}")
+                lines.append(f"{metric}_count{_format_labels(labels)} {count}")
+
+        for name in sorted({name for name, _ in counters}):
+            metric = f"{METRICS_PREFIX}_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for (counter_name, labels), value in sorted(counters.items()):
+                if counter_name == name:
+                    lines.append(f"{metric}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+REGISTRY = MetricsRegistry()
+
+
+class _Span:
+    __slots__ = ("name", "labels", "start")
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        REGISTRY.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        if exc_type is not None:
+            REGISTRY.inc("span_errors", span=self.name, **self.labels)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name, **labels):
+    """
+    Измеряет длительность блока: with span("pipeline.fetch"): ...
+    Ошибки внутри блока дополнительно считаются в span_errors_total.
+    """
+    if not REGISTRY.enabled:
+        return _NOOP_SPAN
+    return _Span(name, labels)
+
+
+def timed(name, **labels):
+    """
+    Декоратор: измеряет длительность каждого вызова функции (в том числе корутины) как span name.
+    """
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if not REGISTRY.enabled:
+                    return await func(*args, **kwargs)
+                with _Span(name, labels):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not REGISTRY.enabled:
+                return func(*args, **kwargs)
+            with _Span(name, labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def inc(name, value=1, **labels):
+    """Увеличивает счетчик name (экспортируется как <prefix>_<name>_total)."""
+    REGISTRY.inc(name, value, **labels)
+
+
+def render():
+    return REGISTRY.render()
+
+
+def dump(path):
+    """Записывает метрики в файл в формате Prometheus (атомарно, например для node_exporter textfile)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(REGISTRY.render())
+    os.replace(temp_path, path)
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Запросы сборщика метрик не засоряют лог приложения
+
+
+def start_http_server(port, host="127.0.0.1"):
+    """
+    Отдает метрики по http://host:port/metrics из фонового потока.
+    :return: Экземпляр сервера (server.shutdown() для остановки).
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsRequestHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logging.info(f"Metrics endpoint: http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+def start_file_dumper(path, interval=15.0):
+    """Периодически (и при завершении процесса) записывает метрики в файл из фонового потока."""
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                dump(path)
+            except Exception as e:
+                logging.error(f"Error writing metrics to {path}: {e}")
+
+    threading.Thread(target=run, name="metrics-dump", daemon=True).start()
+    atexit.register(dump, path)
+
+
+def configure(port=None, path=None, interval=15.0, host="127.0.0.1"):
+    """
+    Включает сбор метрик и экспорт (если задан port и/или path). Без обоих параметров метрики
+    выключены. Значения по умолчанию берутся из переменных окружения METRICS_PORT и METRICS_FILE.
+    :return: True, если метрики включены.
+    """
+    port = port if port is not None else os.environ.get("METRICS_PORT")
+    path = path if path is not None else os.environ.get("METRICS_FILE")
+    if not port and not path:
+        return False
+    REGISTRY.enabled = True
+    if port:
+        start_http_server(int(port), host)
+    if path:
+        start_file_dumper(path, interval)
+    return True
+
+
+def add_arguments(parser):
+    """Добавляет в argparse параметры --metrics-port и --metrics-file (см. configure)."""
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve Prometheus metrics on this local port (default: $METRICS_PORT).")
+    parser.add_argument("--metrics-file", default=None,
+                        help="Periodically write Prometheus metrics to this file (default: $METRICS_FILE).")
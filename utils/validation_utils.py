@@ -3,7 +3,9 @@ import numpy as np
 import logging
 from typing import Optional, Dict, List
 from utils.logging_utils import log_event
+from utils.metrics import timed
 
+@timed("validate_data")
 def validate_data(data: pd.DataFrame, check_outliers: bool = True, outlier_threshold: float = 3.0) -> bool:
     """
     Проверяет данные на корректность.
@@ -31,7 +33,7 @@ def validate_data(data: pd.DataFrame, check_outliers: bool = True, outlier_thres
         # Проверка наличия обязательных столбцов
         required_columns = ['open', 'high', 'low', 'close', 'volume']
         if not all(col in data.columns for col in required_columns):
-            log_event("Data Validation", f"Data validation failed: Missing required columns. Expected: {required_columns}", level="warning")
+            log_event("Data Validation", "Data validation failed: Missing required columns. Expected: %s", required_columns, level="warning")
             return False
 
         # Проверка на выбросы (опционально)
@@ -41,7 +43,7 @@ def validate_data(data: pd.DataFrame, check_outliers: bool = True, outlier_thres
                 std = data[column].std()
                 outliers = data[(data[column] > mean + outlier_threshold * std) | (data[column] < mean - outlier_threshold * std)]
                 if not outliers.empty:
-                    log_event("Data Validation", f"Data validation warning: Outliers detected in column '{column}'.", level="warning")
+                    log_event("Data Validation", "Data validation warning: Outliers detected in column '%s'.", column, level="warning")
 
         # Проверка на корректность значений
         if (data['high'] < data['low']).any():
@@ -56,7 +58,7 @@ def validate_data(data: pd.DataFrame, check_outliers: bool = True, outlier_thres
         return True
 
     except Exception as e:
-        log_event("Data Validation", f"Error during data validation: {e}", level="error")
+        log_event("Data Validation", "Error during data validation: %s", e, level="error")
         return False
 
 def detect_anomalies(data: pd.DataFrame, threshold: float = 3.0) -> Dict[str, List[int]]:
@@ -73,7 +75,7 @@ def detect_anomalies(data: pd.DataFrame, threshold: float = 3.0) -> Dict[str, Li
             std = data[column].std()
             anomalies[column] = data[(data[column] > mean + threshold * std) | (data[column] < mean - threshold * std)].index.tolist()
     except Exception as e:
-        log_event("Anomaly Detection", f"Error detecting anomalies: {e}", level="error")
+        log_event("Anomaly Detection", "Error detecting anomalies: %s", e, level="error")
     return anomalies
 
 def clean_data(data: pd.DataFrame, fill_method: str = 'ffill') -> pd.DataFrame:
@@ -104,5 +106,5 @@ def clean_data(data: pd.DataFrame, fill_method: str = 'ffill') -> pd.DataFrame:
         log_event("Data Cleaning", "Data cleaning completed successfully.")
         return data
     except Exception as e:
-        log_event("Data Cleaning", f"Error cleaning data: {e}", level="error")
+        log_event("Data Cleaning", "Error cleaning data: %s", e, level="error")
         return data
\ No newline at end of file
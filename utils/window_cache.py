@@ -0,0 +1,237 @@
+# ========== utils/window_cache.py ==========
+
+import io
+import os
+import json
+import hashlib
+import logging
+import numpy as np
+import pandas as pd
+from numpy.lib import format as npy_format
+from numpy.lib.stride_tricks import sliding_window_view
+
+WINDOW_CACHE_FORMAT_VERSION = 1
+
+
+class WindowCache:
+    """
+    Дисковый кэш подготовленных рядов для обучения: по каждой паре и таймфрейму хранится
+    провалидированный ряд цен закрытия (float32, .npy), который открывается через memmap.
+    Окна X и цели y строятся как представления (sliding_window_view) над memmap-массивом,
+    поэтому весь набор никогда не загружается в память целиком: в RAM копируется только текущий батч.
+    Новые свечи дописываются в конец файла без пересчета уже сохраненной истории.
+
+    Структура: <cache_dir>/<timeframe>/<symbol>.npy и <cache_dir>/<timeframe>/manifest.json
+    (диапазон свечей, количество строк и min/max для каждой пары).
+    """
+    def __init__(self, cache_dir="data_cache/windows", features=("close",)):
+        """
+        :param cache_dir: Директория кэша.
+        :param features: Признаки ряда (сейчас только close); входят в параметры кэша.
+        """
+        self.cache_dir = cache_dir
+        self.features = list(features)
+        self._manifests = {}
+
+    def _params(self):
+        """Параметры подготовки данных: кэш с другими параметрами сбрасывается."""
+        return {"format_version": WINDOW_CACHE_FORMAT_VERSION, "features": self.features, "dtype": "float32"}
+
+    def _timeframe_dir(self, timeframe):
+        return os.path.join(self.cache_dir, str(timeframe))
+
+    def _array_path(self, timeframe, symbol):
+        return os.path.join(self._timeframe_dir(timeframe), f"{symbol}.npy")
+
+    def _manifest_path(self, timeframe):
+        return os.path.join(self._timeframe_dir(timeframe), "manifest.json")
+
+    def _get_manifest(self, timeframe):
+        manifest = self._manifests.get(timeframe)
+        if manifest is not None:
+            return manifest
+        path = self._manifest_path(timeframe)
+        manifest = None
+        if os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    manifest = json.load(f)
+            except Exception as e:
+                logging.error(f"Error reading window cache manifest {path}: {e}")
+        if manifest is None or manifest.get("params") != self._params():
+            if manifest is not None:
+                logging.info(f"Window cache for timeframe {timeframe} has different parameters, rebuilding.")
+            manifest = {"params": self._params(), "symbols": {}}
+        self._manifests[timeframe] = manifest
+        return manifest
+
+    def _save_manifest(self, timeframe):
+        path = self._manifest_path(timeframe)
+        temp_path = path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self._manifests[timeframe], f, indent=2)
+        os.replace(temp_path, path)
+
+    def get_entry(self, timeframe, symbol):
+        """Возвращает запись манифеста пары (rows, first_candle, last_candle, min, max) или None."""
+        entry = self._get_manifest(timeframe)["symbols"].get(symbol)
+        if entry is not None and not os.path.exists(self._array_path(timeframe, symbol)):
+            return None
+        return entry
+
+    def get_new_rows(self, timeframe, symbol, data):
+        """
+        Отбирает строки, которых еще нет в кэше (последняя сохраненная свеча и более новые).
+        :param data: DataFrame пары, отсортированный по времени.
+        :return: (DataFrame с новыми строками, append): append=False — кэш пары нужно построить заново
+                 (его нет или новые данные не стыкуются с сохраненной историей).
+        """
+        entry = self.get_entry(timeframe, symbol)
+        if entry is None or data.empty:
+            return data, False
+        last_candle = pd.Timestamp(entry["last_candle"])
+        # Данные должны содержать саму последнюю сохраненную свечу: update перезаписывает ее первой строкой,
+        # а без перекрытия нельзя убедиться, что между историей и новыми свечами нет пропуска
+        if last_candle not in data.index:
+            return data, False
+        return data[data.index >= last_candle], True
+
+    def update(self, timeframe, symbol, data, append=True):
+        """
+        Дописывает свечи пары в кэш (или строит его заново при append=False).
+        Первая строка при append=True — последняя сохраненная свеча: она перезаписывается,
+        т.к. могла быть сохранена незакрытой. Если первая строка — другая свеча, кэш строится заново.
+        :param data: DataFrame с колонкой close, отсортированный по времени и провалидированный.
+        :return: Количество добавленных свечей.
+        """
+        os.makedirs(self._timeframe_dir(timeframe), exist_ok=True)
+        manifest = self._get_manifest(timeframe)
+        path = self._array_path(timeframe, symbol)
+        closes = data['close'].to_numpy(dtype=np.float32)
+        entry = manifest["symbols"].get(symbol) if append else None
+        if entry is not None and pd.Timestamp(entry["last_candle"]) != data.index[0]:
+            logging.warning(f"Window cache {timeframe}/{symbol}: new rows do not start at the last cached candle, "
+                            f"rebuilding.")
+            entry = None
+
+        if entry is None:
+            np.save(path, closes)
+            entry = {"rows": len(closes), "first_candle": data.index[0].isoformat(),
+                     "min": float(closes.min()), "max": float(closes.max())}
+            added = len(closes)
+        else:
+            array = np.load(path, mmap_mode="r+")
+            array[-1] = closes[0]
+            array.flush()
+            del array
+            _append_npy(path, closes[1:])
+            entry["rows"] += len(closes) - 1
+            entry["min"] = min(entry["min"], float(closes.min()))
+            entry["max"] = max(entry["max"], float(closes.max()))
+            added = len(closes) - 1
+
+        entry["last_candle"] = data.index[-1].isoformat()
+        manifest["symbols"][symbol] = entry
+        self._save_manifest(timeframe)
+        return added
+
+    def get_windows(self, timeframe, symbols, look_back=60):
+        """
+        Открывает кэш пар таймфрейма для обучения.
+        :return: CachedWindows или None, если ни у одной пары нет достаточной истории.
+        """
+        series, entries = {}, {}
+        for symbol in symbols:
+            entry = self.get_entry(timeframe, symbol)
+            if entry is None or entry["rows"] <= look_back:
+                continue
+            series[symbol] = np.load(self._array_path(timeframe, symbol), mmap_mode="r")
+            entries[symbol] = entry
+        if not series:
+            return None
+        return CachedWindows(series, entries, look_back, self._params())
+
+
+class CachedWindows:
+    """
+    Окна обучения таймфрейма поверх memmap-рядов WindowCache.
+    Нормализация — MinMax по всем парам таймфрейма (min/max берутся из манифеста без чтения данных),
+    окна не пересекают границы пар.
+    """
+    def __init__(self, series, entries, look_back, params):
+        self.series = series
+        self.entries = entries
+        self.look_back = look_back
+        self.scale = (min(entry["min"] for entry in entries.values()),
+                      max(entry["max"] for entry in entries.values()))
+        self.first_candle = min(pd.Timestamp(entry["first_candle"]) for entry in entries.values())
+        self.last_candle = max(pd.Timestamp(entry["last_candle"]) for entry in entries.values())
+        # Ключ набора: параметры подготовки и диапазоны данных всех пар
+        description = json.dumps({"params": params, "look_back": look_back, "symbols": {
+            symbol: [entry["first_candle"], entry["last_candle"], entry["rows"]] for symbol, entry in sorted(entries.items())
+        }}, sort_keys=True)
+        self.key = hashlib.sha256(description.encode()).hexdigest()[:16]
+
+    def __len__(self):
+        return sum(len(closes) - self.look_back for closes in self.series.values())
+
+    def get_split(self, symbol, split="train", validation_fraction=0.2):
+        """
+        Возвращает окна пары без копирования данных.
+        :param split: "train" — первые окна ряда, "val" — последние validation_fraction окон, "all" — все.
+        :return: (X, y) — представления над memmap в исходном масштабе цен.
+        """
+        closes = self.series[symbol]
+        X = sliding_window_view(closes[:-1], self.look_back)[..., np.newaxis]
+        y = closes[self.look_back:]
+        if split == "all":
+            return X, y
+        split_index = int(len(X) * (1 - validation_fraction))
+        if split == "train":
+            return X[:split_index], y[:split_index]
+        return X[split_index:], y[split_index:]
+
+    def iter_batches(self, symbol, split="train", validation_fraction=0.2, batch_size=4096):
+        """
+        Отдает нормализованные окна пары батчами: с диска читается и копируется только текущий батч.
+        :return: Генератор пар (X_batch, y_batch) float32.
+        """
+        low, high = self.scale
+        scale = (high - low) or 1.0
+        X, y = self.get_split(symbol, split, validation_fraction)
+        for start in range(0, len(X), batch_size):
+            end = start + batch_size
+            yield ((np.asarray(X[start:end], dtype=np.float32) - low) / scale,
+                   (np.asarray(y[start:end], dtype=np.float32) - low) / scale)
+
+
+def _append_npy(path, values):
+    """
+    Дописывает значения в конец одномерного .npy-файла, обновляя размер в заголовке на месте.
+    Если новый заголовок не помещается на место старого, файл перезаписывается целиком.
+    """
+    values = np.ascontiguousarray(values, dtype=np.float32)
+    if not len(values):
+        return
+    with open(path, "r+b") as f:
+        version = npy_format.read_magic(f)
+        if version == (1, 0):
+            read_header, write_header = npy_format.read_array_header_1_0, npy_format.write_array_header_1_0
+        else:
+            read_header, write_header = npy_format.read_array_header_2_0, npy_format.write_array_header_2_0
+        shape, fortran_order, dtype = read_header(f)
+        header_end = f.tell()
+
+        header = io.BytesIO()
+        header.write(npy_format.magic(*version))
+        write_header(header, {"descr": npy_format.dtype_to_descr(dtype), "fortran_order": fortran_order,
+                              "shape": (shape[0] + len(values),)})
+        if header.tell() == header_end:
+            f.seek(0, os.SEEK_END)
+            f.write(values.tobytes())
+            f.seek(0)
+            f.write(header.getvalue())
+            return
+    # Заголовок изменил длину: переписываем файл (редкий случай)
+    existing = np.load(path)
+    np.save(path, np.concatenate([existing, values]))
@@ -0,0 +1,302 @@
+# ========== walk_forward.py ==========
+"""
+Walk-forward оценка LSTM-моделей таймфреймов вне выборки.
+История каждой пары делится на скользящие фолды обучение/тест; каждый фолд — отдельная задача
+в пуле процессов. Данные берутся из memmap-кэша подготовленных рядов (utils/window_cache.py),
+поэтому процессы не получают копию данных и ничего не загружают заново.
+
+Запуск из корня репозитория (кэш заполняется AIPredictor.train_ai_on_all_timeframes(window_cache=True)
+или AIPredictor.evaluate_walk_forward):
+    python walk_forward.py --symbols BTCUSDT ETHUSDT --timeframes 60 240 --folds 5 --workers 4
+"""
+
+import time
+import json
+import logging
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from parallel_training import _init_worker, resolve_worker_budget
+from utils.window_cache import WindowCache
+from utils.logging_utils import log_event
+
+
+def make_folds(windows_count, n_folds=5, min_train_fraction=0.5, expanding=False):
+    """
+    Делит окна ряда на фолды: начальная часть min_train_fraction — первое обучение,
+    остаток — n_folds последовательных тестовых блоков.
+    :param expanding: False — скользящее окно обучения постоянной длины, True — расширяющееся с начала ряда.
+    :return: Список (train_start, train_end, test_end) в индексах окон.
+    """
+    train_size = int(windows_count * min_train_fraction)
+    test_size = (windows_count - train_size) // n_folds
+    if train_size <= 0 or test_size <= 0:
+        return []
+    folds = []
+    for fold in range(n_folds):
+        test_start = train_size + fold * test_size
+        test_end = windows_count if fold == n_folds - 1 else test_start + test_size
+        train_start = 0 if expanding else test_start - train_size
+        folds.append((train_start, test_start, test_end))
+    return folds
+
+
+def _run_fold(task):
+    """
+    Обучает модель на обучающей части фолда всех пар и оценивает её на тестовой части.
+    Нормализация (MinMax) считается только по обучающим данным фолда, чтобы не заглядывать в будущее.
+    :return: Метрики фолда и разбивка времени (load, train, predict, total).
+    """
+    from tensorflow.keras.callbacks import EarlyStopping
+    from models.lstm_model import LSTMModel
+
+    start = time.perf_counter()
+    look_back = task["look_back"]
+    windows = WindowCache(task["cache_dir"]).get_windows(task["timeframe"], list(task["bounds"]), look_back)
+    if windows is None:
+        raise ValueError(f"No cached data for timeframe {task['timeframe']}.")
+
+    train_parts, test_parts = [], []
+    for symbol, (train_start, train_end, test_end) in task["bounds"].items():
+        X, y = windows.get_split(symbol, "all")
+        train_parts.append((X[train_start:train_end], y[train_start:train_end]))
+        test_parts.append((X[train_end:test_end], y[train_end:test_end]))
+    X_train = np.concatenate([X for X, y in train_parts]).astype(np.float32)
+    y_train = np.concatenate([y for X, y in train_parts]).astype(np.float32)
+    X_test = np.concatenate([X for X, y in test_parts]).astype(np.float32)
+    y_test = np.concatenate([y for X, y in test_parts]).astype(np.float32)
+    low, high = float(min(X_train.min(), y_train.min())), float(max(X_train.max(), y_train.max()))
+    scale = (high - low) or 1.0
+    load_time = time.perf_counter() - start
+
+    train_start_time = time.perf_counter()
+    lstm = LSTMModel(input_shape=(look_back, 1), model_path=None, hyperparams=task["hyperparams"])
+    # Валидация для ранней остановки — хвост обучающей части (тестовые окна в обучении не участвуют)
+    split_index = int(len(X_train) * 0.9)
+    lstm.model.fit(
+        (X_train[:split_index] - low) / scale, (y_train[:split_index] - low) / scale,
+        epochs=task["epochs"] or lstm.hyperparams["epochs"],
+        batch_size=lstm.hyperparams["batch_size"],
+        validation_data=((X_train[split_index:] - low) / scale, (y_train[split_index:] - low) / scale),
+        callbacks=[EarlyStopping(monitor="val_loss", patience=lstm.hyperparams["patience"], restore_best_weights=True)],
+        verbose=0
+    )
+    train_time = time.perf_counter() - train_start_time
+
+    predict_start_time = time.perf_counter()
+    predictions = lstm.model.predict((X_test - low) / scale, batch_size=1024, verbose=0)[:, 0] * scale + low
+    predict_time = time.perf_counter() - predict_start_time
+
+    last_close = X_test[:, -1, 0]
+    actual_move = np.sign(y_test - last_close)
+    predicted_move = np.sign(predictions - last_close)
+    moved = actual_move != 0
+    errors = predictions - y_test
+    return {
+        "model_key": task["model_key"],
+        "fold": task["fold"],
+        "train_windows": len(X_train),
+        "test_windows": len(X_test),
+        "directional_accuracy": float(np.mean(actual_move[moved] == predicted_move[moved])) if moved.any() else None,
+        "mae": float(np.mean(np.abs(errors))),
+        "rmse": float(np.sqrt(np.mean(errors ** 2))),
+        "mape": float(np.mean(np.abs(errors) / np.maximum(np.abs(y_test), 1e-12))),
+        "timings": {
+            "load": round(load_time, 3),
+            "train": round(train_time, 3),
+            "predict": round(predict_time, 3),
+            "total": round(time.perf_counter() - start, 3),
+        },
+    }
+
+
+class WalkForwardEvaluator:
+    """
+    Параллельная walk-forward оценка моделей таймфреймов на данных кэша подготовленных рядов.
+    """
+    def __init__(self, cache_dir="data_cache/windows", workers=None, tf_threads_per_worker=None, look_back=60,
+                 n_folds=5, min_train_fraction=0.5, expanding=False, epochs=None):
+        """
+        :param cache_dir: Директория WindowCache.
+        :param workers: Количество рабочих процессов (по умолчанию — по числу ядер, но не больше числа фолдов).
+        :param tf_threads_per_worker: Потоков TensorFlow на процесс (по умолчанию — ядра / workers).
+        :param look_back: Длина окна.
+        :param n_folds: Количество тестовых фолдов на модель.
+        :param min_train_fraction: Доля истории для первого обучения.
+        :param expanding: Расширяющееся окно обучения вместо скользящего.
+        :param epochs: Эпох обучения на фолд (None — из гиперпараметров модели).
+        """
+        self.cache = WindowCache(cache_dir)
+        self.cache_dir = cache_dir
+        self.workers = workers
+        self.tf_threads_per_worker = tf_threads_per_worker
+        self.look_back = look_back
+        self.n_folds = n_folds
+        self.min_train_fraction = min_train_fraction
+        self.expanding = expanding
+        self.epochs = epochs
+
+    def make_tasks(self, model_key, timeframe, symbols, hyperparams=None):
+        """
+        Формирует задачи фолдов модели. Границы фолдов фиксируются по текущему размеру кэша,
+        поэтому дописывание свечей во время оценки на результат не влияет.
+        """
+        bounds_by_fold = {}
+        for symbol in symbols:
+            entry = self.cache.get_entry(timeframe, symbol)
+            if entry is None:
+                continue
+            folds = make_folds(entry["rows"] - self.look_back, self.n_folds, self.min_train_fraction, self.expanding)
+            for fold, bounds in enumerate(folds):
+                bounds_by_fold.setdefault(fold, {})[symbol] = bounds
+        return [{
+            "model_key": model_key,
+            "timeframe": timeframe,
+            "fold": fold,
+            "bounds": bounds,
+            "cache_dir": self.cache_dir,
+            "look_back": self.look_back,
+            "hyperparams": hyperparams,
+            "epochs": self.epochs,
+        } for fold, bounds in sorted(bounds_by_fold.items())]
+
+    def run(self, tasks):
+        """
+        Выполняет фолды в пуле процессов.
+        Фолды с одинаковыми данными и гиперпараметрами (например, short_term_60 и medium_term_60)
+        выполняются один раз, результат записывается под ключом каждой такой модели.
+        :param tasks: Задачи из make_tasks (можно объединять задачи нескольких моделей).
+        :return: Отчет: метрики по фолдам, сводка по моделям, время (wall и сумма по фолдам), ошибки.
+        """
+        if not tasks:
+            return {"folds": [], "models": {}, "errors": {}, "wall_time": 0.0, "serial_time": 0.0, "speedup": 0.0}
+
+        unique_tasks, model_keys = {}, {}
+        for task in tasks:
+            source = self._task_source(task)
+            unique_tasks.setdefault(source, task)
+            model_keys.setdefault(source, []).append(task["model_key"])
+
+        workers, threads = resolve_worker_budget(self.workers, self.tf_threads_per_worker, len(unique_tasks))
+        log_event("Walk-Forward", "Evaluating %d folds (%d model folds) with %d workers, %d TF threads per worker",
+                  len(unique_tasks), len(tasks), workers, threads)
+        folds, errors = [], {}
+        serial_time = 0.0
+        start = time.perf_counter()
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_worker, initargs=(threads, 2)) as pool:
+            futures = {pool.submit(_run_fold, task): source for source, task in unique_tasks.items()}
+            for future in as_completed(futures):
+                source = futures[future]
+                fold = unique_tasks[source]["fold"]
+                try:
+                    result = future.result()
+                    serial_time += result["timings"]["total"]
+                    folds += [{**result, "model_key": model_key} for model_key in model_keys[source]]
+                    log_event("Walk-Forward", "%s fold %s: accuracy=%s, mae=%.6g, %s s", ", ".join(model_keys[source]),
+                              fold, result['directional_accuracy'], result['mae'], result['timings']['total'])
+                except Exception as e:
+                    for model_key in model_keys[source]:
+                        errors[f"{model_key}:{fold}"] = str(e)
+                    log_event("Walk-Forward", "%s fold %s failed: %s", ", ".join(model_keys[source]), fold, e,
+                              level="error")
+        wall_time = time.perf_counter() - start
+
+        folds.sort(key=lambda result: (result["model_key"], result["fold"]))
+        report = {
+            "folds": folds,
+            "models": self._summarize(folds),
+            "errors": errors,
+            "workers": workers,
+            "tf_threads_per_worker": threads,
+            "wall_time": round(wall_time, 2),
+            "serial_time": round(serial_time, 2),
+            "speedup": round(serial_time / wall_time, 2) if wall_time > 0 else 0.0,
+        }
+        log_event("Walk-Forward", "Walk-forward done in %s s (sum of folds %s s, speedup x%s)",
+                  report['wall_time'], report['serial_time'], report['speedup'])
+        return report
+
+    @staticmethod
+    def _task_source(task):
+        """Ключ данных и параметров обучения фолда (без ключа модели)."""
+        return json.dumps({key: value for key, value in task.items() if key != "model_key"}, sort_keys=True)
+
+    @staticmethod
+    def _summarize(folds):
+        """Средние метрики и суммарное время по каждой модели."""
+        summary = {}
+        for model_key in sorted({result["model_key"] for result in folds}):
+            results = [result for result in folds if result["model_key"] == model_key]
+            accuracies = [result["directional_accuracy"] for result in results
+                          if result["directional_accuracy"] is not None]
+            summary[model_key] = {
+                "folds": len(results),
+                "directional_accuracy": float(np.mean(accuracies)) if accuracies else None,
+                "mae": float(np.mean([result["mae"] for result in results])),
+                "rmse": float(np.mean([result["rmse"] for result in results])),
+                "mape": float(np.mean([result["mape"] for result in results])),
+                "timings": {stage: round(sum(result["timings"][stage] for result in results), 3)
+                            for stage in ("load", "train", "predict", "total")},
+            }
+        return summary
+
+
+def print_report(report):
+    """Печатает таблицу метрик по фолдам и сводку по моделям."""
+    print(f"{'model':<18}{'fold':>5}{'train':>9}{'test':>8}{'dir.acc':>9}{'MAE':>12}{'RMSE':>12}"
+          f"{'load s':>8}{'train s':>9}{'pred s':>8}")
+    for result in report["folds"]:
+        accuracy = result["directional_accuracy"]
+        timings = result["timings"]
+        print(f"{result['model_key']:<18}{result['fold']:>5}{result['train_windows']:>9}{result['test_windows']:>8}"
+              f"{accuracy if accuracy is None else format(accuracy, '.3f'):>9}{result['mae']:>12.6g}"
+              f"{result['rmse']:>12.6g}{timings['load']:>8.2f}{timings['train']:>9.2f}{timings['predict']:>8.2f}")
+    print()
+    for model_key, summary in report["models"].items():
+        accuracy = summary["directional_accuracy"]
+        print(f"{model_key:<18} folds={summary['folds']} "
+              f"dir.acc={accuracy if accuracy is None else format(accuracy, '.3f')} mae={summary['mae']:.6g} "
+              f"train={summary['timings']['train']:.1f}s")
+    for name, error in report["errors"].items():
+        print(f"{name}: FAILED ({error})")
+    print(f"Wall time {report['wall_time']} s, sum of folds {report['serial_time']} s, speedup x{report['speedup']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel walk-forward evaluation of the LSTM predictors.")
+    parser.add_argument("--symbols", nargs="+", required=True)
+    parser.add_argument("--timeframes", nargs="+", default=["60"])
+    parser.add_argument("--timeframe-types", nargs="+", choices=("short_term", "medium_term"),
+                        default=["short_term", "medium_term"])
+    parser.add_argument("--cache-dir", default="data_cache/windows")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--min-train-fraction", type=float, default=0.5)
+    parser.add_argument("--expanding", action="store_true")
+    parser.add_argument("--epochs", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--tf-threads", type=int, default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    from models.timeframes import TIMEFRAMES
+    from hyperparameter_search import load_best_hyperparams
+    evaluator = WalkForwardEvaluator(args.cache_dir, workers=args.workers, tf_threads_per_worker=args.tf_threads,
+                                     n_folds=args.folds, min_train_fraction=args.min_train_fraction,
+                                     expanding=args.expanding, epochs=args.epochs)
+    tasks = []
+    # Модели и подобранные гиперпараметры хранятся по ключу модели (short_term_60), а не по таймфрейму
+    for timeframe_type in args.timeframe_types:
+        for timeframe in TIMEFRAMES[timeframe_type]:
+            if timeframe in args.timeframes:
+                model_key = f"{timeframe_type}_{timeframe}"
+                tasks += evaluator.make_tasks(model_key, timeframe, args.symbols, load_best_hyperparams(model_key))
+    if not tasks:
+        raise SystemExit(f"No cached data in {args.cache_dir} for {args.symbols}.")
+    print_report(evaluator.run(tasks))
+
+
+if __name__ == "__main__":
+    main()